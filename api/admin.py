@@ -5,7 +5,7 @@ from django.contrib import admin
 
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import User, Meal
+from .models import User, Meal, MealJob, GeminiResponseCache
 
 # --- 1. Custom User Admin Configuration ---
 
@@ -32,4 +32,11 @@ class UserAdmin(BaseUserAdmin):
 admin.site.register(User, UserAdmin)
 
 # Register the Meal model (optional, but good practice for full visibility)
-admin.site.register(Meal)
\ No newline at end of file
+admin.site.register(Meal)
+
+# Async meal upload queue
+admin.site.register(MealJob)
+
+
+# Cached Gemini answers (read-only view is enough; safe to delete rows)
+admin.site.register(GeminiResponseCache)
@@ -0,0 +1,118 @@
+# api/ai_cache.py
+"""
+Persistent TTL + LRU cache for Gemini responses, keyed by a canonical profile.
+
+Profiles are bucketed before hashing (weight to 0.5 kg, height to 1 cm, BMI to
+0.1, text lowercased and whitespace-collapsed) so requests that only differ in
+noise share one answer. The prompt is built from the bucketed profile too, so a
+cached answer is exactly what Gemini would have been asked.
+"""
+import json
+import math
+import hashlib
+import datetime
+from django.conf import settings
+from django.db import IntegrityError
+from django.db.models import F
+from django.utils import timezone
+
+from .models import GeminiResponseCache
+
+
+class InvalidProfileError(ValueError):
+    """Raised when a profile number is not finite (e.g. "weight": 1e999 parses as inf)."""
+
+
+def _finite(value, field):
+    number = float(value)
+    if not math.isfinite(number):
+        raise InvalidProfileError(f"{field} must be a finite number")
+    return number
+
+
+def _bucket(value, step, field):
+    if value in (None, ''):
+        return None
+    # Checked after scaling too: 1e308 / 0.5 is already inf
+    return round(round(_finite(_finite(value, field) / step, field)) * step, 2)
+
+
+def _text(value):
+    if value in (None, ''):
+        return None
+    return ' '.join(str(value).lower().split())
+
+
+def calorie_profile(user_info):
+    """
+    Bucketed profile for calculate_calorie_target_view, or None if it can't be
+    normalized. Raises InvalidProfileError for a non-finite number.
+    """
+    try:
+        age = user_info.get('age')
+        return {
+            'age': int(_finite(age, 'age')) if age not in (None, '') else None,
+            'gender': _text(user_info.get('gender')),
+            'weight': _bucket(user_info.get('weight'), 0.5, 'weight'),
+            'height': _bucket(user_info.get('height'), 1, 'height'),
+            'bmi': _bucket(user_info.get('bmi'), 0.1, 'bmi'),
+            'goal': _text(user_info.get('goal')),
+        }
+    except InvalidProfileError:
+        raise
+    except (TypeError, ValueError):
+        return None
+
+
+def cache_key(kind, profile):
+    canonical = json.dumps({'kind': kind, 'profile': profile}, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+async def aget_cached_response(kind, profile):
+    """Cached response dict, or None on a miss or expired entry."""
+    key = cache_key(kind, profile)
+    fresh_after = timezone.now() - datetime.timedelta(seconds=settings.GEMINI_CACHE_TTL)
+    entry = await GeminiResponseCache.objects.filter(key=key, createdAt__gte=fresh_after).only('response').afirst()
+    if entry is None:
+        return None
+    await GeminiResponseCache.objects.filter(pk=entry.pk).aupdate(lastUsedAt=timezone.now(), hits=F('hits') + 1)
+    return json.loads(entry.response)
+
+
+def _entry_values(kind, profile, response):
+    now = timezone.now()
+    return {
+        'kind': kind,
+        'profile': json.dumps(profile, sort_keys=True),
+        'response': json.dumps(response),
+        'createdAt': now,
+        'lastUsedAt': now,
+        'hits': 0,
+    }
+
+
+async def astore_response(kind, profile, response):
+    """Cache a successful response. Error payloads are never stored."""
+    if not isinstance(response, dict) or 'error' in response:
+        return False
+    key = cache_key(kind, profile)
+    try:
+        await GeminiResponseCache.objects.aupdate_or_create(key=key, defaults=_entry_values(kind, profile, response))
+    except IntegrityError:
+        # Another worker stored the same key first; either copy is fine
+        return False
+    await aevict_responses()
+    return True
+
+
+async def aevict_responses():
+    """Drop expired entries, then the least recently used beyond GEMINI_CACHE_MAX_ENTRIES."""
+    expired_before = timezone.now() - datetime.timedelta(seconds=settings.GEMINI_CACHE_TTL)
+    await GeminiResponseCache.objects.filter(createdAt__lt=expired_before).adelete()
+    overflow = [
+        pk async for pk in
+        GeminiResponseCache.objects.order_by('-lastUsedAt').values_list('pk', flat=True)[settings.GEMINI_CACHE_MAX_ENTRIES:]
+    ]
+    if overflow:
+        await GeminiResponseCache.objects.filter(pk__in=overflow).adelete()
@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from .metrics import install_query_counter
+
+        # Count queries per request for /metrics
+        connection_created.connect(install_query_counter, dispatch_uid='api_metrics_query_counter')
@@ -0,0 +1,220 @@
+# api/auth_cache.py
+"""
+Cache of verified JWTs -> User snapshots, so authenticated requests skip the
+HS256 decode and the User query.
+
+Entries are keyed by a SHA-256 of the token and never outlive the token's
+`exp` (or AUTH_CACHE_TTL, whichever is sooner). Views that change a user call
+`invalidate_user()`.
+
+A miss calls `begin()` before reading the user and hands its marker to
+`put()`. If the user is invalidated while the lookup runs, the snapshot may
+already be stale, and it is not cached.
+
+With AUTH_CACHE_BACKEND naming a Django cache alias (e.g. Redis shared by all
+workers), snapshots are also stored there and every hit checks a per-user
+version key (by googleId, which the token carries), so an invalidation in
+one worker is seen by all of them. Without it the cache is per process and
+other workers may serve a snapshot up to AUTH_CACHE_TTL old.
+"""
+import copy
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from django.conf import settings
+
+
+def token_key(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class AuthCache:
+    """Bounded LRU of {token hash: (user, expires_at, version)}. Thread-safe."""
+
+    def __init__(self, max_entries=1024, ttl=300, backend=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.backend = backend
+        self._entries = OrderedDict()
+        self._keys_by_user = {}
+        # Bumped by every invalidate_user() in this process
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    # --- Shared (cross-worker) backend ---
+
+    def _version_key(self, google_id):
+        return f"auth:v:{google_id}"
+
+    def _shared_version(self, google_id):
+        if self.backend is None:
+            return 0
+        return self.backend.get(self._version_key(google_id), 0)
+
+    # --- Local LRU ---
+
+    def _drop(self, key):
+        user, _, _ = self._entries.pop(key)
+        keys = self._keys_by_user.get(user.pk)
+        if keys:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_user[user.pk]
+
+    def _store_local(self, key, user, expires_at, version, generation=None):
+        """False (and nothing stored) if a user was invalidated here since `generation`."""
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return False
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (user, expires_at, version)
+            self._keys_by_user.setdefault(user.pk, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+            return True
+
+    def _get_local(self, key, now):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= now:
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    # --- Public API ---
+
+    def get(self, token):
+        """A private copy of the cached user for this token, or None."""
+        if not self.enabled:
+            return None
+        key = token_key(token)
+        now = time.time()
+
+        entry = self._get_local(key, now)
+        if entry is not None:
+            user, _, version = entry
+            if self.backend is None or self._shared_version(user.googleId) == version:
+                # Counters share the LRU lock: `+=` is not atomic across threads
+                with self._lock:
+                    self.hits += 1
+                # Views may modify request.user; never hand out the cached instance itself
+                return copy.copy(user)
+            with self._lock:
+                if key in self._entries:
+                    self._drop(key)
+
+        if self.backend is not None:
+            shared = self.backend.get(f"auth:{key}")
+            if (shared and shared['expires_at'] > now
+                    and self._shared_version(shared['user'].googleId) == shared['version']):
+                self._store_local(key, shared['user'], shared['expires_at'], shared['version'])
+                with self._lock:
+                    self.shared_hits += 1
+                return copy.copy(shared['user'])
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def begin(self, google_id):
+        """Marker for put(); take it before reading the user from the database."""
+        if not self.enabled:
+            return None
+        return (self._generation, self._shared_version(google_id))
+
+    def put(self, token, user, exp, marker):
+        """
+        Remember a freshly verified token; `exp` is the token's expiry (epoch
+        seconds) and `marker` what begin() returned before the user was read.
+        """
+        if not self.enabled or marker is None:
+            return
+        now = time.time()
+        expires_at = min(exp, now + self.ttl) if exp else now + self.ttl
+        if expires_at <= now:
+            return
+        key = token_key(token)
+        generation, version = marker
+        if not self._store_local(key, copy.copy(user), expires_at, version, generation):
+            return
+        if self.backend is not None:
+            self.backend.set(
+                f"auth:{key}",
+                {'user': user, 'expires_at': expires_at, 'version': version},
+                timeout=max(1, int(expires_at - now)),
+            )
+
+    def invalidate_user(self, user):
+        """Forget every cached token of this user, here and (with a backend) in every worker."""
+        with self._lock:
+            self._generation += 1
+            for key in list(self._keys_by_user.get(user.pk, ())):
+                self._drop(key)
+        if self.backend is not None:
+            version_key = self._version_key(user.googleId)
+            if not self.backend.add(version_key, 1, timeout=None):
+                try:
+                    self.backend.incr(version_key)
+                except ValueError:
+                    # Expired between add() and incr()
+                    self.backend.set(version_key, 1, timeout=None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_user.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                'hits': self.hits,
+                'shared_hits': self.shared_hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits + self.shared_hits) / lookups if lookups else 0.0,
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'backend': settings.AUTH_CACHE_BACKEND or None,
+            }
+
+
+def build_auth_cache():
+    backend = None
+    if settings.AUTH_CACHE_BACKEND:
+        from django.core.cache import caches
+        backend = caches[settings.AUTH_CACHE_BACKEND]
+    return AuthCache(
+        max_entries=settings.AUTH_CACHE_SIZE,
+        ttl=settings.AUTH_CACHE_TTL,
+        backend=backend,
+    )
+
+
+_auth_cache = None
+_auth_cache_lock = threading.Lock()
+
+
+def get_auth_cache():
+    global _auth_cache
+    if _auth_cache is None:
+        with _auth_cache_lock:
+            if _auth_cache is None:
+                _auth_cache = build_auth_cache()
+    return _auth_cache
+
+
+def invalidate_user(user):
+    get_auth_cache().invalidate_user(user)
@@ -18,9 +18,17 @@ from rest_framework.authentication import BaseAuthentication
 from rest_framework.exceptions import AuthenticationFailed
 from django.conf import settings
 from .models import User
+from .auth_cache import get_auth_cache
+from .metrics import AUTH_SECONDS
 import jwt
+import time
+from asgiref.sync import sync_to_async
 # ... (other imports)
 
+AUTH_CACHED_SECONDS = AUTH_SECONDS.labels('cached')
+AUTH_VERIFIED_SECONDS = AUTH_SECONDS.labels('verified')
+AUTH_FAILED_SECONDS = AUTH_SECONDS.labels('failed')
+
 class JWTGoogleAuthentication(BaseAuthentication):
     """
     Custom authentication class defensively retrieving the JWT from the request.
@@ -37,7 +45,7 @@ class JWTGoogleAuthentication(BaseAuthentication):
 
         return auth_header
 
-    def authenticate(self, request):
+    def get_token(self, request):
         auth_header = self.get_auth_header(request)
         
         # Check 1: Is the header present and does it start with 'Bearer '?
@@ -46,25 +54,122 @@ class JWTGoogleAuthentication(BaseAuthentication):
             return None 
         
         # Extract the token
-        token = auth_header.split(' ')[1]
-        print("token:",token)
+        return auth_header.split(' ')[1]
+
+    def authenticate(self, request):
+        token = self.get_token(request)
+        if token is None:
+            return None
+
+        start = time.perf_counter()
+
+        # Already verified and not expired: no decode, no query
+        cache = get_auth_cache()
+        user = cache.get(token)
+        if user is not None:
+            AUTH_CACHED_SECONDS.observe(time.perf_counter() - start)
+            return (user, token)
+
         try:
-            # Verify the JWT using your shared secret key
-            decoded_payload = jwt.decode(token, settings.JWT_SECRET, algorithms=["HS256"])
-            
-            google_id = decoded_payload.get('googleId')
-            if not google_id:
-                raise AuthenticationFailed('Token payload missing googleId')
+            google_id, exp = self.decode_token(token)
+            # Before the query: an invalidation during it keeps this snapshot out of the cache
+            marker = cache.begin(google_id)
+            user = self.get_user(google_id)
+        except AuthenticationFailed:
+            AUTH_FAILED_SECONDS.observe(time.perf_counter() - start)
+            raise
 
-            # Find user and return
-            user = User.objects.get(googleId=google_id)
-            return (user, token) 
+        cache.put(token, user, exp, marker)
+        AUTH_VERIFIED_SECONDS.observe(time.perf_counter() - start)
+        return (user, token)
+
+    async def aauthenticate(self, request):
+        """
+        authenticate() for async views. A cache hit stays on the event loop
+        (unless AUTH_CACHE_BACKEND needs a network round trip); a miss loads
+        the user with the async ORM.
+        """
+        token = self.get_token(request)
+        if token is None:
+            return None
+
+        start = time.perf_counter()
 
+        cache = get_auth_cache()
+        blocking = cache.backend is not None
+        user = await sync_to_async(cache.get)(token) if blocking else cache.get(token)
+        if user is not None:
+            AUTH_CACHED_SECONDS.observe(time.perf_counter() - start)
+            return (user, token)
+
+        try:
+            google_id, exp = self.decode_token(token)
+            marker = await sync_to_async(cache.begin)(google_id) if blocking else cache.begin(google_id)
+            user = await self.aget_user(google_id)
+        except AuthenticationFailed:
+            AUTH_FAILED_SECONDS.observe(time.perf_counter() - start)
+            raise
+
+        if blocking:
+            await sync_to_async(cache.put)(token, user, exp, marker)
+        else:
+            cache.put(token, user, exp, marker)
+        AUTH_VERIFIED_SECONDS.observe(time.perf_counter() - start)
+        return (user, token)
+
+    def decode_token(self, token):
+        """Check the JWT's signature and expiry. Returns (googleId, exp)."""
+        try:
+            # Verify the JWT using your shared secret key
+            decoded_payload = jwt.decode(token, settings.JWT_SECRET, algorithms=["HS256"])
         except jwt.ExpiredSignatureError:
             raise AuthenticationFailed('Token has expired')
         except jwt.InvalidTokenError:
             raise AuthenticationFailed('Invalid token')
+        except Exception:
+            raise AuthenticationFailed('Invalid token')
+
+        google_id = decoded_payload.get('googleId')
+        if not google_id:
+            raise AuthenticationFailed('Token payload missing googleId')
+        return google_id, decoded_payload.get('exp')
+
+    def get_user(self, google_id):
+        """The user a decoded token belongs to."""
+        try:
+            # Find user and return
+            return User.objects.get(googleId=google_id)
+        except User.DoesNotExist:
+            raise AuthenticationFailed('User not found')
+        except Exception:
+            raise AuthenticationFailed('Invalid token')
+
+    async def aget_user(self, google_id):
+        """get_user() with the async ORM."""
+        try:
+            return await User.objects.aget(googleId=google_id)
         except User.DoesNotExist:
             raise AuthenticationFailed('User not found')
         except Exception:
-            raise AuthenticationFailed('Invalid token')
\ No newline at end of file
+            raise AuthenticationFailed('Invalid token')
+
+# --- Async views ---
+# DRF's @api_view can't wrap `async def` views, so async views use this
+# decorator instead of @authentication_classes + @permission_classes.
+import functools
+from django.http import JsonResponse
+
+
+def async_jwt_required(view):
+    """Authenticate an async view with JWTGoogleAuthentication; errors match DRF's 403 payloads."""
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        try:
+            result = await JWTGoogleAuthentication().aauthenticate(request)
+        except AuthenticationFailed as e:
+            return JsonResponse({"detail": str(e.detail)}, status=403)
+        if result is None:
+            return JsonResponse({"detail": "Authentication credentials were not provided."}, status=403)
+        request.user, request.auth = result
+        return await view(request, *args, **kwargs)
+    return wrapper
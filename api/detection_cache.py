@@ -0,0 +1,122 @@
+# api/detection_cache.py
+"""
+Perceptual-hash cache of YOLO detections, so re-uploads and near-identical
+photos of the same plate skip inference.
+
+Images are keyed by a 64-bit difference hash (dHash) of the decoded pixels; a
+lookup hits when a cached hash is within `max_distance` bits of the new one.
+Entries belong to one model version and the whole cache is dropped when the
+version changes.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+from .metrics import DETECTION_CACHE_EVICTIONS, DETECTION_CACHE_LOOKUPS
+
+CACHE_HITS = DETECTION_CACHE_LOOKUPS.labels('hit')
+CACHE_MISSES = DETECTION_CACHE_LOOKUPS.labels('miss')
+CACHE_EVICTIONS = DETECTION_CACHE_EVICTIONS.labels()
+
+
+def dhash(image):
+    """64-bit difference hash of a BGR (or grayscale) uint8 image."""
+    import cv2
+    import numpy as np
+
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = small[:, 1:] > small[:, :-1]
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def model_version(model_path, conf, imgsz):
+    """Identifies a model + predict settings; cached detections are only valid for one of these."""
+    try:
+        stat = os.stat(model_path)
+        file_id = f"{stat.st_size}:{stat.st_mtime_ns}"
+    except (OSError, TypeError):
+        file_id = 'unknown'
+    return f"{model_path}:{file_id}:conf={conf}:imgsz={imgsz}"
+
+
+class DetectionCache:
+    """Bounded LRU of {image hash: Detection} with Hamming-distance lookup. Thread-safe."""
+
+    def __init__(self, max_entries=1024, max_distance=4, version=None):
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        self.version = version
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def set_version(self, version):
+        """Invalidate everything if the model version changed."""
+        with self._lock:
+            if version != self.version:
+                self._entries.clear()
+                self.version = version
+
+    def _find(self, image_hash):
+        if image_hash in self._entries:
+            return image_hash
+        if self.max_distance <= 0:
+            return None
+        best_key, best_distance = None, self.max_distance + 1
+        for key in self._entries:
+            distance = (key ^ image_hash).bit_count()
+            if distance < best_distance:
+                best_key, best_distance = key, distance
+                if distance <= 1:
+                    break
+        return best_key
+
+    def get(self, image_hash):
+        if not self.enabled:
+            return None
+        with self._lock:
+            key = self._find(image_hash)
+            if key is None:
+                self.misses += 1
+                CACHE_MISSES.inc()
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            CACHE_HITS.inc()
+            return self._entries[key]
+
+    def put(self, image_hash, detection):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[image_hash] = detection
+            self._entries.move_to_end(image_hash)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+                CACHE_EVICTIONS.inc()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'max_distance': self.max_distance,
+                'version': self.version,
+            }
@@ -0,0 +1,104 @@
+# api/foods.py
+"""
+Meal contents in normalized form.
+
+FoodItem has one row per food, keyed by normalize_name. Migration 0011 seeds
+it from calorie_Database.json; YOLO labels missing from that file get a row
+of their own on first use. Imported names are only matched against existing
+foods, never added: FoodItem is shared by every user. Each saved meal
+gets one MealItem per distinct food, with how often the food was detected and
+the best confidence.
+
+MealItem repeats the meal's user and createdAt. Per-food statistics are then
+a single GROUP BY over mealitem_user_created_idx that never touches Meal.
+Meal.items stays as the display string the meal lists and export read.
+"""
+from django.db.models import Count, Sum
+
+from .models import FoodItem, MealItem
+from .nutrition import normalize_name
+
+
+def food_key(name):
+    """FoodItem.key for a label (normalize_name, cut to the column size)."""
+    return normalize_name(name)[:100]
+
+
+def food_ids_for_names(names, create_missing=True):
+    """
+    {food_key: FoodItem id} for these labels. Foods not seen before are
+    created, or left out with create_missing=False (user-supplied names).
+    """
+    labels = {}
+    for name in names:
+        key = food_key(name)
+        if key:
+            labels.setdefault(key, str(name).strip()[:100])
+    if not labels:
+        return {}
+
+    ids = dict(FoodItem.objects.filter(key__in=list(labels)).values_list('key', 'id'))
+    missing = [key for key in labels if key not in ids]
+    if missing and create_missing:
+        # Another request may add the same food in between; its row is as good as ours
+        FoodItem.objects.bulk_create([FoodItem(key=key, name=labels[key]) for key in missing], ignore_conflicts=True)
+        ids.update(FoodItem.objects.filter(key__in=missing).values_list('key', 'id'))
+    return ids
+
+
+def build_meal_items(entries, create_missing=True):
+    """
+    Unsaved MealItem rows for saved meals, from [(meal, labels, confidences)]
+    with labels in detection order and confidences parallel to them (or None).
+    A food detected several times becomes one row with that quantity.
+    Resolves every label with one lookup for the whole batch; with
+    create_missing=False, labels of unknown foods get no row (Meal.items
+    still shows them).
+    """
+    entries = list(entries)
+    food_ids = food_ids_for_names((label for _, labels, _ in entries for label in labels), create_missing)
+    items = []
+    for meal, labels, confidences in entries:
+        grouped = {}
+        for index, label in enumerate(labels):
+            food_id = food_ids.get(food_key(label))
+            if food_id is None:
+                continue
+            item = grouped.get(food_id)
+            if item is None:
+                item = grouped[food_id] = MealItem(
+                    meal=meal, food_id=food_id, user_id=meal.user_id, createdAt=meal.createdAt, quantity=0,
+                )
+            item.quantity += 1
+            if confidences is not None and index < len(confidences):
+                confidence = float(confidences[index])
+                if item.confidence is None or confidence > item.confidence:
+                    item.confidence = confidence
+        items.extend(grouped.values())
+    return items
+
+
+def save_meal_items(entries, create_missing=True):
+    """build_meal_items + one bulk_create; call in the transaction that saves the meals."""
+    items = build_meal_items(entries, create_missing)
+    if items:
+        MealItem.objects.bulk_create(items)
+    return items
+
+
+def top_foods(user, start, end, limit):
+    """
+    The user's most eaten foods with createdAt in [start, end), most detected
+    first: [{"id", "name", "meals", "quantity"}]. One GROUP BY over the user's
+    MealItem rows.
+    """
+    rows = (
+        MealItem.objects.filter(user=user, createdAt__gte=start, createdAt__lt=end)
+        .values('food_id', 'food__name')
+        .annotate(meals=Count('id'), quantity=Sum('quantity'))
+        .order_by('-quantity', '-meals', 'food__name')[:limit]
+    )
+    return [
+        {"id": row['food_id'], "name": row['food__name'], "meals": row['meals'], "quantity": row['quantity']}
+        for row in rows
+    ]
@@ -0,0 +1,164 @@
+# api/gemini_client.py
+"""
+Asyncio Gemini client with bounded concurrency and single-flight coalescing.
+
+All upstream work runs on one event loop owned by the client (a daemon thread),
+so the concurrency cap and the in-flight map are shared by every request in the
+process, whether the caller is an async view under ASGI or sync code under WSGI.
+
+Talks to the public REST endpoint (`{GEMINI_API_BASE}/v1beta/models/<model>:generateContent`),
+which is also what benchmarks/fake_gemini.py serves for offline load tests.
+"""
+import copy
+import json
+import asyncio
+import hashlib
+import threading
+import time
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+from .metrics import GEMINI_REQUEST_SECONDS
+
+
+def to_rest_schema(schema):
+    """The REST API spells OpenAPI types in upper case ("OBJECT", "NUMBER", ...)."""
+    if isinstance(schema, dict):
+        return {
+            key: value.upper() if key == 'type' and isinstance(value, str) else to_rest_schema(value)
+            for key, value in schema.items()
+        }
+    return schema
+
+
+# What callers (and so clients) see when Gemini's answer can't be used; details go to the log
+UNPARSABLE_RESPONSE = {"error": "Failed to parse AI response"}
+
+
+def parse_response_text(text):
+    """Strip markdown fences (```json) from the model text and parse it as JSON."""
+    try:
+        # Clean the response text (removes markdown blocks like ```json)
+        cleaned_text = text.strip().replace('```json', '').replace('```', '').strip()
+        return json.loads(cleaned_text)
+    except Exception as e:
+        print(f"Failed to parse Gemini response: {e}; raw text: {text[:2000]!r}")
+        return dict(UNPARSABLE_RESPONSE)
+
+
+class AsyncGeminiClient:
+    def __init__(self, api_key, api_base, model_name, max_concurrency=8, timeout=60.0, transport=None):
+        if not api_key:
+            raise ImproperlyConfigured("GEMINI_API_KEY is not set; the calorie target and health report views need it")
+        self.api_key = api_key
+        self.url = f"{api_base.rstrip('/')}/v1beta/models/{model_name}:generateContent"
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        # httpx transport override (tests)
+        self.transport = transport
+
+        self.upstream_calls = 0
+        self.coalesced = 0
+
+        self._loop = None
+        self._start_lock = threading.Lock()
+        self._inflight = {}
+
+    # --- Event loop plumbing ---
+
+    def _ensure_loop(self):
+        if self._loop is not None:
+            return self._loop
+        with self._start_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                ready = threading.Event()
+
+                def run():
+                    asyncio.set_event_loop(loop)
+                    import httpx
+                    self._semaphore = asyncio.Semaphore(self.max_concurrency)
+                    self._http = httpx.AsyncClient(
+                        timeout=self.timeout,
+                        limits=httpx.Limits(max_connections=self.max_concurrency),
+                        transport=self.transport,
+                    )
+                    ready.set()
+                    loop.run_forever()
+
+                threading.Thread(target=run, name='gemini-client', daemon=True).start()
+                ready.wait()
+                self._loop = loop
+        return self._loop
+
+    async def generate(self, prompt, json_schema=None):
+        """Await from any event loop (async views)."""
+        future = asyncio.run_coroutine_threadsafe(self._generate(prompt, json_schema), self._ensure_loop())
+        return await asyncio.wrap_future(future)
+
+    # --- Runs on the client loop ---
+
+    async def _generate(self, prompt, json_schema):
+        key = hashlib.sha256(json.dumps([prompt, json_schema], sort_keys=True).encode()).hexdigest()
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._call_upstream(prompt, json_schema))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+        # shield: one caller disconnecting must not cancel the shared upstream call
+        result = await asyncio.shield(task)
+        return copy.deepcopy(result)
+
+    async def _call_upstream(self, prompt, json_schema):
+        body = {"contents": [{"role": "user", "parts": [{"text": prompt}]}]}
+        if json_schema:
+            # Use the schema to force a structured JSON output
+            body["generationConfig"] = {
+                "responseMimeType": "application/json",
+                "responseSchema": to_rest_schema(json_schema),
+            }
+
+        async with self._semaphore:
+            self.upstream_calls += 1
+            start = time.perf_counter()
+            try:
+                # Key in a header, never in the URL (which ends up in httpx error messages)
+                response = await self._http.post(self.url, headers={"x-goog-api-key": self.api_key}, json=body)
+                response.raise_for_status()
+                payload = response.json()
+            except Exception as e:
+                GEMINI_REQUEST_SECONDS.labels('error').observe(time.perf_counter() - start)
+                # Details stay in the server log; callers pass this dict on to the client
+                print(f"Gemini request failed: {type(e).__name__}: {e}")
+                return {"error": "Gemini request failed"}
+            elapsed = time.perf_counter() - start
+
+        try:
+            text = "".join(part.get("text", "") for part in payload["candidates"][0]["content"]["parts"])
+        except (KeyError, IndexError, TypeError) as e:
+            GEMINI_REQUEST_SECONDS.labels('unparsable').observe(elapsed)
+            print(f"Unexpected Gemini response shape ({type(e).__name__}: {e}): {json.dumps(payload)[:2000]}")
+            return dict(UNPARSABLE_RESPONSE)
+        result = parse_response_text(text)
+        GEMINI_REQUEST_SECONDS.labels('unparsable' if 'error' in result else 'ok').observe(elapsed)
+        return result
+
+    def stats(self):
+        return {
+            'upstream_calls': self.upstream_calls,
+            'coalesced': self.coalesced,
+            'inflight': len(self._inflight),
+            'max_concurrency': self.max_concurrency,
+        }
+
+
+def build_gemini_client():
+    return AsyncGeminiClient(
+        api_key=settings.GEMINI_API_KEY,
+        api_base=settings.GEMINI_API_BASE,
+        model_name=settings.GEMINI_MODEL_NAME,
+        max_concurrency=settings.GEMINI_MAX_CONCURRENCY,
+        timeout=settings.GEMINI_TIMEOUT,
+    )
@@ -0,0 +1,194 @@
+# api/google_certs.py
+"""
+Google ID token verification against a cached copy of Google's signing keys.
+
+id_token.verify_oauth2_token() downloads the certificates on every call. Here
+one GoogleCerts per process keeps them for as long as Google's Cache-Control
+says, refreshes them in the background shortly before they expire, and reuses
+one pooled HTTP session. Sign-ins only wait on a fetch at cold start (which
+warm_up() does at boot) or when a token names a key id we haven't seen yet.
+
+GOOGLE_CERTS_URL may point at the PEM endpoint (oauth2/v1/certs, the default),
+a JWKS endpoint (oauth2/v3/certs), or a local stand-in such as
+benchmarks/fake_google_certs.py.
+"""
+import re
+import time
+import threading
+from email.utils import parsedate_to_datetime
+from django.conf import settings
+
+GOOGLE_ISSUERS = ('accounts.google.com', 'https://accounts.google.com')
+# Used when the response carries no usable cache headers
+DEFAULT_MAX_AGE = 3600
+# Don't re-fetch more often than this for tokens with an unknown key id
+MIN_REFETCH_INTERVAL = 30
+
+
+def max_age(headers, now=None):
+    """Seconds the response may be cached for: Cache-Control max-age minus Age, else Expires."""
+    cache_control = headers.get('Cache-Control', '')
+    if 'no-store' in cache_control or 'no-cache' in cache_control:
+        return 0
+    match = re.search(r'max-age=(\d+)', cache_control)
+    if match:
+        return max(0, int(match.group(1)) - int(headers.get('Age', 0) or 0))
+    if headers.get('Expires'):
+        try:
+            expires = parsedate_to_datetime(headers['Expires']).timestamp()
+        except (TypeError, ValueError):
+            return 0
+        return max(0, int(expires - (now or time.time())))
+    return DEFAULT_MAX_AGE
+
+
+class GoogleCerts:
+    def __init__(self, certs_url, timeout=5.0, refresh_margin=300, session=None):
+        self.certs_url = certs_url
+        self.timeout = timeout
+        self.refresh_margin = refresh_margin
+        if session is None:
+            import requests
+            session = requests.Session()
+            session.mount('https://', requests.adapters.HTTPAdapter(pool_maxsize=4))
+            session.mount('http://', requests.adapters.HTTPAdapter(pool_maxsize=4))
+        self.session = session
+
+        self._certs = None
+        self._expires_at = 0.0
+        self._fetched_at = 0.0
+        self._attempted_at = 0.0
+        self._fetch_lock = threading.Lock()
+        self._refreshing = False
+        self._timer = None
+        self.fetches = 0
+        self.fetch_errors = 0
+        self.background_refreshes = 0
+
+    # --- Fetching ---
+
+    def _fetch(self):
+        self._attempted_at = time.time()
+        response = self.session.get(self.certs_url, timeout=self.timeout)
+        response.raise_for_status()
+        certs = response.json()
+        ttl = max_age(response.headers)
+        now = time.time()
+        self._certs, self._fetched_at, self._expires_at = certs, now, now + ttl
+        self.fetches += 1
+        self._schedule_refresh(ttl)
+
+    def _schedule_refresh(self, ttl):
+        """Refresh ahead of expiry even if no sign-in happens to trigger it."""
+        if self._timer is not None:
+            self._timer.cancel()
+        delay = ttl - self.refresh_margin
+        if delay > 0:
+            self._timer = threading.Timer(delay, self._refresh_in_background)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _refresh_in_background(self):
+        if self._refreshing:
+            return
+        self._refreshing = True
+
+        def run():
+            try:
+                with self._fetch_lock:
+                    self._fetch()
+                self.background_refreshes += 1
+            except Exception as e:
+                self.fetch_errors += 1
+                print(f"Google cert refresh failed: {e}")
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=run, name='google-certs', daemon=True).start()
+
+    def _fetch_now(self, stale_after):
+        """Fetch in this thread unless another thread already did since `stale_after`."""
+        with self._fetch_lock:
+            if self._certs is not None and self._fetched_at > stale_after:
+                return
+            try:
+                self._fetch()
+            except Exception as e:
+                self.fetch_errors += 1
+                if self._certs is None:
+                    raise
+                # Keep verifying with the keys we have; try Google again shortly
+                print(f"Google cert fetch failed, using cached keys: {e}")
+                self._expires_at = time.time() + MIN_REFETCH_INTERVAL
+
+    # --- Lookup ---
+
+    def _has_kid(self, kid):
+        if 'keys' in self._certs:
+            return any(key.get('kid') == kid for key in self._certs['keys'])
+        return kid in self._certs
+
+    def get(self, kid=None):
+        """Current keys (PEM dict or JWKS), making sure `kid` is among them if possible."""
+        now = time.time()
+        if self._certs is None or now >= self._expires_at:
+            self._fetch_now(stale_after=now - 1 if self._certs is None else self._expires_at)
+        elif kid and not self._has_kid(kid) and now - self._fetched_at > MIN_REFETCH_INTERVAL:
+            # Google rotated its keys before our copy expired
+            self._fetch_now(stale_after=self._fetched_at)
+        elif now >= self._expires_at - self.refresh_margin and now - self._attempted_at > MIN_REFETCH_INTERVAL:
+            # Rate-limited too: after a failed fetch every sign-in falls in the margin
+            self._refresh_in_background()
+        return self._certs
+
+    # --- Verification ---
+
+    def verify_oauth2_token(self, token, audience, clock_skew_in_seconds=0):
+        """Same checks and return value as google.oauth2.id_token.verify_oauth2_token."""
+        import jwt as pyjwt
+
+        kid = pyjwt.get_unverified_header(token).get('kid')
+        certs = self.get(kid)
+        if 'keys' in certs:
+            # JWKS
+            signing_key = next(
+                (key for key in pyjwt.PyJWKSet.from_dict(certs).keys if kid and key.key_id == kid), None
+            )
+            if signing_key is None:
+                raise ValueError(f"No Google signing key matches kid {kid!r}")
+            idinfo = pyjwt.decode(
+                token, signing_key.key, algorithms=[signing_key.algorithm_name],
+                audience=audience, leeway=clock_skew_in_seconds,
+            )
+        else:
+            from google.auth import jwt as google_jwt
+            idinfo = google_jwt.decode(
+                token, certs=certs, audience=audience, clock_skew_in_seconds=clock_skew_in_seconds
+            )
+
+        if idinfo.get('iss') not in GOOGLE_ISSUERS:
+            raise ValueError(f"Wrong issuer. 'iss' should be one of the following: {list(GOOGLE_ISSUERS)}")
+        return idinfo
+
+    def stats(self):
+        return {
+            'fetches': self.fetches,
+            'fetch_errors': self.fetch_errors,
+            'background_refreshes': self.background_refreshes,
+            'expires_in': round(self._expires_at - time.time(), 1) if self._certs is not None else None,
+            'certs_url': self.certs_url,
+        }
+
+
+def build_google_certs():
+    certs = GoogleCerts(
+        certs_url=settings.GOOGLE_CERTS_URL,
+        timeout=settings.GOOGLE_CERTS_TIMEOUT,
+        refresh_margin=settings.GOOGLE_CERTS_REFRESH_MARGIN,
+    )
+    try:
+        # Loaded by warm_up() at boot: have the keys before the first sign-in
+        certs.get()
+    except Exception as e:
+        print(f"Google certs not prefetched ({e}); will retry on first sign-in")
+    return certs
@@ -0,0 +1,212 @@
+# api/images.py
+"""
+Meal image helpers: normalize and decode uploads in memory and persist them off
+the request path.
+"""
+import io
+import os
+import queue
+import atexit
+import threading
+from collections import namedtuple
+from django.conf import settings
+
+from .metrics import MEAL_STAGE_SECONDS
+
+DECODE_SECONDS = MEAL_STAGE_SECONDS.labels('decode')
+NORMALIZE_SECONDS = MEAL_STAGE_SECONDS.labels('normalize')
+WRITE_SECONDS = MEAL_STAGE_SECONDS.labels('write')
+
+# One normalized upload: `pixels` (upright BGR, IMAGE_INFERENCE_SIZE) for YOLO;
+# `decoded` (BGR, maybe at a reduced scale) and its EXIF `orientation` for the
+# stored copies, which are encoded as `extension` (see encode_display/encode_thumbnail)
+PreparedImage = namedtuple('PreparedImage', ['pixels', 'decoded', 'orientation', 'extension'])
+
+EXIF_ORIENTATION = 0x0112
+
+
+class ImageDecodeError(ValueError):
+    """Raised when uploaded bytes are not a decodable image."""
+
+
+def read_upload(upload):
+    """Return the full contents of a Django UploadedFile (in-memory or temporary) as bytes."""
+    if hasattr(upload, 'temporary_file_path'):
+        with open(upload.temporary_file_path(), 'rb') as f:
+            return f.read()
+    upload.seek(0)
+    return upload.read()
+
+
+def decode_image(data):
+    """Decode encoded image bytes into a BGR uint8 numpy array (what YOLO expects)."""
+    import cv2
+    import numpy as np
+
+    with DECODE_SECONDS.time():
+        array = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if array is None:
+        raise ImageDecodeError("Uploaded file is not a valid image")
+    return array
+
+
+def fit_within(size, limit):
+    """(width, height) scaled to at most `limit` on the long edge; never scaled up."""
+    width, height = size
+    scale = min(1.0, limit / max(width, height))
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def _resize(pixels, size):
+    import cv2
+
+    if (pixels.shape[1], pixels.shape[0]) == size:
+        return pixels
+    # Whole-factor INTER_AREA first (a fast box filter, no aliasing), bilinear for the < 2x rest
+    factor = pixels.shape[1] // size[0]
+    if factor >= 2:
+        pixels = cv2.resize(pixels, None, fx=1 / factor, fy=1 / factor, interpolation=cv2.INTER_AREA)
+        if (pixels.shape[1], pixels.shape[0]) == size:
+            return pixels
+    return cv2.resize(pixels, size, interpolation=cv2.INTER_LINEAR)
+
+
+def _orient(pixels, orientation):
+    """Apply an EXIF orientation (1-8) to pixels, as ImageOps.exif_transpose would."""
+    import cv2
+
+    if orientation == 2:
+        return cv2.flip(pixels, 1)
+    if orientation == 3:
+        return cv2.rotate(pixels, cv2.ROTATE_180)
+    if orientation == 4:
+        return cv2.flip(pixels, 0)
+    if orientation == 5:
+        return cv2.transpose(pixels)
+    if orientation == 6:
+        return cv2.rotate(pixels, cv2.ROTATE_90_CLOCKWISE)
+    if orientation == 7:
+        return cv2.rotate(cv2.transpose(pixels), cv2.ROTATE_180)
+    if orientation == 8:
+        return cv2.rotate(pixels, cv2.ROTATE_90_COUNTERCLOCKWISE)
+    return pixels
+
+
+def encode_image(pixels, extension, quality):
+    """Encode BGR pixels as '.jpg' or '.webp'."""
+    import cv2
+
+    flag = cv2.IMWRITE_WEBP_QUALITY if extension == '.webp' else cv2.IMWRITE_JPEG_QUALITY
+    ok, encoded = cv2.imencode(extension, pixels, [flag, quality])
+    if not ok:
+        raise ValueError(f"Could not encode image as {extension}")
+    return encoded.tobytes()
+
+
+def _size(pixels):
+    return pixels.shape[1], pixels.shape[0]
+
+
+def prepare_image(data):
+    """
+    Normalize one upload for inference: upright BGR pixels at most
+    IMAGE_INFERENCE_SIZE on the long edge. Only the header is parsed up front
+    (size, EXIF orientation); JPEGs are then decoded directly at 1/2, 1/4 or
+    1/8 scale when that still covers IMAGE_DISPLAY_SIZE, so a 12 MP photo is
+    never decoded in full. The display copy and thumbnail are made from the
+    same decode when they are stored (see meals.store_images).
+    """
+    import cv2
+    import numpy as np
+    from PIL import Image
+
+    with NORMALIZE_SECONDS.time():
+        try:
+            header = Image.open(io.BytesIO(data))
+            orientation = header.getexif().get(EXIF_ORIENTATION, 1)
+            long_edge = max(header.size)
+        except (OSError, ValueError, SyntaxError, Image.DecompressionBombError) as e:
+            raise ImageDecodeError("Uploaded file is not a valid image") from e
+
+        flags = cv2.IMREAD_COLOR
+        for factor, reduced in ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4),
+                                (2, cv2.IMREAD_REDUCED_COLOR_2)):
+            if long_edge // factor >= settings.IMAGE_DISPLAY_SIZE:
+                flags = reduced
+                break
+        # Orientation is applied after downscaling, where rotating is cheap
+        decoded = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), flags | cv2.IMREAD_IGNORE_ORIENTATION)
+        if decoded is None:
+            raise ImageDecodeError("Uploaded file is not a valid image")
+        pixels = _orient(_resize(decoded, fit_within(_size(decoded), settings.IMAGE_INFERENCE_SIZE)), orientation)
+    return PreparedImage(pixels, decoded, orientation, f".{settings.IMAGE_FORMAT}")
+
+
+def encode_display(prepared):
+    """The copy to store: upright, at most IMAGE_DISPLAY_SIZE on the long edge, no metadata."""
+    decoded = prepared.decoded
+    display = _orient(_resize(decoded, fit_within(_size(decoded), settings.IMAGE_DISPLAY_SIZE)), prepared.orientation)
+    return encode_image(display, prepared.extension, settings.IMAGE_QUALITY)
+
+
+def encode_thumbnail(prepared):
+    pixels = prepared.pixels
+    thumbnail = _resize(pixels, fit_within(_size(pixels), settings.IMAGE_THUMBNAIL_SIZE))
+    return encode_image(thumbnail, prepared.extension, settings.IMAGE_THUMBNAIL_QUALITY)
+
+
+def write_image(path, data):
+    """
+    Write to a temp name and rename into place, so a reader never sees a
+    half-written image. `data` may be a callable returning the bytes, so
+    encoding can happen on the background writer too.
+    """
+    with WRITE_SECONDS.time():
+        if callable(data):
+            data = data()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.part"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+
+class BackgroundImageWriter:
+    """
+    Writes image bytes to disk (via write_image) on a daemon thread so uploads
+    don't wait on the filesystem.
+    """
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='image-writer', daemon=True)
+                self._thread.start()
+
+    def submit(self, path, data):
+        self._ensure_started()
+        self._queue.put((path, data))
+
+    def flush(self):
+        """Block until every submitted image has been written."""
+        self._queue.join()
+
+    def _run(self):
+        while True:
+            path, data = self._queue.get()
+            try:
+                write_image(path, data)
+            except OSError as e:
+                print(f"Image write failed for {path}: {e}")
+            finally:
+                self._queue.task_done()
+
+
+image_writer = BackgroundImageWriter()
+# Don't drop queued uploads when a worker exits cleanly
+atexit.register(image_writer.flush)
@@ -0,0 +1,424 @@
+# api/inference.py
+"""
+YOLO inference backends used by the meal views.
+
+- LocalDetector:   in-process model (default; used by tests and single-process runs)
+- InferenceClient: talks to a shared InferenceServer over a Unix socket
+- InferenceServer: loads best.pt once for the whole host and micro-batches
+                   requests from every gunicorn worker into one predict() call
+
+Wire format (both directions): struct '!II' (header length, body length),
+a JSON header, then the raw body bytes.
+"""
+import os
+import json
+import queue
+import socket
+import struct
+import threading
+import time
+from collections import namedtuple
+from django.conf import settings
+
+from .images import decode_image, ImageDecodeError
+from .metrics import MEAL_STAGE_SECONDS
+from .detection_cache import DetectionCache, dhash, model_version
+
+# One detection pass over one image
+Detection = namedtuple('Detection', ['class_ids', 'boxes', 'confidences'])
+
+_FRAME = struct.Struct('!II')
+
+# One observation per predict() call (a whole batch)
+INFERENCE_SECONDS = MEAL_STAGE_SECONDS.labels('inference')
+
+
+class InferenceError(Exception):
+    """Raised when the inference backend cannot produce a detection."""
+
+
+# --- Helpers ---
+
+def pin_torch_threads(num_threads):
+    """Cap torch intra/inter-op threads so several model users don't oversubscribe the CPU."""
+    if not num_threads:
+        return
+    os.environ.setdefault('OMP_NUM_THREADS', str(num_threads))
+    os.environ.setdefault('MKL_NUM_THREADS', str(num_threads))
+    import torch
+    torch.set_num_threads(num_threads)
+    try:
+        torch.set_num_interop_threads(num_threads)
+    except RuntimeError:
+        # Only allowed once per process, before any parallel work has started
+        pass
+
+
+def load_yolo(model_path):
+    from ultralytics import YOLO
+    return YOLO(model_path)
+
+
+def to_detection(result):
+    """Convert an ultralytics Results object into a plain Detection."""
+    boxes = result.boxes
+    return Detection(
+        class_ids=[int(c) for c in boxes.cls.tolist()],
+        boxes=boxes.xyxy.tolist(),
+        confidences=boxes.conf.tolist(),
+    )
+
+
+def _recv_exact(conn, size):
+    buf = bytearray(size)
+    view = memoryview(buf)
+    received = 0
+    while received < size:
+        n = conn.recv_into(view[received:], size - received)
+        if n == 0:
+            raise ConnectionError("Inference socket closed")
+        received += n
+    return bytes(buf)
+
+
+def send_frame(conn, header, body=b''):
+    header_bytes = json.dumps(header).encode()
+    conn.sendall(_FRAME.pack(len(header_bytes), len(body)) + header_bytes)
+    if body:
+        conn.sendall(body)
+
+
+def recv_frame(conn):
+    header_len, body_len = _FRAME.unpack(_recv_exact(conn, _FRAME.size))
+    header = json.loads(_recv_exact(conn, header_len))
+    body = _recv_exact(conn, body_len) if body_len else b''
+    return header, body
+
+
+def encode_sources(sources):
+    """
+    Pack image paths / encoded bytes / numpy arrays into (item headers, body)
+    for the wire. Paths are read here: the server never opens a file a
+    client names.
+    """
+    items = []
+    chunks = []
+    for source in sources:
+        if isinstance(source, (str, os.PathLike)):
+            with open(source, 'rb') as f:
+                source = f.read()
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            # Still-encoded upload: far smaller than pixels, decoded on the server side
+            items.append({'kind': 'encoded', 'size': len(source)})
+            chunks.append(bytes(source))
+            continue
+        import numpy as np
+        array = np.ascontiguousarray(source)
+        data = array.tobytes()
+        items.append({'kind': 'array', 'shape': list(array.shape), 'dtype': array.dtype.str, 'size': len(data)})
+        chunks.append(data)
+    return items, b''.join(chunks)
+
+
+def decode_sources(items, body):
+    sources = []
+    offset = 0
+    view = memoryview(body)
+    for item in items:
+        size = item['size']
+        if item['kind'] == 'encoded':
+            sources.append(decode_image(view[offset:offset + size]))
+        elif item['kind'] == 'array':
+            import numpy as np
+            array = np.frombuffer(view[offset:offset + size], dtype=item['dtype']).reshape(item['shape'])
+            sources.append(array)
+        else:
+            raise ValueError(f"unsupported source kind {item['kind']!r}")
+        offset += size
+    return sources
+
+
+def decode_encoded(sources):
+    """Decode any still-encoded (bytes) sources into numpy arrays."""
+    return [decode_image(s) if isinstance(s, (bytes, bytearray, memoryview)) else s for s in sources]
+
+
+def image_hash(source):
+    """Perceptual hash for decoded images; None for paths, which bypass the cache."""
+    return None if isinstance(source, (str, os.PathLike)) else dhash(source)
+
+
+def build_detection_cache():
+    return DetectionCache(settings.DETECTION_CACHE_SIZE, settings.DETECTION_CACHE_MAX_DISTANCE)
+
+
+# --- Backends ---
+
+class LocalDetector:
+    """Runs the model in this process. predict() calls are serialized with a lock."""
+
+    def __init__(self, model_path=None, model=None, conf=0.5, imgsz=640, num_threads=None, cache=None):
+        self.model_path = model_path
+        self.conf = conf
+        self.imgsz = imgsz
+        self._lock = threading.Lock()
+        if model is None:
+            pin_torch_threads(num_threads)
+            model = load_yolo(model_path)
+        self.model = model
+        self.cache = cache or DetectionCache(max_entries=0)
+        self.cache.set_version(model_version(model_path, conf, imgsz))
+
+    @property
+    def names(self):
+        return self.model.names
+
+    def detect(self, source):
+        return self.detect_batch([source])[0]
+
+    def detect_batch(self, sources):
+        # Decode and hash outside the lock so only predict() itself is serialized
+        sources = decode_encoded(sources)
+        hashes = [image_hash(s) for s in sources] if self.cache.enabled else [None] * len(sources)
+        detections = [self.cache.get(h) if h is not None else None for h in hashes]
+
+        missing = [i for i, d in enumerate(detections) if d is None]
+        if missing:
+            with self._lock, INFERENCE_SECONDS.time():
+                results = self.model.predict(
+                    source=[sources[i] for i in missing], conf=self.conf, imgsz=self.imgsz, verbose=False
+                )
+            for i, result in zip(missing, results):
+                detections[i] = to_detection(result)
+                if hashes[i] is not None:
+                    self.cache.put(hashes[i], detections[i])
+        return detections
+
+    def stats(self):
+        return {'cache': self.cache.stats()}
+
+
+class InferenceClient:
+    """Client for InferenceServer. Keeps one persistent connection per thread."""
+
+    def __init__(self, socket_path, timeout=30.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._names = None
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            conn.settimeout(self.timeout)
+            conn.connect(self.socket_path)
+            self._local.conn = conn
+        return conn
+
+    def _close(self):
+        conn = getattr(self._local, 'conn', None)
+        self._local.conn = None
+        if conn is not None:
+            conn.close()
+
+    def _call(self, header, body=b''):
+        # Retry once on a fresh connection (e.g. the server was restarted)
+        for attempt in range(2):
+            try:
+                conn = self._connection()
+                send_frame(conn, header, body)
+                response, _ = recv_frame(conn)
+                break
+            except OSError as e:
+                self._close()
+                if attempt:
+                    raise InferenceError(f"Inference server unavailable: {e}") from e
+        if 'error' in response:
+            if response.get('code') == 'invalid_image':
+                raise ImageDecodeError(response['error'])
+            raise InferenceError(response['error'])
+        return response
+
+    @property
+    def names(self):
+        if self._names is None:
+            names = self._call({'op': 'names'})['names']
+            self._names = {int(k): v for k, v in names.items()}
+        return self._names
+
+    def detect(self, source):
+        return self.detect_batch([source])[0]
+
+    def stats(self):
+        """Detection cache and batching counters from the server (shared by every worker)."""
+        return self._call({'op': 'stats'})['stats']
+
+    def detect_batch(self, sources):
+        items, body = encode_sources(sources)
+        response = self._call({'op': 'detect', 'items': items}, body)
+        return [Detection(**d) for d in response['detections']]
+
+
+class _Pending:
+    __slots__ = ('source', 'hash', 'detection', 'error', 'done')
+
+    def __init__(self, source):
+        self.source = source
+        self.hash = None
+        self.detection = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class InferenceServer:
+    """
+    Owns the only copy of the model on the host. Requests that arrive within
+    `window_ms` of each other (up to `max_batch`) share a single predict() call.
+    """
+
+    def __init__(self, model_path, socket_path, window_ms=5, max_batch=16,
+                 num_threads=None, conf=0.5, imgsz=640, model=None, cache=None):
+        self.model_path = model_path
+        self.socket_path = socket_path
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self.num_threads = num_threads
+        self.conf = conf
+        self.imgsz = imgsz
+        self.model = model
+        self.cache = cache or DetectionCache(max_entries=0)
+        self.batches = 0
+        self.images = 0
+        self._queue = queue.Queue()
+        self._sock = None
+
+    def start(self):
+        """Load the model, bind the socket and start the batcher; returns immediately."""
+        if self.model is None:
+            pin_torch_threads(self.num_threads)
+            self.model = load_yolo(self.model_path)
+        self._names = {int(k): v for k, v in self.model.names.items()}
+        self.cache.set_version(model_version(self.model_path, self.conf, self.imgsz))
+
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.bind(self.socket_path)
+        os.chmod(self.socket_path, 0o660)
+        self._sock.listen(128)
+
+        threading.Thread(target=self._batch_loop, name='yolo-batcher', daemon=True).start()
+        threading.Thread(target=self._accept_loop, name='yolo-accept', daemon=True).start()
+
+    def serve_forever(self):
+        self.start()
+        try:
+            while True:
+                time.sleep(3600)
+        finally:
+            self.close()
+
+    def close(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+    def _accept_loop(self):
+        while self._sock is not None:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def _handle(self, conn):
+        with conn:
+            while True:
+                try:
+                    header, body = recv_frame(conn)
+                except (ConnectionError, OSError, ValueError):
+                    return
+
+                op = header.get('op')
+                if op == 'names':
+                    send_frame(conn, {'names': self._names})
+                elif op == 'stats':
+                    send_frame(conn, {'stats': self.stats()})
+                elif op == 'detect':
+                    try:
+                        pendings = [_Pending(s) for s in decode_sources(header['items'], body)]
+                    except ImageDecodeError as e:
+                        send_frame(conn, {'error': str(e), 'code': 'invalid_image'})
+                        continue
+                    except (KeyError, ValueError) as e:
+                        send_frame(conn, {'error': f"Bad detect request: {e}"})
+                        continue
+                    for pending in pendings:
+                        # Cache hits are answered here and never reach the batcher
+                        if self.cache.enabled:
+                            pending.hash = image_hash(pending.source)
+                            if pending.hash is not None:
+                                pending.detection = self.cache.get(pending.hash)
+                        if pending.detection is not None:
+                            pending.done.set()
+                        else:
+                            self._queue.put(pending)
+                    for pending in pendings:
+                        pending.done.wait()
+                    errors = [p.error for p in pendings if p.error]
+                    if errors:
+                        send_frame(conn, {'error': errors[0]})
+                    else:
+                        send_frame(conn, {'detections': [p.detection._asdict() for p in pendings]})
+                else:
+                    send_frame(conn, {'error': f"Unknown op: {op}"})
+
+    def stats(self):
+        return {'cache': self.cache.stats(), 'batches': self.batches, 'images': self.images}
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _batch_loop(self):
+        while True:
+            batch = self._next_batch()
+            try:
+                with INFERENCE_SECONDS.time():
+                    results = self.model.predict(
+                        source=[p.source for p in batch], conf=self.conf, imgsz=self.imgsz, verbose=False
+                    )
+                for pending, result in zip(batch, results):
+                    pending.detection = to_detection(result)
+                    if pending.hash is not None:
+                        self.cache.put(pending.hash, pending.detection)
+            except Exception as e:
+                for pending in batch:
+                    pending.error = f"Inference failed: {e}"
+            self.batches += 1
+            self.images += len(batch)
+            for pending in batch:
+                pending.done.set()
+
+
+# --- Factory ---
+
+def build_detector():
+    """Detector selected by settings.YOLO_INFERENCE_MODE ('local' or 'socket')."""
+    if settings.YOLO_INFERENCE_MODE == 'socket':
+        return InferenceClient(settings.YOLO_INFERENCE_SOCKET, timeout=settings.YOLO_INFERENCE_TIMEOUT)
+    return LocalDetector(
+        settings.YOLO_MODEL_PATH, num_threads=settings.YOLO_TORCH_THREADS, cache=build_detection_cache()
+    )
@@ -0,0 +1,39 @@
+# api/management/commands/gc_images.py
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.storage import collect_garbage, recount_references, sweep_orphans
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete meal images (and thumbnails) that no Meal or unfinished MealJob has used "
+        "for --grace seconds."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace', type=int, default=None,
+                            help="Seconds a blob must stay unreferenced (default IMAGE_GC_GRACE_SECONDS)")
+        parser.add_argument('--dry-run', action='store_true', help="Report what would be removed")
+        parser.add_argument('--recount', action='store_true',
+                            help="First correct reference counts from the Meal/MealJob tables")
+        parser.add_argument('--orphans', action='store_true',
+                            help="Also delete files under media/meals that no blob row names (walks the tree)")
+
+    def handle(self, *args, **options):
+        grace = settings.IMAGE_GC_GRACE_SECONDS if options['grace'] is None else options['grace']
+        dry_run = options['dry_run']
+        verb = "would be" if dry_run else "were"
+
+        if options['recount']:
+            if dry_run:
+                self.stdout.write("--recount skipped in a dry run")
+            else:
+                self.stdout.write(f"{recount_references(grace)} reference counts corrected")
+
+        removed, freed = collect_garbage(grace, dry_run=dry_run)
+        self.stdout.write(f"{removed} unreferenced images {verb} removed ({freed / 2**20:.1f} MiB)")
+
+        if options['orphans']:
+            removed, freed = sweep_orphans(grace, dry_run=dry_run)
+            self.stdout.write(f"{removed} orphaned files {verb} removed ({freed / 2**20:.1f} MiB)")
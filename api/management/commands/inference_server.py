@@ -0,0 +1,34 @@
+# api/management/commands/inference_server.py
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.inference import InferenceServer, build_detection_cache
+from api.metrics import start_exporter
+
+
+class Command(BaseCommand):
+    help = "Run the shared micro-batching YOLO inference server on a Unix socket."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--socket', default=settings.YOLO_INFERENCE_SOCKET)
+        parser.add_argument('--model', default=settings.YOLO_MODEL_PATH)
+        parser.add_argument('--window-ms', type=float, default=settings.YOLO_BATCH_WINDOW_MS)
+        parser.add_argument('--max-batch', type=int, default=settings.YOLO_MAX_BATCH)
+        parser.add_argument('--threads', type=int, default=settings.YOLO_TORCH_THREADS)
+
+    def handle(self, *args, **options):
+        # Stage timings from this process show up in /metrics via METRICS_DIR
+        start_exporter()
+        server = InferenceServer(
+            model_path=options['model'],
+            socket_path=options['socket'],
+            window_ms=options['window_ms'],
+            max_batch=options['max_batch'],
+            num_threads=options['threads'],
+            cache=build_detection_cache(),
+        )
+        self.stdout.write(
+            f"Serving {options['model']} on {options['socket']} "
+            f"(window={options['window_ms']}ms, max_batch={options['max_batch']}, threads={options['threads']})"
+        )
+        server.serve_forever()
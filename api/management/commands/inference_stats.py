@@ -0,0 +1,43 @@
+# api/management/commands/inference_stats.py
+import json
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.metrics import DETECTION_CACHE_EVICTIONS, DETECTION_CACHE_LOOKUPS, read_snapshots
+
+
+def counter_values(snapshot, metric):
+    """{label values: count} of one counter in a (merged) snapshot."""
+    samples = snapshot.get(metric.name, {}).get('samples', {})
+    return {tuple(json.loads(labels)): int(values[0]) for labels, values in samples.items()}
+
+
+class Command(BaseCommand):
+    help = (
+        "Print detection-cache hit/miss/eviction counts summed over every serving process "
+        "(from their METRICS_DIR snapshots), plus batching stats in socket mode."
+    )
+
+    def handle(self, *args, **options):
+        # The counts live in the processes that run detections, never in this one
+        if not settings.METRICS_DIR:
+            raise CommandError(
+                "Set METRICS_DIR (the same directory the serving processes use), "
+                "or read foodbackend_detection_cache_* from GET /metrics"
+            )
+        snapshot = read_snapshots()
+        lookups = counter_values(snapshot, DETECTION_CACHE_LOOKUPS)
+        hits, misses = lookups.get(('hit',), 0), lookups.get(('miss',), 0)
+        stats = {
+            'cache': {
+                'hits': hits,
+                'misses': misses,
+                'hit_rate': hits / (hits + misses) if hits + misses else 0.0,
+                'evictions': counter_values(snapshot, DETECTION_CACHE_EVICTIONS).get((), 0),
+            },
+        }
+        if settings.YOLO_INFERENCE_MODE == 'socket':
+            from api.registry import YOLO_DETECTOR
+            # Asks the running inference_server (batches, images, its cache size)
+            stats['server'] = YOLO_DETECTOR.get().stats()
+        self.stdout.write(json.dumps(stats, indent=2))
@@ -0,0 +1,34 @@
+# api/management/commands/meal_worker.py
+import time
+import datetime
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.meals import claim_jobs, process_jobs, requeue_stale_jobs
+from api.metrics import start_exporter
+
+
+class Command(BaseCommand):
+    help = "Drain queued async meal uploads (MealJob) in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.MEAL_JOB_BATCH_SIZE)
+        parser.add_argument('--poll-interval', type=float, default=0.5, help="Seconds to sleep when the queue is empty")
+        parser.add_argument('--stale-after', type=int, default=600, help="Requeue jobs running longer than this (seconds)")
+        parser.add_argument('--once', action='store_true', help="Drain what is queued now, then exit")
+
+    def handle(self, *args, **options):
+        # Stage timings from this process show up in /metrics via METRICS_DIR
+        start_exporter()
+        requeued = requeue_stale_jobs(datetime.timedelta(seconds=options['stale_after']))
+        if requeued:
+            self.stdout.write(f"Requeued {requeued} stale job(s)")
+
+        while True:
+            processed = process_jobs(claim_jobs(options['batch_size']))
+            if processed:
+                self.stdout.write(f"Processed {processed} job(s)")
+            elif options['once']:
+                return
+            else:
+                time.sleep(options['poll_interval'])
@@ -0,0 +1,43 @@
+# api/management/commands/profiles.py
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.profiling import list_profiles, make_header, render
+
+
+class Command(BaseCommand):
+    help = "List saved request profiles, render one, or sign an X-Profile header."
+
+    def add_arguments(self, parser):
+        parser.add_argument('profile_id', nargs='?', help="Render this profile (an id from the list, or 'latest')")
+        parser.add_argument('--sort', default='cumulative', help="pstats sort key: cumulative, tottime, calls, ...")
+        parser.add_argument('--limit', type=int, default=30, help="Rows to print")
+        parser.add_argument('--sign', action='store_true', help="Print a signed X-Profile header value")
+        parser.add_argument('--ttl', type=int, default=600, help="Seconds the signed header stays valid")
+
+    def handle(self, *args, **options):
+        if options['sign']:
+            if not settings.PROFILING_SECRET:
+                raise CommandError("PROFILING_SECRET is not set")
+            self.stdout.write(f"X-Profile: {make_header(options['ttl'])}")
+            return
+
+        profiles = list_profiles()
+        if options['profile_id']:
+            known = {p['id']: p for p in profiles}
+            profile_id = profiles[0]['id'] if options['profile_id'] == 'latest' and profiles else options['profile_id']
+            if profile_id not in known:
+                raise CommandError(f"No saved profile {options['profile_id']!r} in {settings.PROFILING_DIR}")
+            profile = known[profile_id]
+            self.stdout.write(f"{profile['method']} {profile['path']} -> {profile['status']} in {profile['ms']} ms")
+            self.stdout.write(render(profile_id, sort=options['sort'], limit=options['limit']))
+            return
+
+        if not profiles:
+            self.stdout.write(f"No profiles in {settings.PROFILING_DIR}")
+            return
+        for profile in profiles:
+            self.stdout.write(
+                f"{profile['id']}  {profile['time']}  {profile['method']} {profile['path']}"
+                f"  {profile['status']}  {profile['ms']} ms  {profile['calls']} calls"
+            )
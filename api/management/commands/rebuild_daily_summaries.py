@@ -0,0 +1,61 @@
+# api/management/commands/rebuild_daily_summaries.py
+import datetime
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from api.models import User
+from api.reports import rebuild_daily_summaries, summary_drift
+
+
+class Command(BaseCommand):
+    help = (
+        "Backfill/repair DailyNutritionSummary from Meal, a batch of users at a time. "
+        "With --verify, only report rows that drifted."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200, help="Users per batch")
+        parser.add_argument('--user', type=int, action='append', dest='user_ids', help="Limit to these user ids")
+        parser.add_argument('--verify', action='store_true', help="Report drift without writing")
+        parser.add_argument('--repair-drifted', action='store_true',
+                            help="Rebuild only the batches where drift was found")
+        parser.add_argument('--days', type=int,
+                            help="Look for drift in the last N days only (31 covers the daily and monthly views)")
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by('pk').values_list('pk', flat=True)
+        if options['user_ids']:
+            users = users.filter(pk__in=options['user_ids'])
+
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError("--batch-size must be positive")
+
+        start_date = None
+        if options['days'] is not None:
+            if options['days'] < 1:
+                raise CommandError("--days must be positive")
+            # One day more than asked: "today" is a day behind UTC for users west of it
+            start_date = timezone.localdate() - datetime.timedelta(days=options['days'])
+
+        user_ids = list(users)
+        total_drift = rebuilt = 0
+        for start in range(0, len(user_ids), batch_size):
+            batch = user_ids[start:start + batch_size]
+
+            if options['verify'] or options['repair_drifted']:
+                drift = summary_drift(batch, start_date)
+                total_drift += len(drift)
+                for user_id, date, have, want in drift[:20]:
+                    self.stdout.write(f"drift user={user_id} date={date} stored={have} expected={want}")
+                if options['verify'] or not drift:
+                    continue
+
+            rebuilt += rebuild_daily_summaries(batch)
+
+        if options['verify']:
+            self.stdout.write(f"{len(user_ids)} users checked, {total_drift} drifted day(s)")
+            if total_drift:
+                raise CommandError("DailyNutritionSummary has drifted; rerun without --verify to repair")
+        else:
+            self.stdout.write(f"{len(user_ids)} users processed, {rebuilt} day summaries written")
@@ -0,0 +1,90 @@
+# api/management/commands/startup_report.py
+import os
+import sys
+import json
+import time
+import subprocess
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.registry import registry, current_rss_bytes
+
+MIB = 1024 * 1024
+
+
+class Command(BaseCommand):
+    help = (
+        "Report import time and resident memory per lazily loaded component "
+        "(each measured in a fresh interpreter so earlier loads don't hide its cost)."
+    )
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('components', nargs='*', help="Default: every registered component")
+        parser.add_argument('--json', action='store_true', help="Print machine-readable JSON")
+        # Internal: run inside the child interpreter
+        parser.add_argument('--measure', help=argparse_suppress())
+
+    def handle(self, *args, **options):
+        if options['measure']:
+            self.stdout.write(json.dumps(self.measure(options['measure'])))
+            return
+
+        names = options['components'] or registry.names()
+        unknown = set(names) - set(registry.names())
+        if unknown:
+            raise CommandError(f"Unknown component(s): {', '.join(sorted(unknown))}")
+
+        rows = [self.measure_in_child(name) for name in names]
+        if options['json']:
+            self.stdout.write(json.dumps(rows, indent=2))
+            return
+
+        self.stdout.write(f"{'component':<14}{'app import':>12}{'load':>10}{'RSS +MiB':>10}  status")
+        for row in rows:
+            status = 'ok' if row['ok'] else f"failed: {row['error']}"
+            self.stdout.write(
+                f"{row['component']:<14}{row['app_import_seconds']:>11.2f}s{row['load_seconds']:>9.2f}s"
+                f"{row['rss_delta_bytes'] / MIB:>10.1f}  {status}"
+            )
+
+    def measure(self, name):
+        """Cost of importing the API modules, then of loading one component."""
+        rss_before = current_rss_bytes()
+        start = time.perf_counter()
+        import api.views  # noqa: F401  (what every process pays before any component)
+        app_import_seconds = time.perf_counter() - start
+        app_rss = current_rss_bytes() - rss_before
+
+        resource = registry[name]
+        row = {
+            'component': name,
+            'app_import_seconds': app_import_seconds,
+            'app_rss_bytes': app_rss,
+            'ok': True,
+            'error': None,
+        }
+        rss_before = current_rss_bytes()
+        start = time.perf_counter()
+        try:
+            resource.get()
+        except Exception as e:
+            row.update(ok=False, error=f"{type(e).__name__}: {e}")
+        row['load_seconds'] = time.perf_counter() - start
+        row['rss_delta_bytes'] = current_rss_bytes() - rss_before
+        return row
+
+    def measure_in_child(self, name):
+        result = subprocess.run(
+            [sys.executable, '-m', 'django', 'startup_report', '--measure', name],
+            cwd=settings.BASE_DIR, env=os.environ.copy(), capture_output=True, text=True,
+        )
+        lines = result.stdout.strip().splitlines()
+        if result.returncode != 0 or not lines:
+            raise CommandError(f"Measuring {name} failed:\n{result.stderr}")
+        return json.loads(lines[-1])
+
+
+def argparse_suppress():
+    import argparse
+    return argparse.SUPPRESS
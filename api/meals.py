@@ -0,0 +1,275 @@
+# api/meals.py
+"""
+Meal ingestion shared by the synchronous add_meal view and the async job worker:
+detection -> nutrition lookup -> Meal and MealItem rows -> response payload.
+"""
+import os
+import json
+from functools import partial
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Meal, MealJob
+from .nutrition import NUTRITION_INDEX
+from .inference import InferenceError
+from .registry import YOLO_DETECTOR
+from .images import ImageDecodeError, decode_image, encode_display, encode_thumbnail, write_image
+from .reports import apply_meal_to_summary, apply_meals_to_summaries
+from .metrics import MEAL_STAGE_SECONDS
+from .storage import acquire_images, release_images, image_path, thumbnail_name
+from .foods import save_meal_items
+
+NUTRITION_SECONDS = MEAL_STAGE_SECONDS.labels('nutrition')
+DB_INSERT_SECONDS = MEAL_STAGE_SECONDS.labels('db_insert')
+
+_class_entry_ids = None
+
+
+def get_class_entry_ids():
+    """Every YOLO class name resolved to its nutrition entry once, not per detection."""
+    global _class_entry_ids
+    if _class_entry_ids is None:
+        _class_entry_ids = NUTRITION_INDEX.bind_classes(YOLO_DETECTOR.get().names)
+    return _class_entry_ids
+
+
+def store_images(image_name, prepared, write=write_image):
+    """
+    Encode and write a PreparedImage and its thumbnail unless this content is
+    already stored; with write=image_writer.submit both happen off the
+    request path. Call after acquire_images, so gc_images cannot remove the
+    files in between.
+    """
+    if os.path.exists(image_path(image_name)):
+        return
+    write(image_path(image_name), partial(encode_display, prepared))
+    write(image_path(thumbnail_name(image_name)), partial(encode_thumbnail, prepared))
+
+
+def build_meal(user, meal_type, detection, image_name, thumbnail=None):
+    """
+    Unsaved Meal with nutrition filled in for one detection (thumbnail is a
+    name under meals/, like image_name).
+    Returns (meal, detected item names); meal is None when nothing was detected.
+    """
+    class_ids = detection.class_ids
+    names = YOLO_DETECTOR.get().names
+    detected_items = [names[cls_id] for cls_id in class_ids]
+
+    if not detected_items:
+        return None, detected_items
+
+    # ✅ Calculate calories and macros (pre-parsed index, unknown items default to 100 kcal)
+    with NUTRITION_SECONDS.time():
+        class_entry_ids = get_class_entry_ids()
+        total_calories, total_protein, total_carbs, total_fats = NUTRITION_INDEX.totals(
+            class_entry_ids[cls_id] for cls_id in class_ids
+        )
+
+    meal = Meal(
+        user=user,
+        mealType=meal_type,
+        calories=total_calories,
+        protein=total_protein,
+        carbs=total_carbs,
+        fats=total_fats,
+        items=", ".join(detected_items),
+        image=f"meals/{image_name}",
+        thumbnail=f"meals/{thumbnail}" if thumbnail else None,
+    )
+    return meal, detected_items
+
+
+def meal_payload(meal, detected_items):
+    """What POST /meals/ returns for a saved meal, with image URLs still relative to the site."""
+    if meal is None:
+        return {'message': 'No food detected'}
+    return {
+        "message": "Meal detected and saved successfully",
+        "meal": {
+            "id": meal.id,
+            "items": detected_items,
+            "calories": meal.calories,
+            "protein": meal.protein,
+            "carbs": meal.carbs,
+            "fats": meal.fats,
+            "macros": meal.macros,
+            "imageUrl": meal.image.url if meal.image else None,
+            "thumbnailUrl": meal.thumbnail.url if meal.thumbnail else None
+        }
+    }
+
+
+def save_detected_meal(user, meal_type, detection, image_name, thumbnail=None):
+    """
+    Turn one detection into a saved Meal.
+    Returns (meal, payload); meal is None when nothing was detected.
+    """
+    meal, detected_items = build_meal(user, meal_type, detection, image_name, thumbnail)
+    if meal is not None:
+        # ✅ Save meal in DB, together with its MealItems, its day's DailyNutritionSummary and image reference
+        with DB_INSERT_SECONDS.time(), transaction.atomic():
+            meal.save()
+            save_meal_items([(meal, detected_items, detection.confidences)])
+            apply_meal_to_summary(meal)
+            acquire_images([meal.image.name])
+    return meal, meal_payload(meal, detected_items)
+
+
+def save_detected_meals(user, entries):
+    """
+    Batch version of save_detected_meal for [(meal_type, detection, image_name, thumbnail)]:
+    every meal goes in with one bulk_create (another for all their MealItems)
+    and one summary update per day, in a single transaction.
+    Returns [(meal, payload)] in the same order.
+    """
+    built = [build_meal(user, *entry) for entry in entries]
+    meals = [meal for meal, _ in built if meal is not None]
+    if meals:
+        with DB_INSERT_SECONDS.time(), transaction.atomic():
+            Meal.objects.bulk_create(meals)
+            save_meal_items(
+                (meal, detected_items, entry[1].confidences)
+                for (meal, detected_items), entry in zip(built, entries) if meal is not None
+            )
+            apply_meals_to_summaries(meals)
+            acquire_images([meal.image.name for meal in meals])
+    return [(meal, meal_payload(meal, detected_items)) for meal, detected_items in built]
+
+
+def detect_each(sources):
+    """
+    Detect several encoded images with one batched call. An undecodable image
+    fails alone: the rest are still detected together.
+    Returns [(detection, error message)] in order; InferenceError propagates.
+    """
+    if not sources:
+        return []
+    yolo_detector = YOLO_DETECTOR.get()
+    try:
+        return [(detection, None) for detection in yolo_detector.detect_batch(sources)]
+    except ImageDecodeError:
+        pass
+
+    errors = {}
+    for index, source in enumerate(sources):
+        try:
+            decode_image(source)
+        except ImageDecodeError as e:
+            errors[index] = str(e)
+    good = [index for index in range(len(sources)) if index not in errors]
+    detections = dict(zip(good, yolo_detector.detect_batch([sources[i] for i in good]))) if good else {}
+    return [(detections.get(index), errors.get(index)) for index in range(len(sources))]
+
+
+def delete_user_meal(meal):
+    """Delete a meal, take it out of its day's summary and release its image, in one transaction."""
+    with transaction.atomic():
+        apply_meal_to_summary(meal, sign=-1)
+        release_images([meal.image.name])
+        meal.delete()
+
+
+def absolutize_payload(request, payload):
+    """Make the payload's image URLs absolute for this request (as add_meal always returned them)."""
+    meal = payload.get('meal')
+    if not meal:
+        return payload
+    urls = {key: request.build_absolute_uri(meal[key]) for key in ('imageUrl', 'thumbnailUrl') if meal.get(key)}
+    return {**payload, 'meal': {**meal, **urls}}
+
+
+# --- Async ingestion (durable queue in the MealJob table) ---
+
+def enqueue_meal_job(user, meal_type, image_name, prepared):
+    """
+    Persist a PreparedImage and queue it for the worker. The job holds an
+    image reference until it finishes; the files are written before the job
+    is visible to workers.
+    """
+    with transaction.atomic():
+        acquire_images([f"meals/{image_name}"])
+        store_images(image_name, prepared)
+        return MealJob.objects.create(user=user, mealType=meal_type, image=f"meals/{image_name}")
+
+
+def claim_jobs(batch_size):
+    """
+    Atomically move up to `batch_size` pending jobs to running. The conditional
+    UPDATE means two workers can never claim the same job, on SQLite or PostgreSQL.
+    """
+    candidate_ids = list(
+        MealJob.objects.filter(status=MealJob.PENDING).order_by('createdAt').values_list('id', flat=True)[:batch_size]
+    )
+    claimed = []
+    for job_id in candidate_ids:
+        if MealJob.objects.filter(id=job_id, status=MealJob.PENDING).update(
+            status=MealJob.RUNNING, updatedAt=timezone.now()
+        ):
+            claimed.append(job_id)
+    return list(MealJob.objects.filter(id__in=claimed).select_related('user').order_by('createdAt'))
+
+
+def requeue_stale_jobs(stale_after):
+    """Hand jobs left running by a crashed worker back to the queue."""
+    cutoff = timezone.now() - stale_after
+    return MealJob.objects.filter(status=MealJob.RUNNING, updatedAt__lt=cutoff).update(
+        status=MealJob.PENDING, updatedAt=timezone.now()
+    )
+
+
+def _fail_job(job, error, permanent=False):
+    """Retry transient failures up to MEAL_JOB_MAX_ATTEMPTS; bad input fails immediately."""
+    job.attempts += 1
+    if permanent or job.attempts >= settings.MEAL_JOB_MAX_ATTEMPTS:
+        job.status = MealJob.FAILED
+        job.error = error
+    else:
+        job.status = MealJob.PENDING
+    with transaction.atomic():
+        job.save(update_fields=['status', 'attempts', 'error', 'updatedAt'])
+        if job.status == MealJob.FAILED:
+            release_images([job.image.name])
+
+
+def process_jobs(jobs):
+    """Run one batched detection over the claimed jobs and record each outcome."""
+    if not jobs:
+        return 0
+
+    sources = []
+    runnable = []
+    for job in jobs:
+        try:
+            with open(os.path.join(settings.MEDIA_ROOT, job.image.name), 'rb') as f:
+                sources.append(f.read())
+            runnable.append(job)
+        except OSError as e:
+            _fail_job(job, f"Image missing: {e}", permanent=True)
+
+    try:
+        results = detect_each(sources)
+    except InferenceError as e:
+        for job in runnable:
+            _fail_job(job, str(e))
+        return len(jobs)
+
+    for job, (detection, error) in zip(runnable, results):
+        if error:
+            _fail_job(job, error, permanent=True)
+            continue
+        image_name = job.image.name[len('meals/'):]
+        # Jobs queued before uploads were normalized have no thumbnail
+        thumbnail = thumbnail_name(image_name)
+        if not os.path.exists(image_path(thumbnail)):
+            thumbnail = None
+        with transaction.atomic():
+            meal, payload = save_detected_meal(job.user, job.mealType, detection, image_name, thumbnail)
+            job.meal = meal
+            job.result = json.dumps(payload)
+            job.status = MealJob.DONE
+            job.save(update_fields=['meal', 'result', 'status', 'updatedAt'])
+            # The meal took its own reference above
+            release_images([job.image.name])
+    return len(jobs)
@@ -0,0 +1,296 @@
+# api/metrics.py
+"""
+In-process metrics rendered in the Prometheus text format at GET /metrics.
+
+Recording is a bisect plus three additions under a per-metric lock (well
+under a microsecond), so everything stays on at full traffic. With METRICS_DIR
+set, every process (gunicorn workers, inference_server, meal_worker) writes a
+snapshot there every METRICS_FLUSH_SECONDS and /metrics serves the sum of all
+of them; without it /metrics shows only the worker that answered.
+"""
+import os
+import json
+import time
+import atexit
+import threading
+import contextvars
+from bisect import bisect_left
+from django.conf import settings
+
+# Seconds; the last bucket (+Inf) is implicit
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+
+
+class _Timer:
+    __slots__ = ('_child', '_start')
+
+    def __init__(self, child):
+        self._child = child
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._child.observe(time.perf_counter() - self._start)
+
+
+class _HistogramChild:
+    __slots__ = ('_lock', '_buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, lock, buckets):
+        self._lock = lock
+        self._buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        index = bisect_left(self._buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def time(self):
+        """`with child.time(): ...` observes the block's wall time in seconds."""
+        return _Timer(self)
+
+    def sample(self):
+        with self._lock:
+            return self.counts + [self.sum, self.count]
+
+
+class _CounterChild:
+    __slots__ = ('_lock', 'value')
+
+    def __init__(self, lock, buckets=None):
+        self._lock = lock
+        self.value = 0.0
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def sample(self):
+        return [self.value]
+
+
+class _Metric:
+    type = None
+    child_class = None
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._children = {}
+
+    def labels(self, *values):
+        """Child for one label combination; keep a reference to skip the lookup on hot paths."""
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self.child_class(self._lock, self.buckets))
+        return child
+
+    def snapshot(self):
+        return {
+            'type': self.type,
+            'help': self.documentation,
+            'labelnames': list(self.labelnames),
+            'buckets': list(self.buckets),
+            'samples': {json.dumps(list(values)): child.sample() for values, child in list(self._children.items())},
+        }
+
+
+class Histogram(_Metric):
+    type = 'histogram'
+    child_class = _HistogramChild
+
+
+class Counter(_Metric):
+    type = 'counter'
+    child_class = _CounterChild
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._metrics.setdefault(name, Histogram(name, documentation, labelnames, buckets))
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._metrics.setdefault(name, Counter(name, documentation, labelnames))
+
+    def snapshot(self):
+        return {name: metric.snapshot() for name, metric in self._metrics.items()}
+
+
+def merge_snapshots(snapshots):
+    """Sum several snapshot() dicts (one per process) sample by sample."""
+    merged = {}
+    for snapshot in snapshots:
+        for name, metric in snapshot.items():
+            target = merged.setdefault(name, {**metric, 'samples': {}})
+            for labels, values in metric['samples'].items():
+                current = target['samples'].get(labels)
+                target['samples'][labels] = (
+                    list(values) if current is None else [a + b for a, b in zip(current, values)]
+                )
+    return merged
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+def render(snapshot):
+    """Prometheus text exposition format (version 0.0.4)."""
+    lines = []
+    for name, metric in sorted(snapshot.items()):
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['type']}")
+        labelnames = metric['labelnames']
+        for labels, values in sorted(metric['samples'].items()):
+            labelvalues = json.loads(labels)
+            if metric['type'] == 'counter':
+                lines.append(f"{name}{_format_labels(labelnames, labelvalues)} {_format_value(values[0])}")
+                continue
+            cumulative = 0
+            bounds = [str(b) for b in metric['buckets']] + ['+Inf']
+            for bound, count in zip(bounds, values[:-2]):
+                cumulative += count
+                lines.append(
+                    f"{name}_bucket{_format_labels(labelnames, labelvalues, [('le', bound)])} {cumulative}"
+                )
+            lines.append(f"{name}_sum{_format_labels(labelnames, labelvalues)} {_format_value(values[-2])}")
+            lines.append(f"{name}_count{_format_labels(labelnames, labelvalues)} {_format_value(values[-1])}")
+    return '\n'.join(lines) + '\n'
+
+
+# --- Cross-process snapshots (METRICS_DIR) ---
+
+_exporter = None
+_exporter_lock = threading.Lock()
+
+
+def write_snapshot():
+    if not settings.METRICS_DIR:
+        return
+    os.makedirs(settings.METRICS_DIR, exist_ok=True)
+    path = os.path.join(settings.METRICS_DIR, f"{os.getpid()}.json")
+    tmp_path = f"{path}.part"
+    with open(tmp_path, 'w') as f:
+        json.dump(metrics.snapshot(), f)
+    os.replace(tmp_path, path)
+
+
+def start_exporter():
+    """Start writing this process's snapshot to METRICS_DIR periodically (no-op without it)."""
+    global _exporter
+    if not settings.METRICS_DIR:
+        return
+    with _exporter_lock:
+        if _exporter is not None and _exporter.is_alive():
+            return
+
+        def run():
+            while True:
+                time.sleep(settings.METRICS_FLUSH_SECONDS)
+                try:
+                    write_snapshot()
+                except OSError as e:
+                    print(f"Metrics snapshot failed: {e}")
+
+        _exporter = threading.Thread(target=run, name='metrics-exporter', daemon=True)
+        _exporter.start()
+        atexit.register(write_snapshot)
+
+
+def collect():
+    """Everything /metrics should show: this process, plus all snapshots in METRICS_DIR."""
+    if not settings.METRICS_DIR:
+        return metrics.snapshot()
+    write_snapshot()
+    return read_snapshots()
+
+
+def read_snapshots():
+    """The sum of every process snapshot in METRICS_DIR, without adding this process's own."""
+    snapshots = []
+    if not os.path.isdir(settings.METRICS_DIR):
+        return {}
+    for entry in os.scandir(settings.METRICS_DIR):
+        if entry.name.endswith('.json'):
+            try:
+                with open(entry.path) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+    return merge_snapshots(snapshots)
+
+
+# --- DB query counting (see MetricsMiddleware) ---
+
+# Holds a one-item list while a request is in flight; sync_to_async threads see the same list
+QUERY_COUNT = contextvars.ContextVar('metrics_query_count', default=None)
+
+
+def count_queries(execute, sql, params, many, context):
+    counter = QUERY_COUNT.get()
+    if counter is not None:
+        counter[0] += 1
+    return execute(sql, params, many, context)
+
+
+def install_query_counter(sender, connection, **kwargs):
+    """connection_created receiver (wired in ApiConfig.ready)."""
+    if count_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_queries)
+
+
+# --- Metrics ---
+
+metrics = MetricsRegistry()
+
+HTTP_REQUEST_SECONDS = metrics.histogram(
+    'foodbackend_http_request_seconds', 'Time to build the response, by URL name.',
+    ['endpoint', 'method', 'status'],
+)
+HTTP_DB_QUERIES = metrics.histogram(
+    'foodbackend_http_db_queries', 'Database queries per request, by URL name.',
+    ['endpoint'], buckets=QUERY_BUCKETS,
+)
+MEAL_STAGE_SECONDS = metrics.histogram(
+    'foodbackend_meal_stage_seconds',
+    'Time per meal ingestion stage (read, normalize, detect, decode, inference, nutrition, db_insert, write).',
+    ['stage'],
+)
+GEMINI_REQUEST_SECONDS = metrics.histogram(
+    'foodbackend_gemini_request_seconds', 'Upstream Gemini calls by outcome (ok, error, unparsable).',
+    ['status'],
+)
+DETECTION_CACHE_LOOKUPS = metrics.counter(
+    'foodbackend_detection_cache_lookups_total', 'Detection cache lookups by result (hit, miss).',
+    ['result'],
+)
+DETECTION_CACHE_EVICTIONS = metrics.counter(
+    'foodbackend_detection_cache_evictions_total', 'Detections dropped from the full detection cache.',
+)
+AUTH_SECONDS = metrics.histogram(
+    'foodbackend_auth_seconds', 'JWT authentication time by outcome (cached, verified, failed).',
+    ['result'],
+)
@@ -0,0 +1,142 @@
+# api/middleware.py
+import time
+import cProfile
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from .metrics import HTTP_DB_QUERIES, HTTP_REQUEST_SECONDS, QUERY_COUNT, start_exporter
+from .profiling import HEADER, save_profile, summary_header, valid_signature
+
+
+class MetricsMiddleware:
+    """
+    Per-endpoint latency and DB query count (api/metrics.py). Works for sync and
+    async views without an extra thread hop. Streaming responses are timed until
+    the response object is returned, not until the body is sent.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        start_exporter()
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        queries = [0]
+        token = QUERY_COUNT.set(queries)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            QUERY_COUNT.reset(token)
+        self.record(request, response, time.perf_counter() - start, queries[0])
+        return response
+
+    async def __acall__(self, request):
+        queries = [0]
+        token = QUERY_COUNT.set(queries)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            QUERY_COUNT.reset(token)
+        self.record(request, response, time.perf_counter() - start, queries[0])
+        return response
+
+    def record(self, request, response, seconds, queries):
+        match = request.resolver_match
+        # URL names only, so label cardinality stays bounded
+        endpoint = match.url_name or match.view_name if match else 'unmatched'
+        HTTP_REQUEST_SECONDS.labels(endpoint, request.method, str(response.status_code)).observe(seconds)
+        HTTP_DB_QUERIES.labels(endpoint).observe(queries)
+
+
+class ProfilingMiddleware:
+    """
+    Runs one request under cProfile when asked to (api/profiling.py) and adds
+    `X-Profile-Summary` to the response. With PROFILING_ENABLED off Django
+    drops it from the chain entirely; when on, requests without `X-Profile`
+    pay one header lookup.
+
+    Under ASGI the profiler also sees whatever else the event loop runs while
+    the request awaits, so profile async views under low load.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if HEADER not in request.META or not self.allowed(request):
+            return self.get_response(request)
+        profiler = self.start_profiler()
+        if profiler is None:
+            return self.get_response(request)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.disable()
+        return self.finish(profiler, request, response, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        if HEADER not in request.META or not await sync_to_async(self.allowed)(request):
+            return await self.get_response(request)
+        profiler = self.start_profiler()
+        if profiler is None:
+            return await self.get_response(request)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            profiler.disable()
+        return await sync_to_async(self.finish)(profiler, request, response, time.perf_counter() - start)
+
+    def start_profiler(self):
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Python 3.12+ allows one active profiler per process; serve this one unprofiled
+            return None
+        return profiler
+
+    def allowed(self, request):
+        """Signed header, or a staff user (admin session or API bearer token)."""
+        if valid_signature(request.META[HEADER]):
+            return True
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_staff:
+            return True
+        from rest_framework.exceptions import AuthenticationFailed
+        from .authentication import JWTGoogleAuthentication
+        try:
+            result = JWTGoogleAuthentication().authenticate(request)
+        except AuthenticationFailed:
+            return False
+        return bool(result and result[0].is_staff)
+
+    def finish(self, profiler, request, response, seconds):
+        match = request.resolver_match
+        endpoint = (match.url_name if match else None) or 'unmatched'
+        try:
+            description = save_profile(profiler, request, response, seconds, endpoint)
+        except OSError as e:
+            print(f"Saving profile failed: {e}")
+            return response
+        response['X-Profile-Summary'] = summary_header(description)
+        return response
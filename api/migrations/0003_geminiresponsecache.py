@@ -0,0 +1,26 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_mealjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeminiResponseCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True)),
+                ('kind', models.CharField(max_length=50)),
+                ('profile', models.TextField()),
+                ('response', models.TextField()),
+                ('hits', models.IntegerField(default=0)),
+                ('createdAt', models.DateTimeField(auto_now_add=True)),
+                ('lastUsedAt', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+        ),
+    ]
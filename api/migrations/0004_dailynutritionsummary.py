@@ -0,0 +1,37 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:11
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_geminiresponsecache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyNutritionSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('mealCount', models.IntegerField(default=0)),
+                ('calories', models.FloatField(default=0)),
+                ('protein', models.FloatField(default=0)),
+                ('carbs', models.FloatField(default=0)),
+                ('fats', models.FloatField(default=0)),
+                ('breakfast', models.FloatField(default=0)),
+                ('lunch', models.FloatField(default=0)),
+                ('dinner', models.FloatField(default=0)),
+                ('snacks', models.FloatField(default=0)),
+                ('other', models.FloatField(default=0)),
+                ('updatedAt', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_summaries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'date'), name='daily_summary_user_date_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_meal_user_created_idx_user_timezone'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='meal',
+            name='thumbnail',
+            field=models.ImageField(blank=True, null=True, upload_to='meals/thumbs/'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:38
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_blobs(apps, schema_editor):
+    """
+    Reference counts for images stored before content addressing. They keep
+    their flat meals/<uuid>.jpg names; the counts let delete_meal and
+    gc_images treat them like any other blob.
+    """
+    Meal = apps.get_model('api', 'Meal')
+    MealJob = apps.get_model('api', 'MealJob')
+    ImageBlob = apps.get_model('api', 'ImageBlob')
+
+    counts = {}
+    for queryset in (Meal.objects.all(), MealJob.objects.filter(status__in=['pending', 'running'])):
+        for row in queryset.exclude(image='').values('image').annotate(count=Count('id')).iterator():
+            if row['image']:
+                counts[row['image']] = counts.get(row['image'], 0) + row['count']
+    ImageBlob.objects.bulk_create(
+        [ImageBlob(name=name, refCount=count) for name, count in counts.items()], batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_meal_thumbnail'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('refCount', models.IntegerField(default=0)),
+                ('createdAt', models.DateTimeField(auto_now_add=True)),
+                ('updatedAt', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['refCount', 'updatedAt'], name='imageblob_gc_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_blobs, migrations.RunPython.noop),
+    ]
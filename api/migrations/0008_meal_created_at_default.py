@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:48
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_imageblob'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='meal',
+            name='createdAt',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
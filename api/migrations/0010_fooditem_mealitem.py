@@ -0,0 +1,42 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:59
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_userdataversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FoodItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('key', models.CharField(max_length=100, unique=True)),
+                ('calories', models.FloatField(blank=True, null=True)),
+                ('protein', models.FloatField(blank=True, null=True)),
+                ('carbs', models.FloatField(blank=True, null=True)),
+                ('fats', models.FloatField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MealItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('createdAt', models.DateTimeField()),
+                ('quantity', models.PositiveIntegerField(default=1)),
+                ('confidence', models.FloatField(blank=True, null=True)),
+                ('food', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='mealItems', to='api.fooditem')),
+                ('meal', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mealItems', to='api.meal')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'createdAt', 'food'], name='mealitem_user_created_idx')],
+            },
+        ),
+    ]
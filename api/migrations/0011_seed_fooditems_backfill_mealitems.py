@@ -0,0 +1,103 @@
+# Generated by Django 5.2.7 on 2026-10-18 19:02
+
+import json
+import os
+import re
+from collections import Counter
+from django.conf import settings
+from django.db import migrations, transaction
+
+BATCH_SIZE = 2000
+
+# Frozen copy of api.nutrition.normalize_name as of this migration, so the keys
+# written here never depend on later edits to the app code
+_NON_KEY_CHARS = re.compile(r'[^0-9a-z]+')
+
+
+def normalize_name(name):
+    return _NON_KEY_CHARS.sub('', str(name).lower())
+
+
+def food_key(name):
+    return normalize_name(name)[:100]
+
+
+def seed_food_items(apps, schema_editor):
+    """One FoodItem per calorie_Database.json entry (first entry wins for a key, like NutritionIndex)."""
+    FoodItem = apps.get_model('api', 'FoodItem')
+    path = os.path.join(settings.BASE_DIR, 'calorie_Database.json')
+    if not os.path.exists(path):
+        return
+    with open(path, 'r') as f:
+        entries = json.load(f)
+
+    foods = {}
+    for entry in entries:
+        key = food_key(entry['name'])
+        if key and key not in foods:
+            foods[key] = FoodItem(
+                name=entry['name'], key=key, calories=float(entry['calories']),
+                protein=float(entry['Proteins']), carbs=float(entry['Carbs']), fats=float(entry['Fats']),
+            )
+    with transaction.atomic():
+        FoodItem.objects.bulk_create(foods.values(), ignore_conflicts=True)
+
+
+def backfill_meal_items(apps, schema_editor):
+    """
+    MealItem rows from the comma-joined Meal.items, BATCH_SIZE meals per
+    transaction in primary-key order. Labels not in calorie_Database.json get
+    a FoodItem of their own. Meals that already have items are skipped, so
+    an interrupted run can simply be repeated.
+    """
+    Meal = apps.get_model('api', 'Meal')
+    FoodItem = apps.get_model('api', 'FoodItem')
+    MealItem = apps.get_model('api', 'MealItem')
+
+    food_ids = dict(FoodItem.objects.values_list('key', 'id'))
+    last_id = 0
+    while True:
+        rows = list(
+            Meal.objects.filter(pk__gt=last_id).order_by('pk')
+            .values_list('id', 'user_id', 'createdAt', 'items')[:BATCH_SIZE]
+        )
+        if not rows:
+            break
+        last_id = rows[-1][0]
+
+        with transaction.atomic():
+            done = set(MealItem.objects.filter(meal_id__in=[row[0] for row in rows]).values_list('meal_id', flat=True))
+            meals, missing = [], {}
+            for meal_id, user_id, created_at, items in rows:
+                if meal_id in done:
+                    continue
+                labels = [label.strip() for label in (items or '').split(',') if normalize_name(label)]
+                counts = Counter(food_key(label) for label in labels)
+                for label in labels:
+                    if food_key(label) not in food_ids:
+                        missing.setdefault(food_key(label), label[:100])
+                meals.append((meal_id, user_id, created_at, counts))
+
+            if missing:
+                FoodItem.objects.bulk_create([FoodItem(key=key, name=name) for key, name in missing.items()])
+                food_ids.update(FoodItem.objects.filter(key__in=list(missing)).values_list('key', 'id'))
+
+            MealItem.objects.bulk_create([
+                MealItem(meal_id=meal_id, user_id=user_id, createdAt=created_at, food_id=food_ids[key], quantity=quantity)
+                for meal_id, user_id, created_at, counts in meals
+                for key, quantity in counts.items()
+            ])
+
+
+class Migration(migrations.Migration):
+    # Each batch commits on its own, so a large history never holds one long write transaction
+    atomic = False
+
+    dependencies = [
+        ('api', '0010_fooditem_mealitem'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_food_items, migrations.RunPython.noop),
+        migrations.RunPython(backfill_meal_items, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 19:03
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_seed_fooditems_backfill_mealitems'),
+    ]
+
+    operations = [
+        # Always a copy of the protein/carbs/fats columns; Meal.macros now builds it from them
+        migrations.RemoveField(
+            model_name='meal',
+            name='macros',
+        ),
+    ]
@@ -0,0 +1,98 @@
+# Generated by Django 5.2.7 on 2026-10-18 19:20
+
+import datetime
+from collections import defaultdict
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from django.db import migrations, transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Lower, TruncDate
+
+BATCH_SIZE = 200
+
+# Frozen copy of the aggregation in api/reports.py as of this migration, so
+# replaying history never depends on later edits to the app code
+MEAL_TYPES = ('breakfast', 'lunch', 'dinner', 'snacks')
+
+
+def get_zone(name):
+    try:
+        return ZoneInfo(name) if name else None
+    except (ZoneInfoNotFoundError, ValueError):
+        return None
+
+
+def day_aggregates():
+    """{summary field: aggregate}; aliased sum_<field> since Meal has fields of the same names."""
+    # mealType is matched case-insensitively; NULL, empty and unknown types count as "other"
+    aggregates = {
+        'calories': Sum('calories'),
+        'protein': Sum('protein'),
+        'carbs': Sum('carbs'),
+        'fats': Sum('fats'),
+        'other': Sum('calories', filter=Q(mealType__isnull=True) | ~Q(mealType_lower__in=MEAL_TYPES)),
+    }
+    for mtype in MEAL_TYPES:
+        aggregates[mtype] = Sum('calories', filter=Q(mealType_lower=mtype))
+    return {f'sum_{field}': aggregate for field, aggregate in aggregates.items()}
+
+
+def expected_daily_summaries(User, Meal, user_ids):
+    """{(user_id, date): field values} from Meal, one query per distinct user time zone."""
+    users_by_zone = defaultdict(list)
+    for user_id, zone_name in User.objects.filter(id__in=user_ids).values_list('id', 'timezone'):
+        users_by_zone[get_zone(zone_name) or datetime.timezone.utc].append(user_id)
+
+    expected = {}
+    for tz, zone_user_ids in users_by_zone.items():
+        rows = (
+            Meal.objects.filter(user_id__in=zone_user_ids)
+            .annotate(mealType_lower=Lower('mealType'), date=TruncDate('createdAt', tzinfo=tz))
+            .values('user_id', 'date')
+            .annotate(meal_count=Count('id'), **day_aggregates())
+        )
+        for row in rows:
+            # NULL sums (no values) become 0
+            expected[(row['user_id'], row['date'])] = {
+                'mealCount': row['meal_count'],
+                **{key[len('sum_'):]: float(value or 0) for key, value in row.items() if key.startswith('sum_')},
+            }
+    return expected
+
+
+def backfill_daily_summaries(apps, schema_editor):
+    """
+    DailyNutritionSummary rows for every user who has meals but no summary
+    rows yet, i.e. the whole history from before 0004. Same computation as
+    `manage.py rebuild_daily_summaries`, BATCH_SIZE users per transaction.
+    Users that already have summaries are left alone, so a re-run only
+    picks up what is missing.
+    """
+    User = apps.get_model('api', 'User')
+    Meal = apps.get_model('api', 'Meal')
+    DailyNutritionSummary = apps.get_model('api', 'DailyNutritionSummary')
+
+    summarized = DailyNutritionSummary.objects.values('user_id')
+    user_ids = list(
+        Meal.objects.exclude(user_id__in=summarized).order_by('user_id').values_list('user_id', flat=True).distinct()
+    )
+    for start in range(0, len(user_ids), BATCH_SIZE):
+        batch = user_ids[start:start + BATCH_SIZE]
+        expected = expected_daily_summaries(User, Meal, batch)
+        with transaction.atomic():
+            DailyNutritionSummary.objects.bulk_create([
+                DailyNutritionSummary(user_id=user_id, date=date, **values)
+                for (user_id, date), values in expected.items()
+            ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+    # Each batch commits on its own, like 0011
+    atomic = False
+
+    dependencies = [
+        ('api', '0012_remove_meal_macros'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_daily_summaries, migrations.RunPython.noop),
+    ]
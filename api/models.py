@@ -5,6 +5,7 @@ from django.db import models
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.conf import settings
+from django.utils import timezone
 
 # --- Custom User Model (Replacing User.js) ---
 class User(AbstractUser):
@@ -19,6 +20,9 @@ class User(AbstractUser):
     goal = models.CharField(max_length=255, null=True, blank=True)
     bmi = models.FloatField(null=True, blank=True)
     profileFilled = models.BooleanField(default=False)
+
+    # IANA zone name (e.g. "Asia/Kolkata"); decides where the user's days start and end
+    timezone = models.CharField(max_length=64, default='UTC')
     
     # Store nested JSON data as a TextField (SQLite fix)
     sessionInfo = models.TextField(null=True, blank=True) 
@@ -37,23 +41,195 @@ class Meal(models.Model):
     carbs = models.FloatField(null=True, blank=True)
     fats = models.FloatField(null=True, blank=True)
     
-    # Items: Stored as a comma-separated string
+    # Items: the detected labels, comma-separated, for display (MealItem holds them per food)
     items = models.TextField() 
 
     # Image: Django's File/Image Field handles the file path (used to be imageUrl)
     image = models.ImageField(upload_to='meals/', null=True, blank=True)
+    # Small copy of the image for list views (None for meals stored before thumbnails existed)
+    thumbnail = models.ImageField(upload_to='meals/thumbs/', null=True, blank=True)
     
-    createdAt = models.DateTimeField(auto_now_add=True)
-    
-    # Store nested macros data as a TextField (SQLite fix)
-    macros = models.TextField(null=True, blank=True) 
+    # Set on creation like auto_now_add, but bulk_create keeps an explicit value (meal import)
+    createdAt = models.DateTimeField(default=timezone.now, editable=False)
+
+    class Meta:
+        indexes = [
+            # Per-user day/month range scans: user_id = ? AND createdAt >= ? AND createdAt < ?
+            models.Index(fields=['user', 'createdAt'], name='meal_user_created_idx'),
+        ]
 
     @property
     def imageUrl(self):
         # Helper property for API consistency (matching Node.js response)
         return self.image.url if self.image else None
 
+    @property
+    def thumbnailUrl(self):
+        return self.thumbnail.url if self.thumbnail else None
+
+    @property
+    def macros(self):
+        # Same shape the macros JSON text used to hold
+        return {"protein": self.protein, "carbs": self.carbs, "fats": self.fats}
+
     def __str__(self):
         user_display = getattr(self.user, "username", getattr(self.user, "email", "UnknownUser"))
         return f"Meal ({self.pk or 'unsaved'}) for {user_display}"
- 
\ No newline at end of file
+ 
+
+
+# --- Foods (seeded from calorie_Database.json, see api/foods.py) ---
+class FoodItem(models.Model):
+    # Display name: as in calorie_Database.json, or the first label seen for foods not in it
+    name = models.CharField(max_length=100)
+    # normalize_name(name), the lookup key api/nutrition.py uses ("Veg Fry" -> "vegfry")
+    key = models.CharField(max_length=100, unique=True)
+
+    # Per serving, from calorie_Database.json; None for foods not in it
+    calories = models.FloatField(null=True, blank=True)
+    protein = models.FloatField(null=True, blank=True)
+    carbs = models.FloatField(null=True, blank=True)
+    fats = models.FloatField(null=True, blank=True)
+
+    def __str__(self):
+        return f"FoodItem {self.name}"
+
+
+# --- One row per food in a meal ---
+class MealItem(models.Model):
+    meal = models.ForeignKey(Meal, on_delete=models.CASCADE, related_name='mealItems')
+    food = models.ForeignKey(FoodItem, on_delete=models.PROTECT, related_name='mealItems')
+
+    # Copied from the meal, so per-food statistics never join Meal
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    createdAt = models.DateTimeField()
+
+    # How many times the food was detected in the meal, and the best detection confidence
+    # (None for meals imported or stored before detections were kept)
+    quantity = models.PositiveIntegerField(default=1)
+    confidence = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Per-food GROUP BY: user_id = ? AND createdAt >= ? AND createdAt < ?, then food_id
+            models.Index(fields=['user', 'createdAt', 'food'], name='mealitem_user_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"MealItem {self.food_id} x{self.quantity} in meal {self.meal_id}"
+
+
+# --- Per-user daily totals, maintained alongside Meal inserts/deletes ---
+class DailyNutritionSummary(models.Model):
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='daily_summaries')
+    date = models.DateField()
+
+    mealCount = models.IntegerField(default=0)
+    calories = models.FloatField(default=0)
+    protein = models.FloatField(default=0)
+    carbs = models.FloatField(default=0)
+    fats = models.FloatField(default=0)
+
+    # Calories per meal type (same buckets the daily/monthly responses use)
+    breakfast = models.FloatField(default=0)
+    lunch = models.FloatField(default=0)
+    dinner = models.FloatField(default=0)
+    snacks = models.FloatField(default=0)
+    other = models.FloatField(default=0)
+
+    updatedAt = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'date'], name='daily_summary_user_date_uniq'),
+        ]
+
+    def __str__(self):
+        return f"DailyNutritionSummary {self.date} for user {self.user_id}"
+
+# --- Async meal ingestion queue ---
+class MealJob(models.Model):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='meal_jobs')
+    mealType = models.CharField(max_length=50, null=True, blank=True)
+    image = models.ImageField(upload_to='meals/')
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.IntegerField(default=0)
+    error = models.TextField(null=True, blank=True)
+
+    # The add_meal response payload once done (JSON as text)
+    result = models.TextField(null=True, blank=True)
+    meal = models.ForeignKey(Meal, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+
+    createdAt = models.DateTimeField(auto_now_add=True)
+    updatedAt = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Worker polls "oldest pending first"
+            models.Index(fields=['status', 'createdAt'], name='mealjob_status_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"MealJob ({self.pk or 'unsaved'}) {self.status}"
+
+
+# --- Content-addressed meal images (see api/storage.py) ---
+class ImageBlob(models.Model):
+    # Storage name of the image, e.g. meals/ab/cd/<sha256>.jpg; its thumbnail is derived from it
+    name = models.CharField(max_length=100, unique=True)
+    # Meal rows plus unfinished MealJob rows using this image; 0 means collectable
+    refCount = models.IntegerField(default=0)
+
+    createdAt = models.DateTimeField(auto_now_add=True)
+    updatedAt = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # gc_images: refCount <= 0 AND updatedAt < cutoff
+            models.Index(fields=['refCount', 'updatedAt'], name='imageblob_gc_idx'),
+        ]
+
+    def __str__(self):
+        return f"ImageBlob {self.name} ({self.refCount} refs)"
+
+
+# --- Per-user data version (conditional GETs, see api/versions.py) ---
+class UserDataVersion(models.Model):
+    # Kept out of User so saving a (possibly stale) User instance can never move it back
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True,
+                                related_name='dataVersion')
+    # Bumped with every meal add/delete, summary rebuild and profile update
+    version = models.PositiveBigIntegerField(default=0)
+    updatedAt = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"UserDataVersion {self.user_id} v{self.version}"
+
+
+# --- Cached Gemini responses (keyed by a normalized, bucketed profile) ---
+class GeminiResponseCache(models.Model):
+    key = models.CharField(max_length=64, unique=True)
+    kind = models.CharField(max_length=50)
+
+    # Canonical profile and the parsed Gemini JSON, both stored as text (SQLite fix)
+    profile = models.TextField()
+    response = models.TextField()
+
+    hits = models.IntegerField(default=0)
+    createdAt = models.DateTimeField(auto_now_add=True)
+    lastUsedAt = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"GeminiResponseCache ({self.kind}) {self.key[:12]}"
@@ -0,0 +1,98 @@
+# api/nutrition.py
+import os
+import re
+import json
+from array import array
+from django.conf import settings
+
+# Calories charged for a detected label that has no entry in the database
+DEFAULT_CALORIES = 100.0
+
+# Anything that is not a lowercase letter or digit is dropped from the key, so
+# "veg-fry", "Veg Fry", "BhindiMasala" and "bhindi masala" collapse together.
+_NON_KEY_CHARS = re.compile(r'[^0-9a-z]+')
+
+
+def normalize_name(name):
+    """Canonical lookup key for a food name (folds case, spaces, hyphens, CamelCase)."""
+    return _NON_KEY_CHARS.sub('', str(name).lower())
+
+
+class NutritionIndex:
+    """
+    Read-only nutrition table built once from calorie_Database.json.
+
+    Each food gets an integer entry id. Names resolve to ids through a dict keyed
+    by `normalize_name`, and the per-100g values live in parallel float arrays,
+    so summing a meal is a handful of array reads with no string parsing.
+    """
+
+    def __init__(self, entries):
+        self.names = []
+        self.ids = {}
+        self.calories = array('d')
+        self.protein = array('d')
+        self.carbs = array('d')
+        self.fats = array('d')
+
+        for entry in entries:
+            key = normalize_name(entry['name'])
+            if key in self.ids:
+                # First entry wins, same as the old linear scan
+                continue
+            self.ids[key] = len(self.names)
+            self.names.append(entry['name'])
+            self.calories.append(float(entry['calories']))
+            self.protein.append(float(entry['Proteins']))
+            self.carbs.append(float(entry['Carbs']))
+            self.fats.append(float(entry['Fats']))
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, 'r') as f:
+            return cls(json.load(f))
+
+    def __len__(self):
+        return len(self.names)
+
+    def resolve(self, name):
+        """Entry id for a food name, or -1 when it is not in the database."""
+        return self.ids.get(normalize_name(name), -1)
+
+    def bind_classes(self, class_names):
+        """
+        Map a YOLO `names` table ({class_id: label}) to entry ids ahead of time.
+        Returns a tuple indexed by class id; unknown labels map to -1.
+        """
+        if isinstance(class_names, dict):
+            size = max(class_names, default=-1) + 1
+            bound = [-1] * size
+            for cls_id, label in class_names.items():
+                bound[int(cls_id)] = self.resolve(label)
+            return tuple(bound)
+        return tuple(self.resolve(label) for label in class_names)
+
+    def totals(self, entry_ids):
+        """Sum (calories, protein, carbs, fats) over entry ids; -1 costs DEFAULT_CALORIES."""
+        total_calories = total_protein = total_carbs = total_fats = 0.0
+        calories, protein, carbs, fats = self.calories, self.protein, self.carbs, self.fats
+        for entry_id in entry_ids:
+            if entry_id < 0:
+                total_calories += DEFAULT_CALORIES
+                continue
+            total_calories += calories[entry_id]
+            total_protein += protein[entry_id]
+            total_carbs += carbs[entry_id]
+            total_fats += fats[entry_id]
+        return total_calories, total_protein, total_carbs, total_fats
+
+
+# --- Data: built once per process from calorie_Database.json ---
+# NOTE: Assumes 'calorie_Database.json' is in your project root
+CALORIE_DATABASE_PATH = os.path.join(settings.BASE_DIR, 'calorie_Database.json')
+
+try:
+    NUTRITION_INDEX = NutritionIndex.from_file(CALORIE_DATABASE_PATH)
+except FileNotFoundError:
+    NUTRITION_INDEX = NutritionIndex([])
+    print("Warning: calorie_Database.json not found. API functions relying on it will fail.")
@@ -0,0 +1,132 @@
+# api/profiling.py
+"""
+On-demand profiling of single requests (see ProfilingMiddleware).
+
+A request is profiled when it carries an `X-Profile` header and either comes
+from a staff user or the header is a valid signature made with
+PROFILING_SECRET (`manage.py profiles --sign`). Each profile is stored as a
+cProfile dump plus a JSON description in PROFILING_DIR, which keeps only the
+newest PROFILING_MAX_FILES profiles.
+"""
+import os
+import io
+import hmac
+import json
+import time
+import pstats
+import hashlib
+from django.conf import settings
+
+HEADER = 'HTTP_X_PROFILE'
+
+
+# --- Signed header ---
+
+def sign(expires):
+    return hmac.new(settings.PROFILING_SECRET.encode(), str(expires).encode(), hashlib.sha256).hexdigest()
+
+
+def make_header(ttl=600):
+    """Value for `X-Profile` that allows profiling until now + ttl seconds."""
+    expires = int(time.time()) + ttl
+    return f"{expires}.{sign(expires)}"
+
+
+def valid_signature(value):
+    if not settings.PROFILING_SECRET:
+        return False
+    expires, _, signature = value.partition('.')
+    # Header values are client text: compare bytes, and accept only ASCII digits ('²'.isdigit() is True)
+    if not (expires.isascii() and expires.isdigit()) or int(expires) < time.time():
+        return False
+    return hmac.compare_digest(signature.encode(), sign(expires).encode())
+
+
+# --- Storage (ring of PROFILING_MAX_FILES) ---
+
+def profile_paths(profile_id):
+    base = os.path.join(settings.PROFILING_DIR, profile_id)
+    return f"{base}.prof", f"{base}.json"
+
+
+def list_profiles():
+    """Descriptions of the saved profiles, newest first."""
+    try:
+        names = sorted((n for n in os.listdir(settings.PROFILING_DIR) if n.endswith('.json')), reverse=True)
+    except FileNotFoundError:
+        return []
+    profiles = []
+    for name in names:
+        try:
+            with open(os.path.join(settings.PROFILING_DIR, name)) as f:
+                profiles.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return profiles
+
+
+def _trim():
+    ids = sorted(n[:-5] for n in os.listdir(settings.PROFILING_DIR) if n.endswith('.json'))
+    for profile_id in ids[:max(0, len(ids) - settings.PROFILING_MAX_FILES)]:
+        for path in profile_paths(profile_id):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def save_profile(profiler, request, response, seconds, endpoint):
+    """Write one profile and its description; returns the description."""
+    os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+    # Sortable by time; pid keeps workers from colliding
+    profile_id = f"{time.time_ns()}-{os.getpid()}-{endpoint}"
+    prof_path, meta_path = profile_paths(profile_id)
+    profiler.dump_stats(prof_path)
+
+    stats = pstats.Stats(prof_path)
+    description = {
+        'id': profile_id,
+        'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'method': request.method,
+        'path': request.get_full_path(),
+        'endpoint': endpoint,
+        'status': response.status_code,
+        'ms': round(seconds * 1000, 2),
+        'calls': stats.total_calls,
+        'top': top_functions(stats),
+    }
+    with open(meta_path, 'w') as f:
+        json.dump(description, f)
+    _trim()
+    return description
+
+
+# --- Rendering ---
+
+def _label(func):
+    filename, line, name = func
+    if filename == '~':
+        # Built-in
+        return name
+    base = str(settings.BASE_DIR)
+    short = os.path.relpath(filename, base) if filename.startswith(base) else os.path.basename(filename)
+    return f"{short}:{line}({name})"
+
+
+def top_functions(stats, limit=3):
+    """[(function, own ms)] with the most time spent in the function itself."""
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][2], reverse=True)[:limit]
+    return [(_label(func), round(row[2] * 1000, 2)) for func, row in rows]
+
+
+def summary_header(description):
+    top = ', '.join(f"{name} {ms}ms" for name, ms in description['top'])
+    return f"id={description['id']}; total={description['ms']}ms; calls={description['calls']}; top={top}"
+
+
+def render(profile_id, sort='cumulative', limit=30):
+    """pstats report for one saved profile."""
+    prof_path, _ = profile_paths(profile_id)
+    out = io.StringIO()
+    pstats.Stats(prof_path, stream=out).strip_dirs().sort_stats(sort).print_stats(limit)
+    return out.getvalue()
@@ -0,0 +1,106 @@
+# api/registry.py
+"""
+Lazily initialized heavy resources (YOLO, Gemini client, Google auth).
+
+Nothing here is imported or constructed until first use, so `manage.py migrate`,
+`check`, admin-only processes and tests don't pay for ultralytics/torch/httpx.
+Serving processes call `warm_up()` once at boot (see food_backend/wsgi.py).
+"""
+import os
+import sys
+import time
+import threading
+from importlib import import_module
+
+
+def current_rss_bytes():
+    """Resident set size of this process (Linux /proc, falling back to the peak from getrusage)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is bytes on macOS, KiB elsewhere
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class LazyResource:
+    """A named resource built by a dotted-path loader on first `get()`, exactly once."""
+
+    def __init__(self, name, loader_path):
+        self.name = name
+        self.loader_path = loader_path
+        self._value = None
+        self._loaded = False
+        self._lock = threading.Lock()
+        self.load_seconds = None
+        self.rss_delta = None
+
+    @property
+    def loaded(self):
+        return self._loaded
+
+    def _loader(self):
+        module_path, attr = self.loader_path.rsplit('.', 1)
+        return getattr(import_module(module_path), attr)
+
+    def get(self):
+        if self._loaded:
+            return self._value
+        with self._lock:
+            if not self._loaded:
+                rss_before = current_rss_bytes()
+                start = time.perf_counter()
+                self._value = self._loader()()
+                self.load_seconds = time.perf_counter() - start
+                self.rss_delta = current_rss_bytes() - rss_before
+                self._loaded = True
+        return self._value
+
+    def reset(self):
+        """Drop the cached value (tests, or after settings change)."""
+        with self._lock:
+            self._value = None
+            self._loaded = False
+
+
+class Registry:
+    def __init__(self):
+        self._resources = {}
+
+    def register(self, name, loader_path):
+        resource = LazyResource(name, loader_path)
+        self._resources[name] = resource
+        return resource
+
+    def __getitem__(self, name):
+        return self._resources[name]
+
+    def __iter__(self):
+        return iter(self._resources.values())
+
+    def names(self):
+        return list(self._resources)
+
+    def get(self, name):
+        return self._resources[name].get()
+
+    def warm_up(self, names=None):
+        """Load the given (default: all) components now instead of on the first request."""
+        for name in self.names() if names is None else names:
+            self._resources[name].get()
+
+
+registry = Registry()
+
+# YOLO detector: in-process model or client for the shared inference server
+YOLO_DETECTOR = registry.register('yolo', 'api.inference.build_detector')
+# Async Gemini client (bounded concurrency, coalesced identical prompts)
+GEMINI_CLIENT = registry.register('gemini', 'api.gemini_client.build_gemini_client')
+# Cached Google signing keys used to verify ID tokens at login
+GOOGLE_AUTH = registry.register('google_auth', 'api.google_certs.build_google_certs')
+
+
+def warm_up(names=None):
+    registry.warm_up(names)
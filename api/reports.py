@@ -0,0 +1,332 @@
+# api/reports.py
+"""
+Nutrition summaries computed in the database.
+
+Every summary has the same shape the views have always returned:
+    {"total": ..., "breakdown": {breakfast, lunch, dinner, snacks, other}, "macros": {protein, carbs, fats}}
+"""
+import json
+import math
+import datetime
+from collections import defaultdict
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Lower, Trunc, TruncDate
+from asgiref.sync import sync_to_async
+from django.utils import timezone
+
+from .models import DailyNutritionSummary, Meal, User
+from .versions import bump_data_versions
+
+MEAL_TYPES = ("breakfast", "lunch", "dinner", "snacks")
+
+
+# --- User-local days as half-open UTC ranges ---
+
+def get_zone(name):
+    """ZoneInfo for an IANA name, or None when the name is unknown."""
+    try:
+        return ZoneInfo(name) if name else None
+    except (ZoneInfoNotFoundError, ValueError):
+        return None
+
+
+def user_timezone(user):
+    """The user's own zone; unknown or empty names fall back to UTC."""
+    return get_zone(getattr(user, "timezone", None)) or datetime.timezone.utc
+
+
+def current_timezones(user_ids):
+    """
+    {user_id: zone} as stored right now. request.user may be a cached
+    snapshot from before a timezone change, so summary writes use this.
+    """
+    names = dict(User.objects.filter(id__in=set(user_ids)).values_list("id", "timezone"))
+    return {user_id: get_zone(names.get(user_id)) or datetime.timezone.utc for user_id in user_ids}
+
+
+def local_today(user):
+    return timezone.localdate(timezone=user_timezone(user))
+
+
+def day_start(date, tz):
+    """Aware datetime of local midnight starting `date` in `tz` (DST-safe)."""
+    return datetime.datetime.combine(date, datetime.time.min, tzinfo=tz)
+
+
+def meals_in_days(user_ids, tz, start_date=None, end_date=None):
+    """
+    Meals of these users on the local days start_date..end_date (inclusive) in
+    `tz`: the half-open createdAt range [midnight of start_date, midnight after
+    end_date), which meal_user_created_idx answers. A missing end is open.
+    """
+    meals = Meal.objects.filter(user_id__in=user_ids)
+    if start_date is not None:
+        meals = meals.filter(createdAt__gte=day_start(start_date, tz))
+    if end_date is not None:
+        meals = meals.filter(createdAt__lt=day_start(end_date + datetime.timedelta(days=1), tz))
+    return meals
+
+
+def _bucket_filters():
+    # mealType is matched case-insensitively; NULL, empty and unknown types count as "other"
+    filters = {mtype: Q(mealType_lower=mtype) for mtype in MEAL_TYPES}
+    filters["other"] = Q(mealType__isnull=True) | ~Q(mealType_lower__in=MEAL_TYPES)
+    return filters
+
+
+def summary_aggregates():
+    """Aggregate expressions for one summary; use on a queryset annotated by `with_meal_type`."""
+    aggregates = {
+        "total": Sum("calories"),
+        "protein": Sum("protein"),
+        "carbs": Sum("carbs"),
+        "fats": Sum("fats"),
+    }
+    for bucket, condition in _bucket_filters().items():
+        aggregates[f"breakdown_{bucket}"] = Sum("calories", filter=condition)
+    return aggregates
+
+
+def with_meal_type(meals):
+    return meals.annotate(mealType_lower=Lower("mealType"))
+
+
+def summary_from_row(row):
+    """Shape one aggregate row; NULL sums (no meals / no values) become 0 like the old loops."""
+    return {
+        "total": row["total"] or 0,
+        "breakdown": {bucket: row[f"breakdown_{bucket}"] or 0 for bucket in MEAL_TYPES + ("other",)},
+        "macros": {
+            "protein": row["protein"] or 0,
+            "carbs": row["carbs"] or 0,
+            "fats": row["fats"] or 0,
+        },
+    }
+
+
+# --- DailyNutritionSummary maintenance ---
+
+SUMMARY_FIELDS = ("calories", "protein", "carbs", "fats") + MEAL_TYPES + ("other",)
+
+
+def meal_bucket(meal_type):
+    mtype = meal_type.lower() if meal_type else "other"
+    return mtype if mtype in MEAL_TYPES else "other"
+
+
+def summary_date(created_at, tz=None):
+    """The day a meal is counted under: its local date in the owner's zone."""
+    return timezone.localdate(created_at, timezone=tz)
+
+
+def _meal_deltas(meal, sign):
+    calories = meal.calories or 0
+    deltas = dict.fromkeys(SUMMARY_FIELDS, 0.0)
+    deltas.update(
+        calories=calories,
+        protein=meal.protein or 0,
+        carbs=meal.carbs or 0,
+        fats=meal.fats or 0,
+    )
+    deltas[meal_bucket(meal.mealType)] += calories
+    return {field: sign * value for field, value in deltas.items() if value}
+
+
+def apply_meal_to_summary(meal, sign=1):
+    """
+    Add (sign=1) or remove (sign=-1) one meal from its day's summary row.
+    Call inside the same transaction that creates/deletes the meal.
+    """
+    date = summary_date(meal.createdAt, current_timezones([meal.user_id])[meal.user_id])
+    _apply_deltas(meal.user_id, date, _meal_deltas(meal, sign), sign)
+    bump_data_versions([meal.user_id])
+
+
+def apply_meals_to_summaries(meals):
+    """Add several new meals (e.g. one bulk_create) with one update per (user, day)."""
+    zones = current_timezones({meal.user_id for meal in meals})
+    grouped = {}
+    for meal in meals:
+        key = (meal.user_id, summary_date(meal.createdAt, zones[meal.user_id]))
+        deltas, count = grouped.get(key, ({}, 0))
+        for field, value in _meal_deltas(meal, 1).items():
+            deltas[field] = deltas.get(field, 0.0) + value
+        grouped[key] = (deltas, count + 1)
+    for (user_id, date), (deltas, count) in grouped.items():
+        _apply_deltas(user_id, date, deltas, count)
+    bump_data_versions({user_id for user_id, _ in grouped})
+
+
+def _apply_deltas(user_id, date, deltas, count):
+    updates = {field: F(field) + value for field, value in deltas.items()}
+    updates["mealCount"] = F("mealCount") + count
+    updates["updatedAt"] = timezone.now()
+    rows = DailyNutritionSummary.objects.filter(user_id=user_id, date=date)
+
+    if not rows.update(**updates) and count > 0:
+        try:
+            with transaction.atomic():
+                DailyNutritionSummary.objects.create(
+                    user_id=user_id, date=date, mealCount=count, **deltas
+                )
+        except IntegrityError:
+            # Another request created the row first
+            rows.update(**updates)
+
+    if count < 0:
+        # Avoid float residue once the last meal of a day is gone
+        rows.filter(mealCount__lte=0).update(mealCount=0, **dict.fromkeys(SUMMARY_FIELDS, 0.0))
+
+
+def summary_from_daily_row(row):
+    """Response shape from a DailyNutritionSummary instance (or None for an empty day)."""
+    if row is None or row.mealCount <= 0:
+        return {
+            "total": 0,
+            "breakdown": dict.fromkeys(MEAL_TYPES + ("other",), 0),
+            "macros": {"protein": 0, "carbs": 0, "fats": 0},
+        }
+    return {
+        "total": row.calories,
+        "breakdown": {bucket: getattr(row, bucket) for bucket in MEAL_TYPES + ("other",)},
+        "macros": {"protein": row.protein, "carbs": row.carbs, "fats": row.fats},
+    }
+
+
+# --- Range reports (rolled up from DailyNutritionSummary) ---
+
+REPORT_BUCKETS = ("day", "week", "month")
+
+
+def report_rows(user, start_date, end_date, bucket):
+    """
+    One GROUP BY over the user's day summaries in [start_date, end_date], truncated
+    to `bucket` (weeks start on Monday). Rows are dicts ordered by "start"; only
+    buckets with meals appear. The queryset is lazy so callers can slice and stream it.
+    """
+    return (
+        DailyNutritionSummary.objects.filter(
+            user=user, date__gte=start_date, date__lte=end_date, mealCount__gt=0
+        )
+        .annotate(start=Trunc("date", bucket))
+        .values("start")
+        .annotate(mealCount=Sum("mealCount"), **{field: Sum(field) for field in SUMMARY_FIELDS})
+        .order_by("start")
+    )
+
+
+def summary_from_totals(row):
+    """Response shape from a report_rows() row."""
+    return {
+        "total": row["calories"],
+        "breakdown": {bucket: row[bucket] for bucket in MEAL_TYPES + ("other",)},
+        "macros": {"protein": row["protein"], "carbs": row["carbs"], "fats": row["fats"]},
+    }
+
+
+REPORT_CHUNK_SIZE = 500
+
+
+def report_lines(rows, limit, header):
+    """
+    Streaming body for GET /meals/report/ (WSGI): the report JSON, one string
+    per REPORT_CHUNK_SIZE buckets as the cursor is read. `rows` holds up to
+    limit + 1 rows; the extra one only tells us where the next page starts.
+    """
+    yield json.dumps(header)[:-1] + ', "buckets": ['
+    next_start, chunk = None, []
+    for i, row in enumerate(rows.iterator(chunk_size=REPORT_CHUNK_SIZE)):
+        if i == limit:
+            next_start = row["start"].isoformat()
+            break
+        bucket = {"start": row["start"].isoformat(), "mealCount": row["mealCount"], **summary_from_totals(row)}
+        chunk.append((", " if i else "") + json.dumps(bucket))
+        if len(chunk) == REPORT_CHUNK_SIZE:
+            yield "".join(chunk)
+            chunk = []
+    yield "".join(chunk) + '], "next": ' + json.dumps(next_start) + "}"
+
+
+async def areport_lines(rows, limit, header):
+    """report_lines() for ASGI, like transfer.aexport_lines: each chunk is read in a thread."""
+    chunks = report_lines(rows, limit, header)
+    while (chunk := await sync_to_async(next)(chunks, None)) is not None:
+        yield chunk
+
+
+def expected_daily_summaries(user_ids, start_date=None):
+    """
+    {(user_id, date): field values} recomputed from Meal for a batch of users,
+    one query per distinct user time zone in the batch. With start_date, only
+    local days from start_date on.
+    """
+    users_by_zone = defaultdict(list)
+    for user_id, zone_name in User.objects.filter(id__in=user_ids).values_list("id", "timezone"):
+        users_by_zone[get_zone(zone_name) or datetime.timezone.utc].append(user_id)
+
+    expected = {}
+    for tz, zone_user_ids in users_by_zone.items():
+        rows = (
+            with_meal_type(meals_in_days(zone_user_ids, tz, start_date))
+            .annotate(date=TruncDate("createdAt", tzinfo=tz))
+            .values("user_id", "date")
+            .annotate(mealCount=Count("id"), **summary_aggregates())
+        )
+        expected.update(_expected_rows(rows))
+    return expected
+
+
+def _expected_rows(rows):
+    expected = {}
+    for row in rows:
+        summary = summary_from_row(row)
+        values = {
+            "mealCount": row["mealCount"],
+            "calories": float(summary["total"]),
+            **{k: float(v) for k, v in summary["macros"].items()},
+            **{k: float(v) for k, v in summary["breakdown"].items()},
+        }
+        expected[(row["user_id"], row["date"])] = values
+    return expected
+
+
+def summary_drift(user_ids, start_date=None):
+    """
+    [(user_id, date, stored values or None, expected values or None)] for rows
+    that don't match; with start_date, only local days from start_date on.
+    """
+    expected = expected_daily_summaries(user_ids, start_date)
+    rows = DailyNutritionSummary.objects.filter(user_id__in=user_ids, mealCount__gt=0)
+    if start_date is not None:
+        rows = rows.filter(date__gte=start_date)
+    stored = {
+        (row["user_id"], row["date"]): row
+        for row in rows.values("user_id", "date", "mealCount", *SUMMARY_FIELDS)
+    }
+    drift = []
+    for key in expected.keys() | stored.keys():
+        want, have = expected.get(key), stored.get(key)
+        if want is None or have is None or not _same_summary(want, have):
+            drift.append((key[0], key[1], have, want))
+    return sorted(drift, key=lambda d: (d[0], d[1]))
+
+
+def _same_summary(want, have):
+    return want["mealCount"] == have["mealCount"] and all(
+        math.isclose(want[field], have[field], rel_tol=1e-9, abs_tol=1e-6) for field in SUMMARY_FIELDS
+    )
+
+
+def rebuild_daily_summaries(user_ids):
+    """Replace the summary rows of a batch of users with values recomputed from Meal."""
+    expected = expected_daily_summaries(user_ids)
+    with transaction.atomic():
+        DailyNutritionSummary.objects.filter(user_id__in=user_ids).delete()
+        DailyNutritionSummary.objects.bulk_create([
+            DailyNutritionSummary(user_id=user_id, date=date, **values)
+            for (user_id, date), values in expected.items()
+        ])
+        bump_data_versions(user_ids)
+    return len(expected)
@@ -12,17 +12,19 @@ class UserSerializer(serializers.ModelSerializer):
         fields = (
             'id', 'googleId', 'email', 'name', 'age', 'gender', 
             'weight', 'height', 'goal', 'bmi', 'profileFilled', 
-            'sessionInfo', 'date_joined' 
+            'sessionInfo', 'timezone', 'date_joined' 
         )
 # Placeholder for the Meal Serializer (needed for meal views later)
 class MealSerializer(serializers.ModelSerializer):
     # This field uses the @property defined in api/models.py
     imageUrl = serializers.ReadOnlyField(source='imageUrl') 
+    thumbnailUrl = serializers.ReadOnlyField(source='thumbnailUrl')
+    macros = serializers.ReadOnlyField(source='macros')
 
     class Meta:
         model = Meal
         fields = (
-            'id', 'user', 'mealType', 'calories', 'items', 'imageUrl', 
+            'id', 'user', 'mealType', 'calories', 'items', 'imageUrl', 'thumbnailUrl',
             'createdAt', 'macros', 'protein', 'carbs', 'fats'
         )
-        read_only_fields = ('user', 'calories', 'macros', 'protein', 'carbs', 'fats', 'items', 'imageUrl')
\ No newline at end of file
+        read_only_fields = ('user', 'calories', 'macros', 'protein', 'carbs', 'fats', 'items', 'imageUrl', 'thumbnailUrl')
\ No newline at end of file
@@ -0,0 +1,236 @@
+# api/storage.py
+"""
+Content-addressed meal images.
+
+Every distinct upload is stored once, as meals/<aa>/<bb>/<sha256><ext>, with
+its thumbnail at the same relative name under meals/thumbs/. The digest is of
+the uploaded bytes and is computed by the upload handlers below while the
+request body streams in. Identical uploads therefore share one file, and two
+levels of 256 directories keep any single directory small.
+
+ImageBlob.refCount counts the Meal rows and unfinished MealJob rows that use a
+file. acquire_images/release_images change it in the same transaction as those
+rows. `manage.py gc_images` deletes blobs whose count has been 0 for longer
+than IMAGE_GC_GRACE_SECONDS.
+"""
+import os
+import time
+import hashlib
+from collections import Counter
+from datetime import timedelta
+from django.conf import settings
+from django.core.files.uploadhandler import MemoryFileUploadHandler, TemporaryFileUploadHandler
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .models import ImageBlob, Meal, MealJob
+
+
+# --- Upload handlers (FILE_UPLOAD_HANDLERS) ---
+
+class _HashingMixin:
+    """Adds `sha256` (hex) to each uploaded file, hashed chunk by chunk as it arrives."""
+
+    def new_file(self, *args, **kwargs):
+        self._sha256 = hashlib.sha256()
+        super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        # The memory handler passes chunks on untouched when the upload is too big for it
+        if getattr(self, 'activated', True):
+            self._sha256.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        upload = super().file_complete(file_size)
+        if upload is not None:
+            upload.sha256 = self._sha256.hexdigest()
+        return upload
+
+
+class HashingMemoryFileUploadHandler(_HashingMixin, MemoryFileUploadHandler):
+    pass
+
+
+class HashingTemporaryFileUploadHandler(_HashingMixin, TemporaryFileUploadHandler):
+    pass
+
+
+def upload_digest(upload, data):
+    """sha256 of an upload: from the upload handlers, or hashed here if they didn't run."""
+    return getattr(upload, 'sha256', None) or hashlib.sha256(data).hexdigest()
+
+
+# --- Names and paths ---
+
+def content_name(digest, extension):
+    """Image name (relative to meals/, like thumbnail_name expects) for an upload digest."""
+    return f"{digest[:2]}/{digest[2:4]}/{digest}{extension}"
+
+
+def thumbnail_name(image_name):
+    """Thumbnails live next to their image under meals/thumbs/, with the same name."""
+    return f"thumbs/{image_name}"
+
+
+def image_path(image_name):
+    return os.path.join(settings.MEDIA_ROOT, 'meals', image_name)
+
+
+def blob_paths(name):
+    """Files behind one ImageBlob name (meals/...): the image and its thumbnail."""
+    image_name = name[len('meals/'):]
+    return [image_path(image_name), image_path(thumbnail_name(image_name))]
+
+
+# --- Reference counts ---
+
+def _adjust(name, delta):
+    now = timezone.now()
+    rows = ImageBlob.objects.filter(name=name)
+    if rows.update(refCount=F('refCount') + delta, updatedAt=now) or delta < 0:
+        return
+    try:
+        with transaction.atomic():
+            ImageBlob.objects.create(name=name, refCount=delta)
+    except IntegrityError:
+        # Another request created the row first
+        rows.update(refCount=F('refCount') + delta, updatedAt=now)
+
+
+def _acquire_bulk(counts):
+    """Fixed number of queries for many names; raises IntegrityError if another request got in between."""
+    now = timezone.now()
+    existing = set(ImageBlob.objects.filter(name__in=list(counts)).values_list('name', flat=True))
+    for count in set(counts[name] for name in existing):
+        group = [name for name in existing if counts[name] == count]
+        if ImageBlob.objects.filter(name__in=group).update(refCount=F('refCount') + count, updatedAt=now) != len(group):
+            raise IntegrityError("ImageBlob rows were collected concurrently")
+    ImageBlob.objects.bulk_create(
+        [ImageBlob(name=name, refCount=count) for name, count in counts.items() if name not in existing]
+    )
+
+
+def acquire_images(names):
+    """One reference per occurrence of each image name; call in the transaction that saves the rows."""
+    counts = Counter(name for name in names if name)
+    if len(counts) > 1:
+        try:
+            with transaction.atomic():
+                _acquire_bulk(counts)
+            return
+        except IntegrityError:
+            # Rolled back to the savepoint; redo it one name at a time
+            pass
+    for name, count in counts.items():
+        _adjust(name, count)
+
+
+def release_images(names):
+    """Drop references taken by acquire_images. Files stay until gc_images removes them."""
+    for name, count in Counter(name for name in names if name).items():
+        _adjust(name, -count)
+
+
+# --- Garbage collection (manage.py gc_images) ---
+
+def _remove(paths, dry_run):
+    freed = 0
+    for path in paths:
+        try:
+            freed += os.path.getsize(path)
+            if not dry_run:
+                os.remove(path)
+        except FileNotFoundError:
+            pass
+    return freed
+
+
+def collect_garbage(grace_seconds, dry_run=False):
+    """
+    Delete every blob that has had no references for `grace_seconds`, row
+    and files. Returns (blobs removed, bytes freed).
+    """
+    cutoff = timezone.now() - timedelta(seconds=grace_seconds)
+    collectable = ImageBlob.objects.filter(refCount__lte=0, updatedAt__lt=cutoff)
+    removed = freed = 0
+    for name in list(collectable.values_list('name', flat=True)):
+        if dry_run:
+            removed += 1
+            freed += _remove(blob_paths(name), dry_run=True)
+            continue
+        with transaction.atomic():
+            # Re-checked under the row lock: an upload may have just taken a reference
+            if not collectable.filter(name=name).delete()[0]:
+                continue
+            # Files go before the commit, so a later upload of the same image writes them again
+            freed += _remove(blob_paths(name), dry_run=False)
+        removed += 1
+    return removed, freed
+
+
+def recount_references(grace_seconds):
+    """
+    Reset refCount from the Meal and unfinished MealJob rows, e.g. after
+    users were deleted with their meals. Only blobs untouched for
+    `grace_seconds` are changed, and only if still untouched when written.
+    Returns the number of blobs corrected.
+    """
+    references = Counter()
+    for queryset in (Meal.objects.all(), MealJob.objects.filter(status__in=[MealJob.PENDING, MealJob.RUNNING])):
+        for row in queryset.exclude(image='').values('image').annotate(count=Count('id')):
+            if row['image']:
+                references[row['image']] += row['count']
+
+    cutoff = timezone.now() - timedelta(seconds=grace_seconds)
+    corrected = 0
+    for blob in ImageBlob.objects.filter(updatedAt__lt=cutoff).iterator():
+        actual = references.get(blob.name, 0)
+        if actual != blob.refCount:
+            corrected += ImageBlob.objects.filter(pk=blob.pk, updatedAt=blob.updatedAt).update(refCount=actual)
+    return corrected
+
+
+def sweep_orphans(grace_seconds, dry_run=False, batch_size=500):
+    """
+    Delete files under MEDIA_ROOT/meals older than `grace_seconds` that no
+    ImageBlob names: uploads whose transaction rolled back, interrupted
+    writes, images of uploads where no food was detected. Returns (files
+    removed, bytes freed).
+    """
+    root = os.path.join(settings.MEDIA_ROOT, 'meals')
+    cutoff = time.time() - grace_seconds
+    removed = freed = 0
+    pending = {}
+
+    def flush():
+        nonlocal removed, freed
+        known = set(ImageBlob.objects.filter(name__in=list(pending)).values_list('name', flat=True))
+        for name, paths in pending.items():
+            if name not in known:
+                removed += len(paths)
+                freed += _remove(paths, dry_run)
+        pending.clear()
+
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            try:
+                if os.stat(path).st_mtime >= cutoff:
+                    continue
+            except FileNotFoundError:
+                continue
+            if filename.endswith('.part'):
+                removed += 1
+                freed += _remove([path], dry_run)
+                continue
+            name = os.path.relpath(path, settings.MEDIA_ROOT).replace(os.sep, '/')
+            if name.startswith('meals/thumbs/'):
+                name = 'meals/' + name[len('meals/thumbs/'):]
+            pending.setdefault(name, []).append(path)
+            if len(pending) >= batch_size:
+                flush()
+    if pending:
+        flush()
+    return removed, freed
@@ -1,3 +1,1169 @@
-from django.test import TestCase
+import datetime
+import io
+import json
+import os
+import socket
+import tempfile
+import threading
+from types import SimpleNamespace
+from unittest import mock, skipUnless
+from zoneinfo import ZoneInfo
 
-# Create your tests here.
+import cv2
+import httpx
+import jwt
+import numpy as np
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date
+from PIL import Image, ImageOps
+
+from .ai_cache import InvalidProfileError, calorie_profile
+from .auth_cache import AuthCache, get_auth_cache
+from .detection_cache import CACHE_EVICTIONS, DetectionCache, dhash, model_version
+from .foods import save_meal_items
+from .gemini_client import AsyncGeminiClient, build_gemini_client
+from .google_certs import DEFAULT_MAX_AGE, MIN_REFETCH_INTERVAL, GoogleCerts, max_age
+from .images import ImageDecodeError, encode_display, image_writer, prepare_image
+from .inference import InferenceClient, InferenceServer, LocalDetector, recv_frame, send_frame
+from .meals import claim_jobs, delete_user_meal, process_jobs
+from .models import FoodItem, ImageBlob, Meal, MealItem, MealJob, User, UserDataVersion, DailyNutritionSummary
+from .profiling import make_header, valid_signature
+from .registry import YOLO_DETECTOR
+from .storage import blob_paths, collect_garbage, recount_references
+from .transfer import import_meals
+from .reports import apply_meal_to_summary, day_start, meals_in_days, summary_date, summary_drift
+
+
+def bearer(user):
+    expiration = timezone.now() + datetime.timedelta(hours=1)
+    token = jwt.encode({'googleId': user.googleId, 'exp': expiration.timestamp()}, settings.JWT_SECRET, algorithm="HS256")
+    return f"Bearer {token}"
+
+
+def jpeg(color):
+    """A small solid-colour JPEG; each colour is a distinct upload."""
+    ok, data = cv2.imencode('.jpg', np.full((48, 64, 3), color, dtype=np.uint8))
+    return data.tobytes()
+
+
+class FakeYOLO:
+    """The parts of ultralytics.YOLO that LocalDetector uses; every image shows the same foods."""
+
+    names = {0: 'dosa', 1: 'sambar'}
+
+    def __init__(self, class_ids=(0, 1, 0)):
+        self.class_ids = list(class_ids)
+
+    def predict(self, source, **kwargs):
+        boxes = SimpleNamespace(
+            cls=np.array(self.class_ids, dtype=float),
+            conf=np.linspace(0.6, 0.9, len(self.class_ids)),
+            xyxy=np.zeros((len(self.class_ids), 4)),
+        )
+        return [SimpleNamespace(boxes=boxes) for _ in source]
+
+
+class DetectorTestCase(TestCase):
+    """Uploads go through FakeYOLO and land in a temporary MEDIA_ROOT."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='uploader', googleId='uploader')
+
+    def setUp(self):
+        get_auth_cache().clear()
+        self.client.defaults['HTTP_AUTHORIZATION'] = bearer(self.user)
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.media_root = media.name
+        media_settings = override_settings(MEDIA_ROOT=media.name)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        for patcher in (
+            mock.patch.object(YOLO_DETECTOR, 'get', return_value=LocalDetector(model=FakeYOLO())),
+            # Class ids are bound to nutrition entries once per process
+            mock.patch('api.meals._class_entry_ids', None),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def upload(self, color, **extra):
+        return self.client.post('/meals/', {'image': SimpleUploadedFile('meal.jpg', jpeg(color)), 'mealType': 'lunch'},
+                                 **extra)
+
+
+def plate(seed, size=(240, 320)):
+    """A smooth random BGR picture, so its dHash has structure."""
+    coarse = np.random.default_rng(seed).integers(0, 256, (6, 8, 3), dtype=np.uint8)
+    return cv2.resize(coarse, size[::-1], interpolation=cv2.INTER_CUBIC)
+
+
+class DetectionCacheTests(TestCase):
+    """Near-duplicate photos reuse a detection; the cache is bounded and tied to one model version."""
+
+    def test_near_duplicates_hit_and_different_images_miss(self):
+        cache = DetectionCache(max_entries=8, max_distance=4, version='v1')
+        original = plate(1)
+        cache.put(dhash(original), 'dosa')
+
+        ok, encoded = cv2.imencode('.jpg', cv2.convertScaleAbs(original, alpha=1.0, beta=6), [cv2.IMWRITE_JPEG_QUALITY, 60])
+        recompressed = cv2.resize(cv2.imdecode(encoded, cv2.IMREAD_COLOR), (160, 120), interpolation=cv2.INTER_AREA)
+        self.assertLessEqual((dhash(recompressed) ^ dhash(original)).bit_count(), 4)
+        self.assertEqual(cache.get(dhash(recompressed)), 'dosa')
+
+        other = plate(2)
+        self.assertGreater((dhash(other) ^ dhash(original)).bit_count(), 4)
+        self.assertIsNone(cache.get(dhash(other)))
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_distance_threshold(self):
+        cache = DetectionCache(max_entries=8, max_distance=2)
+        cache.put(0b1111, 'idli')
+        self.assertEqual(cache.get(0b1100), 'idli')
+        self.assertIsNone(cache.get(0b1000))
+        exact_only = DetectionCache(max_entries=8, max_distance=0)
+        exact_only.put(0b1111, 'idli')
+        self.assertIsNone(exact_only.get(0b1110))
+
+    def test_least_recently_used_is_evicted_at_capacity(self):
+        cache = DetectionCache(max_entries=2, max_distance=0)
+        evictions = CACHE_EVICTIONS.value
+        cache.put(1, 'a')
+        cache.put(2, 'b')
+        cache.get(1)
+        cache.put(3, 'c')
+        self.assertIsNone(cache.get(2))
+        self.assertEqual((cache.get(1), cache.get(3)), ('a', 'c'))
+        self.assertEqual(cache.stats()['size'], 2)
+        self.assertEqual((cache.evictions, CACHE_EVICTIONS.value - evictions), (1, 1))
+
+    def test_model_version_change_drops_entries(self):
+        cache = DetectionCache(max_entries=8, max_distance=0, version='v1')
+        cache.put(1, 'a')
+        cache.set_version('v1')
+        self.assertEqual(cache.get(1), 'a')
+        cache.set_version('v2')
+        self.assertIsNone(cache.get(1))
+        self.assertEqual(cache.stats()['version'], 'v2')
+
+    def test_detector_skips_inference_for_a_cached_image(self):
+        model = FakeYOLO()
+        detector = LocalDetector(model=model, cache=DetectionCache(max_entries=8, max_distance=4))
+        with mock.patch.object(model, 'predict', wraps=model.predict) as predict:
+            first = detector.detect(plate(1))
+            again = detector.detect(plate(1))
+        self.assertEqual(predict.call_count, 1)
+        self.assertEqual(again, first)
+        # A different model file or setting is a different version: nothing carries over
+        self.assertNotEqual(model_version(None, 0.5, 640), model_version(None, 0.25, 640))
+
+
+class InferenceServerTests(TestCase):
+    """InferenceClient <-> InferenceServer over a Unix socket, with FakeYOLO behind it."""
+
+    def serve(self, **kwargs):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = tmp.name
+        self.model = FakeYOLO()
+        server = InferenceServer(None, os.path.join(tmp.name, 'yolo.sock'), model=self.model, **kwargs)
+        server.start()
+        self.addCleanup(server.close)
+        return server
+
+    def test_round_trip(self):
+        server = self.serve()
+        client = InferenceClient(server.socket_path, timeout=5)
+        self.assertEqual(client.names, FakeYOLO.names)
+
+        path = os.path.join(self.tmp, 'meal.jpg')
+        with open(path, 'wb') as f:
+            f.write(jpeg((0, 0, 200)))
+        detections = client.detect_batch([jpeg((0, 200, 0)), plate(1), path])
+        self.assertEqual(len(detections), 3)
+        for detection in detections:
+            self.assertEqual(detection.class_ids, [0, 1, 0])
+            self.assertEqual(len(detection.boxes), 3)
+        self.assertEqual(client.stats()['images'], 3)
+
+    def test_concurrent_clients_share_a_batch(self):
+        server = self.serve(window_ms=300, max_batch=16)
+        client = InferenceClient(server.socket_path, timeout=5)
+        batch_sizes = []
+        predict = self.model.predict
+
+        def record(source, **kwargs):
+            batch_sizes.append(len(source))
+            return predict(source, **kwargs)
+
+        results = []
+        with mock.patch.object(self.model, 'predict', side_effect=record):
+            threads = [threading.Thread(target=lambda seed=seed: results.append(client.detect(plate(seed))))
+                       for seed in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join(5)
+
+        self.assertEqual(len(results), 4)
+        self.assertEqual(sum(batch_sizes), 4)
+        self.assertLess(len(batch_sizes), 4)
+        self.assertEqual((server.batches, server.images), (len(batch_sizes), 4))
+
+    def test_server_does_not_open_paths(self):
+        server = self.serve()
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+            conn.settimeout(5)
+            conn.connect(server.socket_path)
+            send_frame(conn, {'op': 'detect', 'items': [{'kind': 'path', 'path': '/etc/passwd', 'size': 0}]})
+            response, _ = recv_frame(conn)
+        self.assertIn("Bad detect request", response['error'])
+        self.assertEqual(server.images, 0)
+
+
+class MealDateRangeTests(TestCase):
+    """Meals count on the user's local day; local-day ranges are searched on meal_user_created_idx."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='kolkata', googleId='kolkata', timezone='Asia/Kolkata')
+        cls.other = User.objects.create(username='other', googleId='other')
+
+    def add_meal(self, user, created_at, calories=100):
+        meal = Meal.objects.create(user=user, mealType='lunch', calories=calories)
+        Meal.objects.filter(pk=meal.pk).update(createdAt=created_at)
+        meal.refresh_from_db()
+        return meal
+
+    def summary_dates(self, user):
+        return list(DailyNutritionSummary.objects.filter(user=user).values_list('date', flat=True))
+
+    def test_day_follows_user_timezone(self):
+        # 20:00 UTC on the 1st is already the 2nd in Kolkata (UTC+5:30)
+        late = datetime.datetime(2025, 3, 1, 20, 0, tzinfo=datetime.timezone.utc)
+        apply_meal_to_summary(self.add_meal(self.user, late))
+        apply_meal_to_summary(self.add_meal(self.other, late))
+
+        self.assertEqual(self.summary_dates(self.user), [datetime.date(2025, 3, 2)])
+        self.assertEqual(self.summary_dates(self.other), [datetime.date(2025, 3, 1)])
+
+    def test_local_midnight_starts_the_day(self):
+        midnight = day_start(datetime.date(2025, 4, 1), ZoneInfo('Asia/Kolkata'))
+        apply_meal_to_summary(self.add_meal(self.user, midnight))
+        apply_meal_to_summary(self.add_meal(self.user, midnight - datetime.timedelta(microseconds=1)))
+        self.assertEqual(sorted(self.summary_dates(self.user)), [datetime.date(2025, 3, 31), datetime.date(2025, 4, 1)])
+
+    def test_day_range_is_half_open(self):
+        tz = ZoneInfo('Asia/Kolkata')
+        day = datetime.date(2025, 4, 1)
+        midnight, next_midnight = day_start(day, tz), day_start(day + datetime.timedelta(days=1), tz)
+        inside = [self.add_meal(self.user, midnight), self.add_meal(self.user, next_midnight - datetime.timedelta(microseconds=1))]
+        self.add_meal(self.user, midnight - datetime.timedelta(microseconds=1))
+        self.add_meal(self.user, next_midnight)
+        self.add_meal(self.other, midnight)
+        self.assertEqual(sorted(meals_in_days([self.user.id], tz, day, day).values_list('pk', flat=True)),
+                         sorted(meal.pk for meal in inside))
+
+    def test_drift_check_limited_to_recent_days(self):
+        old = timezone.now() - datetime.timedelta(days=90)
+        apply_meal_to_summary(self.add_meal(self.user, old))
+        recent = self.add_meal(self.user, timezone.now() - datetime.timedelta(days=2))
+        apply_meal_to_summary(recent)
+        DailyNutritionSummary.objects.filter(user=self.user).update(calories=1)
+
+        since = timezone.localdate() - datetime.timedelta(days=31)
+        drifted = [date for _, date, _, _ in summary_drift([self.user.id], since)]
+        self.assertEqual(drifted, [summary_date(recent.createdAt, ZoneInfo('Asia/Kolkata'))])
+        self.assertEqual(len(summary_drift([self.user.id])), 2)
+
+    def month_range(self):
+        # The monthly view's window, as local days, over Meal
+        tz = ZoneInfo(self.user.timezone)
+        today = timezone.localdate(timezone=tz)
+        return meals_in_days([self.user.id], tz, today.replace(day=1), today)
+
+    def summary_queries(self):
+        # What get_daily_meals and get_monthly_meals run
+        today = timezone.localdate()
+        return [
+            DailyNutritionSummary.objects.filter(user=self.user, date=today),
+            DailyNutritionSummary.objects.filter(user=self.user, date__gte=today.replace(day=1), mealCount__gt=0)
+            .order_by('date'),
+        ]
+
+    @skipUnless(connection.vendor == 'sqlite', 'SQLite query plan')
+    def test_sqlite_uses_user_created_index(self):
+        # createdAt >= ? AND createdAt < ? searched inside the user's slice of the index
+        plan = self.month_range().explain()
+        self.assertIn('meal_user_created_idx (user_id=? AND createdAt>? AND createdAt<?)', plan)
+        # The (user, date) unique constraint; SQLite keeps it as a table constraint (sqlite_autoindex_*)
+        day, month = (queryset.explain() for queryset in self.summary_queries())
+        self.assertIn('(user_id=? AND date=?)', day)
+        self.assertIn('(user_id=? AND date>?)', month)
+        self.assertNotIn('TEMP B-TREE', month)
+
+    @skipUnless(connection.vendor == 'postgresql', 'PostgreSQL query plan')
+    def test_postgresql_uses_user_created_index(self):
+        with connection.cursor() as cursor:
+            # A test table is tiny, so make the planner show whether the index is usable at all
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        plan = self.month_range().explain()
+        self.assertIn('meal_user_created_idx', plan)
+        self.assertIn('"createdAt" >=', plan)
+        self.assertIn('"createdAt" <', plan)
+        for queryset in self.summary_queries():
+            self.assertIn('daily_summary_user_date_uniq', queryset.explain())
+
+
+class ConditionalGetTests(TestCase):
+    """daily/monthly/profile answer If-None-Match from the user's data version alone."""
+
+    AGGREGATE_TABLES = (Meal._meta.db_table, DailyNutritionSummary._meta.db_table)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='poller', googleId='poller', timezone='Asia/Kolkata')
+
+    def setUp(self):
+        get_auth_cache().clear()
+        caches[settings.RESPONSE_CACHE_ALIAS].clear()
+        expiration = timezone.now() + datetime.timedelta(hours=1)
+        token = jwt.encode({'googleId': self.user.googleId, 'exp': expiration.timestamp()},
+                           settings.JWT_SECRET, algorithm="HS256")
+        self.client.defaults['HTTP_AUTHORIZATION'] = f"Bearer {token}"
+
+    def paths(self):
+        return ['/meals/daily/', '/meals/monthly/', f'/profile/{self.user.id}/']
+
+    def add_meal(self, calories=250):
+        with transaction.atomic():
+            meal = Meal.objects.create(user=self.user, mealType='lunch', calories=calories, items='rice')
+            apply_meal_to_summary(meal)
+        return meal
+
+    def assert_no_aggregation(self, queries):
+        for query in queries:
+            for table in self.AGGREGATE_TABLES:
+                self.assertNotIn(table, query['sql'])
+
+    def test_304_runs_no_aggregation_queries(self):
+        self.add_meal()
+        for path in self.paths():
+            with self.subTest(path=path):
+                first = self.client.get(path)
+                self.assertEqual(first.status_code, 200)
+                self.assertTrue(first['ETag'].startswith('"'))
+
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(path, HTTP_IF_NONE_MATCH=first['ETag'])
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response['ETag'], first['ETag'])
+                self.assertEqual(response.content, b'')
+                # Just the version lookup
+                self.assertEqual(len(queries), 1)
+                self.assert_no_aggregation(queries)
+
+    def test_if_modified_since_gets_304(self):
+        self.add_meal()
+        # Last-Modified is only sent once its second is over
+        UserDataVersion.objects.filter(user=self.user).update(updatedAt=timezone.now() - datetime.timedelta(minutes=1))
+        first = self.client.get('/meals/daily/')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/meals/daily/', HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+        self.assert_no_aggregation(queries)
+
+    def test_write_in_the_same_second_is_not_a_304(self):
+        self.add_meal()
+        updated = UserDataVersion.objects.get(user=self.user).updatedAt.timestamp()
+        same_second = http_date(int(updated))
+        with mock.patch('api.versions.time') as clock:
+            # Still the second of the write: another write could follow and keep its Last-Modified
+            clock.time.return_value = updated
+            response = self.client.get('/meals/daily/')
+            self.assertFalse(response.has_header('Last-Modified'))
+            self.assertEqual(self.client.get('/meals/daily/', HTTP_IF_MODIFIED_SINCE=same_second).status_code, 200)
+
+            clock.time.return_value = int(updated) + 1
+            response = self.client.get('/meals/daily/')
+            self.assertEqual(response['Last-Modified'], same_second)
+            self.assertEqual(self.client.get('/meals/daily/', HTTP_IF_MODIFIED_SINCE=same_second).status_code, 304)
+            # An ETag that no longer matches wins over a matching date
+            self.assertEqual(self.client.get('/meals/daily/', HTTP_IF_MODIFIED_SINCE=same_second,
+                                             HTTP_IF_NONE_MATCH='"stale"').status_code, 200)
+
+    def test_rendered_body_is_reused(self):
+        first = self.client.get('/meals/monthly/')
+        with CaptureQueriesContext(connection) as queries:
+            again = self.client.get('/meals/monthly/')
+        self.assertEqual(again.status_code, 200)
+        self.assertEqual(again.content, first.content)
+        self.assert_no_aggregation(queries)
+
+    def test_meal_add_and_delete_change_the_etag(self):
+        before = self.client.get('/meals/daily/')
+        meal = self.add_meal(calories=300)
+        added = self.client.get('/meals/daily/', HTTP_IF_NONE_MATCH=before['ETag'])
+        self.assertEqual(added.status_code, 200)
+        self.assertNotEqual(added['ETag'], before['ETag'])
+        self.assertEqual(added.json()['total'], 300)
+
+        delete_user_meal(meal)
+        deleted = self.client.get('/meals/daily/', HTTP_IF_NONE_MATCH=added['ETag'])
+        self.assertEqual(deleted.status_code, 200)
+        self.assertEqual(deleted.json()['total'], 0)
+
+    def test_profile_update_changes_the_etag(self):
+        path = f'/profile/{self.user.id}/'
+        before = self.client.get(path)
+        self.assertEqual(self.client.post('/profile/', {'weight': 70}, content_type='application/json').status_code, 200)
+        after = self.client.get(path, HTTP_IF_NONE_MATCH=before['ETag'])
+        self.assertEqual(after.status_code, 200)
+        self.assertEqual(after.json()['weight'], 70)
+        self.assertNotEqual(after['ETag'], before['ETag'])
+
+    def test_other_users_profile_is_not_conditional(self):
+        other = User.objects.create(username='other-poller', googleId='other-poller')
+        response = self.client.get(f'/profile/{other.id}/')
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(response.has_header('ETag'))
+
+
+class TopFoodsTests(TestCase):
+    """Per-food statistics come from MealItem with one GROUP BY on mealitem_user_created_idx."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='eater', googleId='eater', timezone='Asia/Kolkata')
+        cls.other = User.objects.create(username='other-eater', googleId='other-eater')
+
+    def setUp(self):
+        get_auth_cache().clear()
+        expiration = timezone.now() + datetime.timedelta(hours=1)
+        token = jwt.encode({'googleId': self.user.googleId, 'exp': expiration.timestamp()},
+                           settings.JWT_SECRET, algorithm="HS256")
+        self.client.defaults['HTTP_AUTHORIZATION'] = f"Bearer {token}"
+
+    def add_meal(self, user, labels, confidences=None):
+        meal = Meal.objects.create(user=user, mealType='lunch', calories=100, items=", ".join(labels))
+        save_meal_items([(meal, labels, confidences)])
+        return meal
+
+    def test_repeated_detections_become_one_item(self):
+        meal = self.add_meal(self.user, ['Dosa', 'dosa', 'Sambar'], [0.5, 0.9, 0.7])
+        items = {item.food.name: item for item in meal.mealItems.select_related('food')}
+        self.assertEqual(set(items), {'dosa', 'sambar'})
+        self.assertEqual(items['dosa'].quantity, 2)
+        self.assertAlmostEqual(items['dosa'].confidence, 0.9)
+        self.assertEqual(items['dosa'].food.calories, FoodItem.objects.get(key='dosa').calories)
+
+    def test_unknown_food_gets_its_own_row(self):
+        meal = self.add_meal(self.user, ['Moon Cake'])
+        food = meal.mealItems.get().food
+        self.assertEqual((food.name, food.key, food.calories), ('Moon Cake', 'mooncake', None))
+
+    def test_top_foods_endpoint(self):
+        self.add_meal(self.user, ['dosa', 'dosa', 'sambar'])
+        self.add_meal(self.user, ['dosa', 'sambar', 'sambar', 'sambar'])
+        self.add_meal(self.user, ['idli'])
+        self.add_meal(self.other, ['idli', 'idli', 'idli', 'idli', 'idli'])
+
+        response = self.client.get('/meals/foods/top/', {'limit': 2})
+        self.assertEqual(response.status_code, 200)
+        foods = [(food['name'], food['meals'], food['quantity']) for food in response.json()['foods']]
+        self.assertEqual(foods, [('sambar', 2, 4), ('dosa', 2, 3)])
+
+        self.assertEqual(self.client.get('/meals/foods/top/', {'from': '2025-03-02', 'to': '2025-03-01'}).status_code, 400)
+
+    def test_import_writes_meal_items_for_known_foods_only(self):
+        foods = FoodItem.objects.count()
+        result = import_meals(self.user, [b'{"items": ["Dal", "Free Crypto", "dal", "roti"], "calories": 420}\n'])
+        self.assertEqual(result['imported'], 1)
+        items = MealItem.objects.filter(user=self.user).values_list('food__key', 'quantity', 'confidence')
+        self.assertEqual(sorted(items), [('dal', 2, None), ('roti', 1, None)])
+        # Imported names never create shared FoodItem rows
+        self.assertEqual(FoodItem.objects.count(), foods)
+        self.assertEqual(Meal.objects.get(user=self.user).items, "Dal, Free Crypto, dal, roti")
+
+    @skipUnless(connection.vendor == 'sqlite', 'SQLite query plan')
+    def test_sqlite_uses_user_created_index(self):
+        now = timezone.now()
+        plan = MealItem.objects.filter(
+            user=self.user, createdAt__gte=now - datetime.timedelta(days=30), createdAt__lt=now,
+        ).values('food_id').annotate(meals=Count('id')).explain()
+        self.assertIn('mealitem_user_created_idx', plan)
+        # No join to Meal
+        self.assertNotIn(f'{Meal._meta.db_table} ', plan)
+
+
+class AuthCacheTests(TestCase):
+    """A cached request.user never outlives a change to the user."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='cached', googleId='cached', timezone='UTC')
+
+    def setUp(self):
+        get_auth_cache().clear()
+        self.exp = (timezone.now() + datetime.timedelta(hours=1)).timestamp()
+        self.token = jwt.encode({'googleId': self.user.googleId, 'exp': self.exp}, settings.JWT_SECRET, algorithm="HS256")
+        self.client.defaults['HTTP_AUTHORIZATION'] = f"Bearer {self.token}"
+
+    def test_profile_update_evicts_snapshot(self):
+        self.assertEqual(self.client.get(f'/profile/{self.user.id}/').status_code, 200)
+        self.assertIsNotNone(get_auth_cache().get(self.token))
+
+        self.client.post('/profile/', {'weight': 81}, content_type='application/json')
+        self.assertIsNone(get_auth_cache().get(self.token))
+        self.assertEqual(self.client.get(f'/profile/{self.user.id}/').json()['weight'], 81)
+
+    def test_timezone_change_evicts_snapshot(self):
+        self.client.get(f'/profile/{self.user.id}/')
+        self.client.post('/profile/', {'timezone': 'Asia/Kolkata'}, content_type='application/json')
+        self.assertIsNone(get_auth_cache().get(self.token))
+
+        self.client.get(f'/profile/{self.user.id}/')
+        self.assertEqual(get_auth_cache().get(self.token).timezone, 'Asia/Kolkata')
+
+    def test_invalidation_during_lookup_is_not_cached(self):
+        for cache in (AuthCache(), AuthCache(backend=LocMemCache('auth-cache-test', {}))):
+            with self.subTest(shared=cache.backend is not None):
+                marker = cache.begin(self.user.googleId)
+                stale = User.objects.get(pk=self.user.pk)
+                # A profile update lands between the query and put()
+                cache.invalidate_user(self.user)
+                cache.put(self.token, stale, self.exp, marker)
+                self.assertIsNone(cache.get(self.token))
+
+                cache.put(self.token, stale, self.exp, cache.begin(self.user.googleId))
+                self.assertIsNotNone(cache.get(self.token))
+
+
+    def test_counters_are_exact_under_threads(self):
+        cache = AuthCache()
+        cache.put(self.token, self.user, self.exp, cache.begin(self.user.googleId))
+
+        def lookups():
+            for _ in range(2000):
+                cache.get(self.token)
+                cache.get('unknown-token')
+
+        threads = [threading.Thread(target=lookups) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual((cache.hits, cache.misses), (16000, 16000))
+        self.assertEqual(cache.stats()['hit_rate'], 0.5)
+
+class MealJobTests(DetectorTestCase):
+    """Prefer: respond-async queues the upload; the worker saves the meal and the status URL reports it."""
+
+    def test_queued_upload_is_saved_by_the_worker(self):
+        response = self.upload((10, 200, 30), HTTP_PREFER='respond-async')
+        self.assertEqual(response.status_code, 202)
+        job_id = response.json()['jobId']
+        self.assertEqual(self.client.get(f'/meals/jobs/{job_id}/').json()['status'], MealJob.PENDING)
+        self.assertFalse(Meal.objects.exists())
+
+        self.assertEqual(process_jobs(claim_jobs(10)), 1)
+        status = self.client.get(f'/meals/jobs/{job_id}/').json()
+        self.assertEqual(status['status'], MealJob.DONE)
+        self.assertEqual(status['meal']['items'], ['dosa', 'sambar', 'dosa'])
+
+        meal = Meal.objects.get(pk=status['meal']['id'])
+        self.assertEqual(MealJob.objects.get(pk=job_id).meal, meal)
+        self.assertEqual(DailyNutritionSummary.objects.get(user=self.user).mealCount, 1)
+        self.assertEqual(sorted(meal.mealItems.values_list('food__key', 'quantity')), [('dosa', 2), ('sambar', 1)])
+        # The job's image reference passed to the meal
+        self.assertEqual(ImageBlob.objects.get(name=meal.image.name).refCount, 1)
+
+    def test_job_is_claimed_once(self):
+        self.upload((10, 200, 30), HTTP_PREFER='respond-async')
+        self.assertEqual(len(claim_jobs(10)), 1)
+        self.assertEqual(claim_jobs(10), [])
+
+    def test_unreadable_image_fails_without_retry(self):
+        response = self.upload((10, 200, 30), HTTP_PREFER='respond-async')
+        job = MealJob.objects.get(pk=response.json()['jobId'])
+        with open(os.path.join(self.media_root, job.image.name), 'wb') as f:
+            f.write(b'not an image')
+
+        process_jobs(claim_jobs(10))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (MealJob.FAILED, 1))
+        self.assertIsNotNone(job.error)
+        self.assertFalse(Meal.objects.exists())
+        self.assertEqual(ImageBlob.objects.get(name=job.image.name).refCount, 0)
+
+
+class BatchUploadTests(DetectorTestCase):
+    """POST /meals/batch/ detects every image in one call and saves the meals in one transaction."""
+
+    def images(self, *colors):
+        return [SimpleUploadedFile(f'meal{i}.jpg', jpeg(color)) for i, color in enumerate(colors)]
+
+    def test_bad_image_fails_alone(self):
+        images = self.images((200, 0, 0), (0, 200, 0)) + [SimpleUploadedFile('notes.txt', b'not an image')]
+        with mock.patch.object(FakeYOLO, 'predict', autospec=True, side_effect=FakeYOLO.predict) as predict:
+            response = self.client.post('/meals/batch/', {'images': images, 'mealType': ['breakfast', 'dinner']})
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body['saved'], 2)
+        # Both good images in a single model call
+        self.assertEqual(predict.call_count, 1)
+        self.assertEqual(len(predict.call_args.kwargs['source']), 2)
+
+        results = body['results']
+        self.assertEqual([r['index'] for r in results], [0, 1, 2])
+        self.assertIn('error', results[2])
+        self.assertEqual(
+            sorted(Meal.objects.values_list('mealType', flat=True)), ['breakfast', 'dinner'],
+        )
+        summary = DailyNutritionSummary.objects.get(user=self.user)
+        self.assertEqual(summary.mealCount, 2)
+        self.assertEqual(MealItem.objects.filter(user=self.user).count(), 4)
+
+    def test_batch_size_is_limited(self):
+        with self.settings(MEAL_BATCH_MAX_IMAGES=2):
+            response = self.client.post('/meals/batch/', {'images': self.images((1, 1, 1), (2, 2, 2), (3, 3, 3))})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Meal.objects.exists())
+
+    def test_no_images(self):
+        self.assertEqual(self.client.post('/meals/batch/', {}).status_code, 400)
+
+
+class ImageStorageTests(DetectorTestCase):
+    """Identical uploads share one file; gc_images removes it only once no meal uses it."""
+
+    def upload_twice(self):
+        first = self.upload((90, 40, 160)).json()['meal']
+        second = self.upload((90, 40, 160)).json()['meal']
+        image_writer.flush()
+        return Meal.objects.get(pk=first['id']), Meal.objects.get(pk=second['id'])
+
+    def age_blobs(self):
+        ImageBlob.objects.update(updatedAt=timezone.now() - datetime.timedelta(hours=2))
+
+    def test_identical_uploads_share_one_blob(self):
+        first, second = self.upload_twice()
+        self.assertEqual(first.image.name, second.image.name)
+        blob = ImageBlob.objects.get()
+        self.assertEqual(blob.refCount, 2)
+        self.assertTrue(all(os.path.exists(path) for path in blob_paths(blob.name)))
+
+    def test_last_reference_then_gc_removes_files(self):
+        first, second = self.upload_twice()
+        paths = blob_paths(first.image.name)
+
+        delete_user_meal(first)
+        self.age_blobs()
+        self.assertEqual(collect_garbage(grace_seconds=3600), (0, 0))
+        self.assertEqual(ImageBlob.objects.get().refCount, 1)
+        self.assertTrue(all(os.path.exists(path) for path in paths))
+
+        delete_user_meal(second)
+        self.assertEqual(ImageBlob.objects.get().refCount, 0)
+        # Still inside the grace period
+        self.assertEqual(collect_garbage(grace_seconds=3600)[0], 0)
+
+        self.age_blobs()
+        removed, freed = collect_garbage(grace_seconds=3600)
+        self.assertEqual(removed, 1)
+        self.assertGreater(freed, 0)
+        self.assertFalse(ImageBlob.objects.exists())
+        self.assertFalse(any(os.path.exists(path) for path in paths))
+
+    def test_recount_restores_a_wrong_count(self):
+        meal, _ = self.upload_twice()
+        ImageBlob.objects.update(refCount=0)
+        self.age_blobs()
+        self.assertEqual(recount_references(grace_seconds=3600), 1)
+        self.assertEqual(ImageBlob.objects.get(name=meal.image.name).refCount, 2)
+        self.assertEqual(collect_garbage(grace_seconds=3600), (0, 0))
+
+
+def quadrants(width, height):
+    """An upright RGB picture with a different solid colour in each quadrant."""
+    image = Image.new('RGB', (width, height))
+    colours = ((220, 30, 30), (30, 220, 30), (30, 30, 220), (220, 220, 30))
+    for i, colour in enumerate(colours):
+        left, top = (i % 2) * width // 2, (i // 2) * height // 2
+        image.paste(colour, (left, top, left + width // 2, top + height // 2))
+    return image
+
+
+def exif_jpeg(image, orientation):
+    exif = Image.Exif()
+    exif[0x0112] = orientation
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', quality=95, exif=exif)
+    return buffer.getvalue()
+
+
+def corner_colours(bgr):
+    """Mean RGB of the middle of each quadrant, rounded to tens."""
+    height, width = bgr.shape[:2]
+    corners = []
+    for top, left in ((0, 0), (0, 1), (1, 0), (1, 1)):
+        y, x = (2 * top + 1) * height // 4, (2 * left + 1) * width // 4
+        patch = bgr[y - height // 8:y + height // 8, x - width // 8:x + width // 8]
+        corners.append(tuple(int(round(v, -1)) for v in patch.reshape(-1, 3).mean(axis=0)[::-1]))
+    return corners
+
+
+@override_settings(IMAGE_DISPLAY_SIZE=100, IMAGE_INFERENCE_SIZE=64, IMAGE_FORMAT='jpg')
+class PrepareImageTests(TestCase):
+    """Uploads come out upright and within the size limits, whatever the camera wrote."""
+
+    def test_exif_orientation_is_applied(self):
+        upright = quadrants(120, 80)
+        for orientation in range(1, 9):
+            with self.subTest(orientation=orientation):
+                raw = exif_jpeg(self.unorient(upright, orientation), orientation)
+                # Pillow's own reading of the file agrees on what upright is
+                self.assertEqual(ImageOps.exif_transpose(Image.open(io.BytesIO(raw))).size, upright.size)
+                prepared = prepare_image(raw)
+                self.assertEqual(prepared.orientation, orientation)
+                self.assertEqual(prepared.pixels.shape[:2], (43, 64))
+                self.assertEqual(corner_colours(prepared.pixels), corner_colours(np.asarray(upright)[:, :, ::-1]))
+
+    def unorient(self, upright, orientation):
+        """The stored pixels that EXIF `orientation` turns back into `upright`."""
+        inverse = {
+            2: Image.Transpose.FLIP_LEFT_RIGHT, 3: Image.Transpose.ROTATE_180, 4: Image.Transpose.FLIP_TOP_BOTTOM,
+            5: Image.Transpose.TRANSPOSE, 6: Image.Transpose.ROTATE_90, 7: Image.Transpose.TRANSVERSE,
+            8: Image.Transpose.ROTATE_270,
+        }
+        return upright.transpose(inverse[orientation]) if orientation in inverse else upright
+
+    def test_reduced_decode_keeps_aspect_ratio_and_limits(self):
+        prepared = prepare_image(exif_jpeg(quadrants(900, 600), 1))
+        # 900 // 8 still covers IMAGE_DISPLAY_SIZE, so the JPEG is decoded at 1/8 scale
+        decoded_height, decoded_width = prepared.decoded.shape[:2]
+        self.assertEqual(decoded_width, 113)
+        self.assertGreaterEqual(decoded_width, settings.IMAGE_DISPLAY_SIZE)
+        self.assertAlmostEqual(decoded_width / decoded_height, 1.5, places=1)
+        height, width = prepared.pixels.shape[:2]
+        self.assertEqual(width, settings.IMAGE_INFERENCE_SIZE)
+        self.assertAlmostEqual(width / height, 1.5, places=1)
+
+        display = cv2.imdecode(np.frombuffer(encode_display(prepared), dtype=np.uint8), cv2.IMREAD_COLOR)
+        self.assertEqual(display.shape[1], settings.IMAGE_DISPLAY_SIZE)
+        self.assertAlmostEqual(display.shape[1] / display.shape[0], 1.5, places=1)
+
+    def test_small_images_are_not_upscaled(self):
+        prepared = prepare_image(exif_jpeg(quadrants(40, 30), 6))
+        self.assertEqual(prepared.decoded.shape[:2], (30, 40))
+        self.assertEqual(prepared.pixels.shape[:2], (40, 30))
+
+    def test_rejects_non_images(self):
+        with self.assertRaises(ImageDecodeError):
+            prepare_image(b'not an image')
+
+
+class MealTransferTests(TestCase):
+    """An exported history imports back as the same meals; bad lines are reported, not fatal."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='mover', googleId='mover', timezone='Asia/Kolkata')
+
+    def setUp(self):
+        get_auth_cache().clear()
+        self.client.defaults['HTTP_AUTHORIZATION'] = bearer(self.user)
+
+    def post_ndjson(self, records, content_type='application/x-ndjson'):
+        body = ''.join(record if isinstance(record, str) else json.dumps(record) + '\n' for record in records)
+        return self.client.post('/meals/import/', body, content_type=content_type)
+
+    def export(self, fmt='ndjson'):
+        response = self.client.get('/meals/export/', {'fmt': fmt})
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def test_import_then_export_round_trip(self):
+        records = [
+            {"createdAt": "2025-03-01T12:30:00+00:00", "mealType": "lunch", "items": ["rice", "dal"],
+             "calories": 420.0, "protein": 12.0, "carbs": 70.5, "fats": 8.2},
+            {"createdAt": "2025-03-01T20:00:00", "mealType": "dinner", "items": [],
+             "calories": 300.0, "protein": None, "carbs": None, "fats": None},
+        ]
+        result = self.post_ndjson(records).json()
+        self.assertEqual(result, {"imported": 2, "skipped": 0, "errors": []})
+
+        exported = [json.loads(line) for line in self.export().splitlines()]
+        self.assertEqual(len(exported), 2)
+        for record, row in zip(records, exported):
+            for field in ('mealType', 'items', 'calories', 'protein', 'carbs', 'fats'):
+                self.assertEqual(row[field], record[field])
+            self.assertIsNone(row['imageUrl'])
+        self.assertEqual(datetime.datetime.fromisoformat(exported[0]['createdAt']),
+                         datetime.datetime.fromisoformat(records[0]['createdAt']))
+        # A naive createdAt is the user's local time
+        self.assertEqual(datetime.datetime.fromisoformat(exported[1]['createdAt']),
+                         datetime.datetime(2025, 3, 1, 20, tzinfo=ZoneInfo('Asia/Kolkata')))
+
+        # Exported lines import again unchanged
+        self.assertEqual(self.post_ndjson(exported).json()['imported'], 2)
+        again = [json.loads(line) for line in self.export().splitlines()]
+        for row, original in zip(again, [row for row in exported for _ in (0, 1)]):
+            self.assertEqual({k: v for k, v in row.items() if k != 'id'},
+                             {k: v for k, v in original.items() if k != 'id'})
+
+        summary = DailyNutritionSummary.objects.get(user=self.user, date=datetime.date(2025, 3, 1))
+        self.assertEqual((summary.mealCount, summary.calories), (4, 1440.0))
+        self.assertTrue(self.export('csv').startswith('id,createdAt,mealType,items,'))
+
+    def test_malformed_lines_are_reported_and_skipped(self):
+        response = self.post_ndjson([
+            {"mealType": "breakfast", "items": ["idli"], "calories": 150},
+            '{"mealType": "lunch", \n',
+            {"mealType": "snack", "calories": "lots"},
+            '\n',
+            {"mealType": "dinner", "items": ["dosa"], "calories": 350},
+        ])
+        self.assertEqual(response.status_code, 200)
+        result = response.json()
+        self.assertEqual((result['imported'], result['skipped']), (2, 2))
+        self.assertEqual([error['line'] for error in result['errors']], [2, 3])
+        self.assertIn('calories', result['errors'][1]['error'])
+        self.assertEqual(sorted(Meal.objects.filter(user=self.user).values_list('mealType', flat=True)),
+                         ['breakfast', 'dinner'])
+
+    def test_import_needs_ndjson_content_type(self):
+        response = self.post_ndjson([{"mealType": "lunch"}], content_type='application/json')
+        self.assertEqual(response.status_code, 415)
+        self.assertFalse(Meal.objects.filter(user=self.user).exists())
+
+
+@override_settings(PROFILING_SECRET='profiling-test-secret')
+class ProfilingSignatureTests(TestCase):
+    """X-Profile is client text: anything but a valid, unexpired signature is just rejected."""
+
+    def test_signed_header_is_accepted(self):
+        self.assertTrue(valid_signature(make_header()))
+
+    def test_non_ascii_header_is_rejected(self):
+        expires, _, signature = make_header().partition('.')
+        for value in (f"{expires}.{signature[:-1]}\u00e9", f"{expires}.\u00e9\u00e9", "\u00b2\u00b2.abc", "\u0661\u0662.abc"):
+            with self.subTest(value=value):
+                self.assertFalse(valid_signature(value))
+
+
+class CalorieProfileTests(TestCase):
+    """Profile numbers JSON can't bucket (1e999 parses as inf) are a 400, not a 500."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='dieter', googleId='dieter')
+
+    def setUp(self):
+        get_auth_cache().clear()
+        self.client.defaults['HTTP_AUTHORIZATION'] = bearer(self.user)
+
+    def test_profile_is_bucketed(self):
+        profile = calorie_profile({'age': '31', 'weight': 70.3, 'height': 172.4, 'bmi': 23.71, 'goal': ' Lose  Weight'})
+        self.assertEqual(profile, {'age': 31, 'gender': None, 'weight': 70.5, 'height': 172.0, 'bmi': 23.7,
+                                   'goal': 'lose weight'})
+
+    def test_non_finite_numbers_are_rejected(self):
+        for field, value in (('weight', float('inf')), ('height', 'nan'), ('bmi', 1e308), ('age', '-inf')):
+            with self.subTest(field=field):
+                with self.assertRaises(InvalidProfileError):
+                    calorie_profile({field: value})
+
+    def test_body_must_be_a_json_object(self):
+        with mock.patch('api.views.agenerate_gemini_response') as gemini:
+            for path in ('/calories/calculate/', '/calories/report/'):
+                for body in ('[]', '"x"', '1', 'null'):
+                    with self.subTest(path=path, body=body):
+                        response = self.client.post(path, body, content_type='application/json')
+                        self.assertEqual(response.status_code, 400)
+        gemini.assert_not_called()
+
+    def test_infinite_weight_is_a_400(self):
+        with mock.patch('api.views.agenerate_gemini_response') as gemini:
+            response = self.client.post('/calories/calculate/', '{"weight": 1e999, "height": 170}',
+                                        content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('weight', response.json()['error'])
+        gemini.assert_not_called()
+
+
+class FakeCertsSession:
+    """requests.Session stand-in for GoogleCerts: serves `certs` with `headers` and counts fetches."""
+
+    def __init__(self, certs, headers=None):
+        self.certs = certs
+        self.headers = headers if headers is not None else {'Cache-Control': 'public, max-age=3600'}
+        self.fetches = 0
+        self.fail = False
+        # Cleared to hold fetches until the test sets it
+        self.ready = threading.Event()
+        self.ready.set()
+
+    def get(self, url, timeout=None):
+        self.ready.wait(5)
+        self.fetches += 1
+        if self.fail:
+            raise OSError("certs endpoint unreachable")
+        certs, headers = dict(self.certs), dict(self.headers)
+        return SimpleNamespace(headers=headers, json=lambda: certs, raise_for_status=lambda: None)
+
+
+class GoogleCertsTests(TestCase):
+    """Sign-in keys are fetched once per Cache-Control lifetime, not once per login."""
+
+    def setUp(self):
+        self.session = FakeCertsSession({'kid-1': 'PEM 1'})
+        self.certs = GoogleCerts('http://certs.test/oauth2/v1/certs', refresh_margin=300, session=self.session)
+        self.addCleanup(lambda: self.certs._timer and self.certs._timer.cancel())
+        clock = mock.patch('api.google_certs.time')
+        self.clock = clock.start()
+        self.addCleanup(clock.stop)
+        self.now = 1_000_000.0
+
+    def at(self, seconds):
+        self.clock.time.return_value = self.now + seconds
+
+    def test_max_age_from_headers(self):
+        self.assertEqual(max_age({'Cache-Control': 'public, max-age=20000', 'Age': '500'}), 19500)
+        self.assertEqual(max_age({'Cache-Control': 'max-age=100', 'Age': '400'}), 0)
+        self.assertEqual(max_age({'Cache-Control': 'no-cache, max-age=100'}), 0)
+        expires = http_date(self.now + 600)
+        self.assertEqual(max_age({'Expires': expires}, now=self.now), 600)
+        self.assertEqual(max_age({'Expires': 'not a date'}), 0)
+        self.assertEqual(max_age({}), DEFAULT_MAX_AGE)
+
+    def test_keys_are_cached_until_they_expire(self):
+        self.session.headers = {'Cache-Control': 'max-age=3600', 'Age': '600'}
+        self.at(0)
+        self.assertEqual(self.certs.get('kid-1'), {'kid-1': 'PEM 1'})
+        self.at(2000)
+        self.certs.get('kid-1')
+        self.assertEqual(self.session.fetches, 1)
+        # Age counts against max-age: expired 3000s after the fetch, not 3600s
+        self.at(3000)
+        self.certs.get('kid-1')
+        self.assertEqual(self.session.fetches, 2)
+
+    def test_expires_header_when_there_is_no_max_age(self):
+        self.session.headers = {'Expires': http_date(self.now + 1200)}
+        self.at(0)
+        self.certs.get()
+        self.assertEqual(self.certs.stats()['expires_in'], 1200)
+        self.at(1200 - 300 - 1)
+        self.certs.get()
+        self.assertEqual(self.session.fetches, 1)
+        self.at(1200)
+        self.certs.get()
+        self.assertEqual(self.session.fetches, 2)
+
+    def test_unknown_kid_refetches_at_most_every_interval(self):
+        self.at(0)
+        self.certs.get('kid-1')
+        self.session.certs = {'kid-2': 'PEM 2'}
+        # Rotated keys: the first unknown kid after the interval fetches again, the next ones don't
+        self.at(MIN_REFETCH_INTERVAL / 2)
+        self.assertEqual(self.certs.get('kid-2'), {'kid-1': 'PEM 1'})
+        self.at(MIN_REFETCH_INTERVAL + 1)
+        self.assertEqual(self.certs.get('kid-2'), {'kid-2': 'PEM 2'})
+        self.certs.get('kid-3')
+        self.assertEqual(self.session.fetches, 2)
+
+    def test_refresh_ahead_of_expiry_runs_in_the_background(self):
+        self.at(0)
+        self.certs.get()
+        # A timer refreshes refresh_margin before expiry even without sign-ins
+        self.assertEqual(self.certs._timer.interval, 3600 - 300)
+
+        self.session.certs = {'kid-2': 'PEM 2'}
+        self.session.ready.clear()
+        self.at(3600 - 100)
+        # Inside the margin: answered from the cache while a thread fetches
+        self.assertEqual(self.certs.get(), {'kid-1': 'PEM 1'})
+        self.assertEqual(self.session.fetches, 1)
+        self.session.ready.set()
+        for _ in range(500):
+            if self.certs.background_refreshes:
+                break
+            threading.Event().wait(0.01)
+        self.assertEqual((self.certs.background_refreshes, self.session.fetches), (1, 2))
+        self.assertEqual(self.certs.get(), {'kid-2': 'PEM 2'})
+
+    def test_failed_refetch_keeps_the_cached_keys(self):
+        self.at(0)
+        self.certs.get()
+        self.session.fail = True
+        self.at(3600)
+        with mock.patch('builtins.print') as log:
+            self.assertEqual(self.certs.get(), {'kid-1': 'PEM 1'})
+        self.assertIn('using cached keys', log.call_args.args[0])
+        self.assertEqual(self.certs.fetch_errors, 1)
+        # Retried after MIN_REFETCH_INTERVAL, not on every sign-in
+        self.at(3600 + MIN_REFETCH_INTERVAL - 1)
+        self.certs.get()
+        self.assertEqual(self.session.fetches, 2)
+        self.session.fail = False
+        self.at(3600 + MIN_REFETCH_INTERVAL)
+        self.certs.get()
+        self.assertEqual((self.session.fetches, self.certs.stats()['expires_in']), (3, 3600))
+
+    def test_verifies_tokens_signed_with_a_jwks_key(self):
+        from cryptography.hazmat.primitives.asymmetric import rsa
+        from jwt.algorithms import RSAAlgorithm
+
+        key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        jwk = {**json.loads(RSAAlgorithm.to_jwk(key.public_key())), 'kid': 'jwks-1', 'alg': 'RS256', 'use': 'sig'}
+        self.session.certs = {'keys': [jwk]}
+        self.clock.time.side_effect = lambda: datetime.datetime.now().timestamp()
+        claims = {'iss': 'https://accounts.google.com', 'aud': 'client-id', 'sub': '42',
+                  'exp': timezone.now() + datetime.timedelta(minutes=5)}
+
+        token = jwt.encode(claims, key, algorithm='RS256', headers={'kid': 'jwks-1'})
+        self.assertEqual(self.certs.verify_oauth2_token(token, 'client-id')['sub'], '42')
+        with self.assertRaises(ValueError):
+            self.certs.verify_oauth2_token(jwt.encode({**claims, 'iss': 'evil.example'}, key, algorithm='RS256',
+                                                      headers={'kid': 'jwks-1'}), 'client-id')
+        self.assertEqual(self.session.fetches, 1)
+
+
+class MealReportTests(TestCase):
+    """GET /meals/report/ rolls day summaries up by day, week or month, a page at a time."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='reporter', googleId='reporter')
+        # Mon 3, Wed 5, Mon 10 and Fri 28 March, Tue 1 April 2025
+        for day, calories in ((3, 100), (5, 200), (10, 400), (28, 800)):
+            cls.add_day(datetime.date(2025, 3, day), calories)
+        cls.add_day(datetime.date(2025, 4, 1), 1600)
+
+    @classmethod
+    def add_day(cls, date, calories):
+        DailyNutritionSummary.objects.create(
+            user=cls.user, date=date, mealCount=2, calories=calories, lunch=calories, protein=1, carbs=2, fats=3,
+        )
+
+    def setUp(self):
+        get_auth_cache().clear()
+        self.client.defaults['HTTP_AUTHORIZATION'] = bearer(self.user)
+
+    def report(self, **params):
+        response = self.client.get('/meals/report/', {'from': '2025-03-01', 'to': '2025-04-30', **params})
+        self.assertEqual(response.status_code, 200)
+        return json.loads(b''.join(response.streaming_content))
+
+    def starts_and_totals(self, report):
+        return [(bucket['start'], bucket['total']) for bucket in report['buckets']]
+
+    def test_buckets(self):
+        self.assertEqual(self.starts_and_totals(self.report(bucket='day')), [
+            ('2025-03-03', 100), ('2025-03-05', 200), ('2025-03-10', 400), ('2025-03-28', 800), ('2025-04-01', 1600),
+        ])
+        # Weeks start on Monday; 28 March and 1 April share one
+        self.assertEqual(self.starts_and_totals(self.report(bucket='week')), [
+            ('2025-03-03', 300), ('2025-03-10', 400), ('2025-03-24', 800), ('2025-03-31', 1600),
+        ])
+        month = self.report(bucket='month')
+        self.assertEqual(self.starts_and_totals(month), [('2025-03-01', 1500), ('2025-04-01', 1600)])
+        self.assertEqual(month['buckets'][0]['mealCount'], 8)
+        self.assertEqual(month['buckets'][0]['breakdown']['lunch'], 1500)
+        self.assertEqual(month['buckets'][0]['macros'], {'protein': 4, 'carbs': 8, 'fats': 12})
+        self.assertEqual((month['from'], month['to'], month['bucket'], month['next']),
+                         ('2025-03-01', '2025-04-30', 'month', None))
+
+    def test_next_pages_through_the_range(self):
+        first = self.report(limit=2)
+        self.assertEqual(self.starts_and_totals(first), [('2025-03-03', 100), ('2025-03-05', 200)])
+        self.assertEqual(first['next'], '2025-03-10')
+        second = self.report(limit=2, **{'from': first['next']})
+        self.assertEqual(self.starts_and_totals(second), [('2025-03-10', 400), ('2025-03-28', 800)])
+        last = self.report(limit=2, **{'from': second['next']})
+        self.assertEqual((self.starts_and_totals(last), last['next']), ([('2025-04-01', 1600)], None))
+
+    def test_invalid_requests(self):
+        too_wide = (datetime.date(2025, 4, 30) - datetime.timedelta(days=settings.REPORT_MAX_DAYS)).isoformat()
+        for params in ({'bucket': 'year'}, {'from': '2025-13-01'}, {'limit': 'many'},
+                       {'from': '2025-05-01'}, {'from': too_wide}):
+            with self.subTest(params=params):
+                query = {'from': '2025-03-01', 'to': '2025-04-30', **params}
+                response = self.client.get('/meals/report/', query)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.json())
+
+    async def test_streams_asynchronously_under_asgi(self):
+        response = await self.async_client.get(
+            '/meals/report/', {'from': '2025-03-01', 'to': '2025-04-30', 'bucket': 'month'},
+            AUTHORIZATION=bearer(self.user),
+        )
+        self.assertTrue(response.is_async)
+        body = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual([bucket['total'] for bucket in json.loads(body)['buckets']], [1500, 1600])
+
+
+class GeminiClientTests(TestCase):
+    """The API key never leaves in a URL, and upstream details never reach clients."""
+
+    SECRET = 'AIzaTOPSECRET'
+
+    def client_for(self, handler):
+        self.sent = []
+
+        def record(request):
+            self.sent.append(request)
+            return handler(request)
+
+        return AsyncGeminiClient(self.SECRET, 'http://gemini.test', 'gemini-2.5-flash',
+                                 transport=httpx.MockTransport(record))
+
+    def answer(self, text):
+        return lambda request: httpx.Response(200, json={'candidates': [{'content': {'parts': [{'text': text}]}}]})
+
+    def test_key_goes_in_a_header(self):
+        client = self.client_for(self.answer('```json\n{"dailyCalories": 2100}\n```'))
+        self.assertEqual(async_to_sync(client.generate)('prompt'), {'dailyCalories': 2100})
+        self.assertEqual(self.sent[0].headers['x-goog-api-key'], self.SECRET)
+        self.assertNotIn(self.SECRET, str(self.sent[0].url))
+
+    def test_failures_return_generic_errors(self):
+        cases = (
+            (lambda request: httpx.Response(403, json={'error': 'forbidden'}), '403 Forbidden'),
+            (self.answer('not json at all'), 'not json at all'),
+            (lambda request: httpx.Response(200, json={'unexpected': True}), '"unexpected": true'),
+        )
+        for handler, detail in cases:
+            with self.subTest(detail=detail), mock.patch('builtins.print') as log:
+                result = async_to_sync(self.client_for(handler).generate)('prompt')
+            self.assertEqual(set(result), {'error'})
+            self.assertNotIn(detail, result['error'])
+            # The details are kept for the server log
+            self.assertIn(detail, log.call_args.args[0])
+
+    @override_settings(GEMINI_API_KEY=None)
+    def test_missing_key_is_a_configuration_error(self):
+        with self.assertRaisesMessage(ImproperlyConfigured, 'GEMINI_API_KEY'):
+            build_gemini_client()
+
+    def test_views_answer_502_when_gemini_fails(self):
+        user = User.objects.create(username='gemini-user', googleId='gemini-user')
+        get_auth_cache().clear()
+        self.client.defaults['HTTP_AUTHORIZATION'] = bearer(user)
+        with mock.patch('api.views.agenerate_gemini_response', return_value={'error': 'Failed to parse AI response'}):
+            for path in ('/calories/calculate/', '/calories/report/'):
+                with self.subTest(path=path):
+                    response = self.client.post(path, {'weight': 70}, content_type='application/json')
+                    self.assertEqual(response.status_code, 502)
+                    self.assertEqual(response.json(), {'error': 'Failed to parse AI response'})
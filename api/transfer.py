@@ -0,0 +1,198 @@
+# api/transfer.py
+"""
+Export and import of a user's meal history.
+
+Export reads the meals through the database cursor in chunks
+(.iterator(chunk_size=MEAL_EXPORT_CHUNK_SIZE)) and yields each chunk as soon
+as it is formatted. Import reads the request body line by line and inserts
+MEAL_IMPORT_BATCH_SIZE meals per bulk_create, with one more bulk_create for
+their MealItems. Either way, memory is bounded
+by one chunk or batch, however long the history.
+
+One exported NDJSON line (CSV has the same columns, items as stored):
+
+    {"id": 7, "createdAt": "2025-03-01T12:30:00+00:00", "mealType": "lunch",
+     "items": ["rice", "dal"], "calories": 420.0, "protein": 12.0, "carbs": 70.5,
+     "fats": 8.2, "imageUrl": "https://.../media/meals/..", "thumbnailUrl": null}
+
+Import takes the same records. id, imageUrl and thumbnailUrl are ignored,
+since images are not transferred. A naive createdAt is the user's local
+time; a missing one is now.
+"""
+import csv
+import json
+import math
+import datetime
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.encoding import filepath_to_uri
+
+from .models import Meal
+from .reports import apply_meals_to_summaries, user_timezone
+from .foods import save_meal_items
+
+EXPORT_COLUMNS = (
+    'id', 'createdAt', 'mealType', 'items', 'calories', 'protein', 'carbs', 'fats', 'imageUrl', 'thumbnailUrl',
+)
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+NUMBER_FIELDS = ('calories', 'protein', 'carbs', 'fats')
+MAX_REPORTED_ERRORS = 20
+
+
+# --- Export ---
+
+def export_rows(user):
+    return Meal.objects.filter(user=user).order_by('createdAt', 'id').values_list(
+        'id', 'createdAt', 'mealType', 'items', *NUMBER_FIELDS, 'image', 'thumbnail',
+    )
+
+
+class _Line:
+    """csv.writer target that hands back what was written."""
+
+    def write(self, value):
+        return value
+
+
+def _format_chunk(rows, fmt, media_url):
+    def url(name):
+        return media_url + filepath_to_uri(name) if name else None
+
+    if fmt == 'csv':
+        writer = csv.writer(_Line())
+        return ''.join(
+            writer.writerow([meal_id, created.isoformat(), meal_type, items, *numbers, url(image), url(thumbnail)])
+            for meal_id, created, meal_type, items, *numbers, image, thumbnail in rows
+        )
+    return ''.join(
+        json.dumps(dict(zip(EXPORT_COLUMNS, (
+            meal_id, created.isoformat(), meal_type, items.split(', ') if items else [],
+            *numbers, url(image), url(thumbnail),
+        )))) + '\n'
+        for meal_id, created, meal_type, items, *numbers, image, thumbnail in rows
+    )
+
+
+def _header(fmt):
+    if fmt == 'csv':
+        return ','.join(EXPORT_COLUMNS) + '\r\n'
+    return ''
+
+
+def export_lines(user, fmt, media_url):
+    """Streaming body for GET /meals/export/ (WSGI): one string per chunk of meals."""
+    chunk_size = settings.MEAL_EXPORT_CHUNK_SIZE
+    yield _header(fmt)
+    chunk = []
+    for row in export_rows(user).iterator(chunk_size=chunk_size):
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            yield _format_chunk(chunk, fmt, media_url)
+            chunk = []
+    if chunk:
+        yield _format_chunk(chunk, fmt, media_url)
+
+
+async def aexport_lines(user, fmt, media_url):
+    """
+    export_lines() for ASGI, which would otherwise read a sync iterator to the
+    end before sending. Each chunk is fetched and formatted in a thread.
+    """
+    chunks = export_lines(user, fmt, media_url)
+    while (chunk := await sync_to_async(next)(chunks, None)) is not None:
+        yield chunk
+
+
+# --- Import ---
+
+def _number(record, field):
+    value = record.get(field)
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+        raise ValueError(f"{field} must be a number")
+    return float(value)
+
+
+def meal_from_record(user, record):
+    """Unsaved Meal for one imported record; ValueError says what is wrong with it."""
+    if not isinstance(record, dict):
+        raise ValueError("expected a JSON object")
+
+    created = record.get('createdAt')
+    if created in (None, ''):
+        created_at = timezone.now()
+    else:
+        try:
+            created_at = datetime.datetime.fromisoformat(str(created))
+        except ValueError:
+            raise ValueError("createdAt must be an ISO 8601 datetime")
+        if timezone.is_naive(created_at):
+            created_at = created_at.replace(tzinfo=user_timezone(user))
+
+    meal_type = record.get('mealType')
+    if meal_type is not None and (not isinstance(meal_type, str) or len(meal_type) > 50):
+        raise ValueError("mealType must be a string of at most 50 characters")
+
+    items = record.get('items') or []
+    if isinstance(items, str):
+        items = [item.strip() for item in items.split(',') if item.strip()]
+    if not isinstance(items, list) or not all(isinstance(item, str) for item in items):
+        raise ValueError("items must be a list of strings")
+
+    protein, carbs, fats = (_number(record, field) for field in ('protein', 'carbs', 'fats'))
+    return Meal(
+        user=user,
+        mealType=meal_type,
+        calories=_number(record, 'calories'),
+        protein=protein,
+        carbs=carbs,
+        fats=fats,
+        items=", ".join(items),
+        image=None,
+        createdAt=created_at,
+    )
+
+
+def _insert(meals):
+    # Each batch commits on its own, so a long import never holds the write lock for long
+    with transaction.atomic():
+        Meal.objects.bulk_create(meals)
+        # Imports carry no detection confidences, and their names never become new (global) foods
+        save_meal_items(
+            ((meal, meal.items.split(', ') if meal.items else [], None) for meal in meals), create_missing=False,
+        )
+        apply_meals_to_summaries(meals)
+
+
+def import_meals(user, lines):
+    """
+    Insert one meal per NDJSON line of `lines` (bytes, e.g. the request
+    stream). Bad lines are skipped. Returns {"imported", "skipped", "errors"},
+    with errors listing the first few bad lines.
+    """
+    batch_size = settings.MEAL_IMPORT_BATCH_SIZE
+    batch, imported, skipped, errors = [], 0, 0, []
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            batch.append(meal_from_record(user, json.loads(line)))
+        except ValueError as e:  # json.JSONDecodeError included
+            skipped += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append({"line": number, "error": str(e)})
+            continue
+        if len(batch) == batch_size:
+            _insert(batch)
+            imported += len(batch)
+            batch = []
+    if batch:
+        _insert(batch)
+        imported += len(batch)
+    return {"imported": imported, "skipped": skipped, "errors": errors}
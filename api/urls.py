@@ -1,6 +1,6 @@
 # api/urls.py
 from django.urls import path
-from .views import google_auth_view , get_profile_view, update_profile_view ,calculate_calorie_target_view , generate_health_report_view , add_meal ,delete_meal,get_daily_meals,get_monthly_meals
+from .views import google_auth_view , get_profile_view, update_profile_view ,calculate_calorie_target_view , generate_health_report_view , add_meal ,add_meals_batch ,get_meal_job ,delete_meal,get_daily_meals,get_monthly_meals,get_meal_report,get_top_foods,export_meals,import_meals_view,metrics_view
 
 urlpatterns = [
     # Node.js: router.post('/google', googleAuth); -> Django: /auth/google/
@@ -16,7 +16,14 @@ urlpatterns = [
     # Other paths will be added in Phase 2, 3, and 4
 
     path('meals/',add_meal ,name='add_meal'),
+    path('meals/batch/', add_meals_batch, name='add_meals_batch'),  # POST, several images
+    path('meals/jobs/<int:job_id>/', get_meal_job, name='get_meal_job'),  # GET
     path('meals/<int:meal_id>/', delete_meal, name='delete_meal'),  # DELETE
     path('meals/daily/', get_daily_meals, name='get_daily_meals'),  # GET
     path('meals/monthly/', get_monthly_meals, name='get_monthly_meals'),  # GET
+    path('meals/report/', get_meal_report, name='get_meal_report'),  # GET ?from=&to=&bucket=
+    path('meals/foods/top/', get_top_foods, name='get_top_foods'),  # GET ?from=&to=&limit=
+    path('meals/export/', export_meals, name='export_meals'),  # GET ?fmt=ndjson|csv
+    path('meals/import/', import_meals_view, name='import_meals'),  # POST, NDJSON body
+    path('metrics', metrics_view, name='metrics'),  # GET, Prometheus scrape
 ]
\ No newline at end of file
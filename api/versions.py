@@ -0,0 +1,134 @@
+# api/versions.py
+"""
+Conditional GETs for the polled endpoints (daily, monthly, profile).
+
+UserDataVersion.version goes up in the same transaction as anything those
+responses show: every meal add or delete (all paths go through the summary
+functions in api/reports.py), a summary rebuild, or a profile update.
+
+@conditional_view builds a strong ETag from the version, plus a Last-Modified.
+A matching If-None-Match / If-Modified-Since is answered with 304 after one
+primary-key lookup. Last-Modified has one-second resolution while the version
+can change several times a second, so it is only sent (and If-Modified-Since
+only honoured) once the second it names is over; If-Modified-Since is ignored
+when If-None-Match is present. Either way, Meal and the summaries are not
+touched. Otherwise the body comes from RESPONSE_CACHE_ALIAS when this (user,
+endpoint, version, period) has been rendered before. A bump changes every key,
+so nothing is ever invalidated.
+"""
+import time
+import functools
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from .models import UserDataVersion
+
+
+# --- Version counter ---
+
+def bump_data_versions(user_ids):
+    """Mark these users' data as changed; call inside the transaction that changes it."""
+    ids = set(user_ids)
+    if not ids:
+        return
+    now = timezone.now()
+    rows = UserDataVersion.objects.filter(user_id__in=ids)
+    if rows.update(version=F('version') + 1, updatedAt=now) == len(ids):
+        return
+    # First change for some of them
+    existing = set(rows.values_list('user_id', flat=True))
+    for user_id in ids - existing:
+        try:
+            with transaction.atomic():
+                UserDataVersion.objects.create(user_id=user_id, version=1, updatedAt=now)
+        except IntegrityError:
+            # Another request created the row first
+            UserDataVersion.objects.filter(user_id=user_id).update(version=F('version') + 1, updatedAt=now)
+
+
+async def aget_data_version(user_id):
+    """(version, updatedAt) of a user; (0, None) if their data never changed."""
+    row = await UserDataVersion.objects.filter(user_id=user_id).values_list('version', 'updatedAt').afirst()
+    return row or (0, None)
+
+
+# --- Conditional responses ---
+
+def _cache():
+    return caches[settings.RESPONSE_CACHE_ALIAS]
+
+
+async def _cache_get(cache, key):
+    # The in-process cache answers on the event loop; anything else may block
+    if isinstance(cache, LocMemCache):
+        return cache.get(key)
+    return await cache.aget(key)
+
+
+async def _cache_set(cache, key, value):
+    if isinstance(cache, LocMemCache):
+        cache.set(key, value, settings.RESPONSE_CACHE_TTL)
+    else:
+        await cache.aset(key, value, settings.RESPONSE_CACHE_TTL)
+
+
+def conditional_view(endpoint, scope):
+    """
+    ETag / Last-Modified / 304 and a rendered-body cache for an async JSON
+    view behind @async_jwt_required.
+
+    `scope(request, *args, **kwargs)` returns (key, since): what else the body
+    depends on, such as the user's local date, and when that period began
+    (aware datetime or None). It returns None to serve the view uncached, for
+    example for another user's profile.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            scoped = scope(request, *args, **kwargs)
+            if scoped is None:
+                return await view(request, *args, **kwargs)
+            key, since = scoped
+
+            # Read before the view queries anything, so a cached body is never older than its version
+            version, updated_at = await aget_data_version(request.user.pk)
+            tag = f"{endpoint}-{request.user.pk}-{version}-{key}"
+            etag = f'"{tag}"'
+            last_modified = max((moment for moment in (updated_at, since) if moment), default=None)
+            last_modified = int(last_modified.timestamp()) if last_modified else None
+            if last_modified is not None and last_modified >= int(time.time()):
+                # A write later in this second would carry the same Last-Modified; the ETag still tells them apart
+                last_modified = None
+
+            def with_validators(response):
+                response['ETag'] = etag
+                if last_modified is not None:
+                    response['Last-Modified'] = http_date(last_modified)
+                # Clients keep it but ask again every time (cheap: usually a 304)
+                response['Cache-Control'] = 'private, no-cache'
+                return response
+
+            not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if not_modified is not None:
+                return with_validators(not_modified)
+
+            cache = _cache()
+            cache_key = f"response:{tag}"
+            body = await _cache_get(cache, cache_key)
+            if body is not None:
+                return with_validators(HttpResponse(body, content_type='application/json'))
+
+            response = await view(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            await _cache_set(cache, cache_key, response.content)
+            return with_validators(response)
+        return wrapper
+    return decorator
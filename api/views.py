@@ -1,34 +1,54 @@
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.core.handlers.asgi import ASGIRequest
 from django.views.decorators.csrf import csrf_exempt
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from django.conf import settings
-from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from rest_framework.decorators import authentication_classes
-from .authentication import JWTGoogleAuthentication
-from ultralytics import YOLO
+from .authentication import JWTGoogleAuthentication, async_jwt_required
+from django.views.decorators.http import require_GET, require_POST
 from django.utils import timezone
-from .models import Meal
-import uuid
+from .models import Meal, MealJob, DailyNutritionSummary
 from .models import User
-from collections import defaultdict
+from .reports import (
+    summary_from_daily_row, local_today, get_zone, rebuild_daily_summaries,
+    report_rows, report_lines, areport_lines, REPORT_BUCKETS, day_start, user_timezone,
+)
 from .serializers import UserSerializer 
+from .inference import InferenceError
+from .images import read_upload, prepare_image, image_writer, ImageDecodeError
+from .registry import YOLO_DETECTOR, GOOGLE_AUTH
+from .auth_cache import invalidate_user
+from .versions import bump_data_versions, conditional_view
+from .storage import content_name, upload_digest
+from .metrics import MEAL_STAGE_SECONDS, collect, render
+from .transfer import EXPORT_FORMATS, export_lines, aexport_lines, import_meals
+from .foods import top_foods
+from .ai_cache import InvalidProfileError, calorie_profile, aget_cached_response, astore_response
+from .meals import (
+    thumbnail_name,
+    store_images,
+    save_detected_meal,
+    save_detected_meals,
+    detect_each,
+    absolutize_payload,
+    enqueue_meal_job,
+    delete_user_meal,
+)
 from .utils import (
-    CALORIE_MAP, 
-    generate_gemini_response, # <-- The helper function we use
+    agenerate_gemini_response, # <-- The helper function we use
     CALORIE_TARGET_SCHEMA, 
     HEALTH_REPORT_SCHEMA
 )
 from api.models import Meal
 
 import jwt
-from google.oauth2 import id_token
-from google.auth.transport import requests
+import hmac
 import datetime
 import json
 import os 
-# NOTE: The imports below are ONLY for the Google Auth view, not for Gemini.
+# NOTE: google-auth, genai and the YOLO model are loaded lazily via api.registry.
 
 # --- Authentication Views ---
 
@@ -41,10 +61,9 @@ def google_auth_view(request):
         if not token:
             return JsonResponse({"error": "Token missing"}, status=400)
 
-        request_transport = requests.Request()
-        payload = id_token.verify_oauth2_token(
+        # ✅ Verified against cached Google keys (api/google_certs.py), no fetch per login
+        payload = GOOGLE_AUTH.get().verify_oauth2_token(
             token, 
-            request_transport, 
             settings.GOOGLE_CLIENT_ID 
         )
         
@@ -78,15 +97,23 @@ def google_auth_view(request):
         return JsonResponse({"error": str(e)}, status=400)
 
 # --- Profile Views ---
-# (Unchanged)
-@api_view(['GET'])
-@permission_classes([IsAuthenticated])
-def get_profile_view(request, user_id):
-    user = get_object_or_404(User, pk=user_id)
+# Async read views (this one, daily and monthly meals): under ASGI they run on
+# the event loop and only the ORM queries themselves leave it
+def _own_profile(request, user_id):
+    return (str(user_id), None) if request.user.id == user_id else None
+
+
+@require_GET
+@async_jwt_required
+@conditional_view('profile', _own_profile)
+async def get_profile_view(request, user_id):
+    user = await User.objects.filter(pk=user_id).afirst()
+    if user is None:
+        return JsonResponse({"detail": "No User matches the given query."}, status=404)
     if request.user.id != user.id:
         return JsonResponse({"error": "Forbidden"}, status=403)
-    from .serializers import UserSerializer 
     return JsonResponse(UserSerializer(user).data, status=200)
+
 @csrf_exempt
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
@@ -94,6 +121,8 @@ def get_profile_view(request, user_id):
 def update_profile_view(request):
     updates = request.data
     user = request.user 
+    # ✅ request.user may be a cached snapshot; start from the stored row before saving it back
+    user.refresh_from_db()
 
     if 'name' in updates: user.first_name = updates['name']
     if 'age' in updates: user.age = updates['age']
@@ -101,6 +130,12 @@ def update_profile_view(request):
     if 'weight' in updates: user.weight = updates['weight']
     if 'height' in updates: user.height = updates['height']
     if 'goal' in updates: user.goal = updates['goal']
+    timezone_changed = False
+    if 'timezone' in updates:
+        if get_zone(updates['timezone']) is None:
+            return JsonResponse({"error": "Unknown timezone"}, status=400)
+        timezone_changed = updates['timezone'] != user.timezone
+        user.timezone = updates['timezone']
     user.profileFilled = True
 
     session_info = updates.get('sessionInfo')
@@ -127,22 +162,53 @@ def update_profile_view(request):
         user.bmi = round(user.weight / (height_in_meters ** 2), 1)
 
     user.save()
+    bump_data_versions([user.id])
+    invalidate_user(user)
+    if timezone_changed:
+        # ✅ Past meals now fall on different local days
+        rebuild_daily_summaries([user.id])
     from .serializers import UserSerializer 
     return JsonResponse(UserSerializer(user).data, status=200)
 
 
 # --- Calorie Views (AI Logic Fixed) ---
 
-@api_view(['POST'])
-@authentication_classes([JWTGoogleAuthentication])
-@permission_classes([IsAuthenticated])
-def calculate_calorie_target_view(request):
+def request_json(request):
+    """request.data for plain (non-DRF) views: JSON body, falling back to form fields."""
+    if request.content_type == 'application/json':
+        try:
+            return json.loads(request.body or b'{}')
+        except json.JSONDecodeError:
+            return {}
+    return request.POST
+
+
+# Async views: a slow Gemini call no longer pins a worker thread under ASGI
+@csrf_exempt
+@require_POST
+@async_jwt_required
+async def calculate_calorie_target_view(request):
     """Replaces calculateCalorieTarget controller."""
     try:
-        user_info = request.data
-        
+        user_info = request_json(request)
+        if not isinstance(user_info, dict):
+            return JsonResponse({'error': 'Send the profile as a JSON object'}, status=400)
+
+        # Identical (bucketed) profiles share one Gemini answer
+        try:
+            profile = calorie_profile(user_info)
+        except InvalidProfileError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        if profile is not None:
+            cached = await aget_cached_response('calorie_target', profile)
+            if cached is not None:
+                return JsonResponse({**cached, "cached": True}, status=200)
+            # The prompt only carries cacheable fields, so a cached answer is
+            # exactly what this profile would have been told. That leaves out the
+            # name: an answer addressing one user by name is shared with others
+            user_info = profile
+
         prompt = f"""Calculate a daily calorie target for a person with the following profile:
-- Name: {user_info.get('name')}
 - Age: {user_info.get('age')}
 - Gender: {user_info.get('gender')}
 - Weight: {user_info.get('weight')} kg
@@ -153,25 +219,29 @@ def calculate_calorie_target_view(request):
 """
         
         # --- FIXED CALL: Use helper function from utils.py ---
-        calorie_data = generate_gemini_response(prompt, CALORIE_TARGET_SCHEMA)
-        print("cal",calorie_data)
+        calorie_data = await agenerate_gemini_response(prompt, CALORIE_TARGET_SCHEMA)
         # --- END FIXED CALL ---
         
         if "error" in calorie_data:
-            return JsonResponse(calorie_data, status=500)
-            
-        return JsonResponse(calorie_data, status=200)
+            # Gemini failed or answered nonsense; the body is generic and the details are in the log
+            return JsonResponse(calorie_data, status=502)
+
+        if profile is not None:
+            await astore_response('calorie_target', profile, calorie_data)
+        return JsonResponse({**calorie_data, "cached": False}, status=200)
     except Exception as e:
         print(f"Error calculating calorie target: {e}")
         return JsonResponse({'error': 'Failed to calculate calorie target'}, status=500)
 
-@api_view(['POST'])
-@permission_classes([IsAuthenticated])
-@authentication_classes([JWTGoogleAuthentication])
-def generate_health_report_view(request):
+@csrf_exempt
+@require_POST
+@async_jwt_required
+async def generate_health_report_view(request):
     """Replaces generateHealthReport controller."""
     try:
-        data = request.data
+        data = request_json(request)
+        if not isinstance(data, dict):
+            return JsonResponse({'error': 'Send the profile as a JSON object'}, status=400)
         
         prompt = f"""Generate a detailed personalized health report for the following user with the defined goal:
 - Name: {data.get('name')}
@@ -179,11 +249,11 @@ def generate_health_report_view(request):
 """
 
         # --- FIXED CALL: Use helper function from utils.py ---
-        report_data = generate_gemini_response(prompt, HEALTH_REPORT_SCHEMA)
+        report_data = await agenerate_gemini_response(prompt, HEALTH_REPORT_SCHEMA)
         # --- END FIXED CALL ---
         
         if "error" in report_data:
-            return JsonResponse(report_data, status=500)
+            return JsonResponse(report_data, status=502)
             
         return JsonResponse(report_data, status=200)
 
@@ -192,677 +262,204 @@ def generate_health_report_view(request):
         return JsonResponse({'error': 'Failed to generate health report'}, status=500)
     
 
-MODEL_PATH = os.path.join(os.getcwd(), "best.pt")
-yolo_model = YOLO(MODEL_PATH)
-
-CALORIE_MAP = [
-  {
-    "name": "appam",
-    "calories": "180",
-    "Fats": "4.12",
-    "Carbs": "30.47",
-    "Proteins": "4.6"
-  },
-  {
-    "name": "beetroot fry",
-    "calories": "43",
-    "Fats": "0.17",
-    "Carbs": "9.56",
-    "Proteins": "1.61"
-  },
-  {
-    "name": "boiled egg",
-    "calories": "154",
-    "Fats": "10.57",
-    "Carbs": "1.12",
-    "Proteins": "12.53"
-  },
-  {
-    "name": "carrot fry",
-    "calories": "54",
-    "Fats": "2.48",
-    "Carbs": "7.99",
-    "Proteins": "0.74"
-  },
-  {
-    "name": "chicken 65",
-    "calories": "182",
-    "Fats": "9.85",
-    "Carbs": "8.41",
-    "Proteins": "16.09"
-  },
-  {
-    "name": "chicken briyani",
-    "calories": "139",
-    "Fats": "3.93",
-    "Carbs": "19.23",
-    "Proteins": "6.36"
-  },
-  {
-    "name": "chutney",
-    "calories": "149",
-    "Fats": "0.29",
-    "Carbs": "36.85",
-    "Proteins": "1.33"
-  },
-  {
-    "name": "crab curry",
-    "calories": "101",
-    "Fats": "1.76",
-    "Carbs": "0",
-    "Proteins": "20.03"
-  },
-  {
-    "name": "dosa",
-    "calories": "212",
-    "Fats": "2.07",
-    "Carbs": "42.48",
-    "Proteins": "5.03"
-  },
-  {
-    "name": "idly",
-    "calories": "135",
-    "Fats": "0.62",
-    "Carbs": "26.31",
-    "Proteins": "6.36"
-  },
-  {
-    "name": "kaara chutney",
-    "calories": "149",
-    "Fats": "0.29",
-    "Carbs": "36.85",
-    "Proteins": "1.33"
-  },
-  {
-    "name": "lemon rice",
-    "calories": "146",
-    "Fats": "0.55",
-    "Carbs": "31.48",
-    "Proteins": "3"
-  },
-  {
-    "name": "masala vada",
-    "calories": "230",
-    "Fats": "16.72",
-    "Carbs": "16.09",
-    "Proteins": "4.94"
-  },
-  {
-    "name": "mushroom briyani",
-    "calories": "150",
-    "Fats": "6.5",
-    "Carbs": "20",
-    "Proteins": "7"
-  },
-  {
-    "name": "mutton briyani",
-    "calories": "141",
-    "Fats": "4.34",
-    "Carbs": "19.26",
-    "Proteins": "5.84"
-  },
-  {
-    "name": "paal kolukattai",
-    "calories": "230",
-    "Fats": "23.84",
-    "Carbs": "5.54",
-    "Proteins": "2.29"
-  },
-  {
-    "name": "paneer briyani",
-    "calories": "169",
-    "Fats": "4.47",
-    "Carbs": "26.41",
-    "Proteins": "5.69"
-  },
-  {
-    "name": "paneer masala",
-    "calories": "211",
-    "Fats": "16.66",
-    "Carbs": "8.83",
-    "Proteins": "7.68"
-  },
-  {
-    "name": "prawn thokku",
-    "calories": "101",
-    "Fats": "3.46",
-    "Carbs": "2.43",
-    "Proteins": "14.42"
-  },
-  {
-    "name": "puthina chutney",
-    "calories": "44",
-    "Fats": "1.64",
-    "Carbs": "6.8",
-    "Proteins": "2.04"
-  },
-  {
-    "name": "raagi ball",
-    "calories": "205",
-    "Fats": "4.4",
-    "Carbs": "35.52",
-    "Proteins": "5.4"
-  },
-  {
-    "name": "raagi malt",
-    "calories": "52",
-    "Fats": "1.02",
-    "Carbs": "8.83",
-    "Proteins": "2.32"
-  },
-  {
-    "name": "sambar",
-    "calories": "114",
-    "Fats": "4.1",
-    "Carbs": "15.9",
-    "Proteins": "4.9"
-  },
-  {
-    "name": "sambar rice",
-    "calories": "90",
-    "Fats": "1.85",
-    "Carbs": "16.44",
-    "Proteins": "2.75"
-  },
-  {
-    "name": "vada",
-    "calories": "282",
-    "Fats": "8.64",
-    "Carbs": "40.97",
-    "Proteins": "10.59"
-  },
-  {
-    "name": "veg briyani",
-    "calories": "130",
-    "Fats": "2.53",
-    "Carbs": "23.33",
-    "Proteins": "3.16"
-  },
-  {
-    "name": "ven pongal",
-    "calories": "70",
-    "Fats": "1.71",
-    "Carbs": "11.9",
-    "Proteins": "1.88"
-  },
-  {
-    "name": "white rice",
-    "calories": "135",
-    "Fats": "1.07",
-    "Carbs": "27.64",
-    "Proteins": "2.64"
-  },
-  {
-    "name": "BhindiMasala",
-    "calories": "112",
-    "Fats": "6.4",
-    "Carbs": "13.51",
-    "Proteins": "2.99"
-  },
-  {
-    "name": "Chai",
-    "calories": "30",
-    "Fats": "0.53",
-    "Carbs": "6.12",
-    "Proteins": "0.53"
-  },
-  {
-    "name": "FishCurry",
-    "calories": "100",
-    "Fats": "4.59",
-    "Carbs": "1.9",
-    "Proteins": "12.4"
-  },
-  {
-    "name": "GulabJamun",
-    "calories": "323",
-    "Fats": "15.75",
-    "Carbs": "39.26",
-    "Proteins": "7.15"
-  },
-  {
-    "name": "Jalebi",
-    "calories": "300",
-    "Fats": "4.31",
-    "Carbs": "62.36",
-    "Proteins": "4.19"
-  },
-  {
-    "name": "Kebab",
-    "calories": "159",
-    "Fats": "4.27",
-    "Carbs": "19.77",
-    "Proteins": "9.71"
-  },
-  {
-    "name": "MuttonCurry",
-    "calories": "126",
-    "Fats": "8.77",
-    "Carbs": "1.02",
-    "Proteins": "10.37"
-  },
-  {
-    "name": "curd",
-    "calories": "100",
-    "Fats": "4.2",
-    "Carbs": "3.45",
-    "Proteins": "11.75"
-  },
-  {
-    "name": "papad",
-    "calories": "371",
-    "Fats": "3.25",
-    "Carbs": "59.87",
-    "Proteins": "25.56"
-  },
-  {
-    "name": "raita",
-    "calories": "101",
-    "Fats": "7.21",
-    "Carbs": "6.43",
-    "Proteins": "3.31"
-  },
-  {
-    "name": "roti",
-    "calories": "264",
-    "Fats": "1.3",
-    "Carbs": "55.81",
-    "Proteins": "9.61"
-  },
-  {
-    "name": "rasam",
-    "calories": "19",
-    "Fats": "0.88",
-    "Carbs": "2.82",
-    "Proteins": "0.39"
-  },
-  {
-    "name": "sweet",
-    "calories": "390",
-    "Fats": "0.15",
-    "Carbs": "99.52",
-    "Proteins": "2.79"
-  },
-{
-  "name": "veg-fry",
-  "calories": "168",
-  "Fats": "6.59",
-  "Carbs": "21.1",
-  "Proteins": "7.72"
-},
-{
-  "name": "SAMOSA",
-  "calories": "308",
-  "Fats": "17.86",
-  "Carbs": "32.21",
-  "Proteins": "4.67"
-},
-{
-  "name": "UPMA",
-  "calories": "209",
-  "Fats": "3.15",
-  "Carbs": "38.06",
-  "Proteins": "6.76"
-},
-{
-  "name": "cashew",
-  "calories": "581",
-  "Fats": "47.77",
-  "Carbs": "30.16",
-  "Proteins": "16.84"
-},
-{
-  "name": "bread",
-  "calories": "266",
-  "Fats": "3.29",
-  "Carbs": "50.61",
-  "Proteins": "7.64"
-},
-{
-  "name": "dates",
-  "calories": "277",
-  "Fats": "0.15",
-  "Carbs": "74.97",
-  "Proteins": "1.81"
-},
-{
-  "name": "Kiwi",
-  "calories": "61",
-  "Fats": "0.52",
-  "Carbs": "14.66",
-  "Proteins": "1.14"
-},
-{
-  "name": "mango",
-  "calories": "60",
-  "Fats": "0.25",
-  "Carbs": "15.74",
-  "Proteins": "0.47"
-},
-{
-  "name": "Palak Paneer",
-  "calories": "169",
-  "Fats": "13.18",
-  "Carbs": "6.07",
-  "Proteins": "7.89"
-},
-{
-  "name": "Paneer Ki Sabji",
-  "calories": "125",
-  "Fats": "8.52",
-  "Carbs": "9.64",
-  "Proteins": "4.02"
-},
-{
-  "name": "MuskMelon",
-  "calories": "34",
-  "Fats": "0.19",
-  "Carbs": "8.16",
-  "Proteins": "0.84"
-},
-{
-  "name": "apple",
-  "calories": "52",
-  "Fats": "0.17",
-  "Carbs": "13.81",
-  "Proteins": "0.26"
-},
-{
-  "name": "banana",
-  "calories": "89",
-  "Fats": "0.33",
-  "Carbs": "22.84",
-  "Proteins": "1.09"
-},
-{
-  "name": "custard apple",
-  "calories": "101",
-  "Fats": "0.6",
-  "Carbs": "25.2",
-  "Proteins": "1.7"
-},
-{
-  "name": "Guava",
-  "calories": "68",
-  "Fats": "0.95",
-  "Carbs": "14.32",
-  "Proteins": "2.55"
-},
-{
-  "name": "orange",
-  "calories": "47",
-  "Fats": "0.12",
-  "Carbs": "11.75",
-  "Proteins": "0.94"
-},
-{
-  "name": "pineapple",
-  "calories": "48",
-  "Fats": "0.12",
-  "Carbs": "12.63",
-  "Proteins": "0.54"
-},
-{
-  "name": "almonds",
-  "calories": "578",
-  "Fats": "50.64",
-  "Carbs": "19.74",
-  "Proteins": "21.26"
-},
-{
-  "name": "pomogrenate",
-  "calories": "68",
-  "Fats": "0.3",
-  "Carbs": "17.17",
-  "Proteins": "0.95"
-},
-{
-  "name": "Burger",
-  "calories": "313",
-  "Fats": "14.85",
-  "Carbs": "31.13",
-  "Proteins": "14.48"
-},
-{
-  "name": "Pizza",
-  "calories": "276",
-  "Fats": "11.74",
-  "Carbs": "30.33",
-  "Proteins": "12.33"
-},
-{
-  "name": "Omlette",
-  "calories": "153",
-  "Fats": "12.02",
-  "Carbs": "0.69",
-  "Proteins": "10.62"
-},
-{
-  "name": "Cake",
-  "calories": "297",
-  "Fats": "4.3",
-  "Carbs": "57.7",
-  "Proteins": "7.3"
-},
-{
-  "name": "dal",
-  "calories": "101",
-  "Fats": "3.23",
-  "Carbs": "13.36",
-  "Proteins": "5.28"
-},
-{
-  "name": "poori",
-  "calories": "296",
-  "Fats": "9.43",
-  "Carbs": "46.73",
-  "Proteins": "7.54"
-},
-{
-  "name": "pickle",
-  "calories": "18",
-  "Fats": "0.19",
-  "Carbs": "4.12",
-  "Proteins": "0.62"
-},
-{
-  "name": "salad",
-  "calories": "17",
-  "Fats": "0.24",
-  "Carbs": "3.2",
-  "Proteins": "1.52"
-}
-]
-
-
-# Import your calorie data
+def wants_async_ingest(request):
+    if settings.MEAL_INGEST_MODE == 'async':
+        return True
+    return 'respond-async' in request.headers.get('Prefer', '')
+
 
 @csrf_exempt
 @api_view(['POST'])
 @authentication_classes([JWTGoogleAuthentication])
 @permission_classes([IsAuthenticated])
 def add_meal(request):
-    print("called")
-    user = request.user
-    print("user",user)
     """POST /meals/ - Upload image, detect food using YOLO, and save meal"""
+    user = request.user
     if request.method != 'POST':
         return JsonResponse({'error': 'Only POST allowed'}, status=400)
 
     if 'image' not in request.FILES:
         return JsonResponse({'error': 'Image file required'}, status=400)
 
-    # ✅ Save uploaded image
+    # ✅ Read the upload once and normalize it in memory: upright, YOLO-sized
+    # pixels for inference, plus a display copy and thumbnail that the
+    # background writer stores in MEDIA_ROOT, off the request path
     image = request.FILES['image']
-    upload_dir = os.path.join(settings.MEDIA_ROOT, 'meals')
-    os.makedirs(upload_dir, exist_ok=True)
-    image_name = f"{uuid.uuid4()}.jpg"
-    image_path = os.path.join(upload_dir, image_name)
+    with MEAL_STAGE_SECONDS.labels('read').time():
+        image_bytes = read_upload(image)
+    meal_type = request.POST.get('mealType', 'Unknown')
+    try:
+        prepared = prepare_image(image_bytes)
+    except ImageDecodeError as e:
+        return JsonResponse({'error': str(e)}, status=400)
 
-    with open(image_path, 'wb+') as f:
-        for chunk in image.chunks():
-            f.write(chunk)
+    # ✅ Stored by content: the same photo uploaded twice is one file
+    image_name = content_name(upload_digest(image, image_bytes), prepared.extension)
 
-    # ✅ Run YOLOv8 inference
-    results = yolo_model.predict(source=image_path, conf=0.5, imgsz=640, verbose=False)
-
-    detected_items = []
-    for box in results[0].boxes:
-        cls_id = int(box.cls)
-        label = results[0].names[cls_id]
-        detected_items.append(label)
-
-    if not detected_items:
-        return JsonResponse({'message': 'No food detected'}, status=200)
-
-    # ✅ Calculate calories and macros
-    total_calories = total_protein = total_carbs = total_fats = 0.0
-    for item in detected_items:
-        entry = next((x for x in CALORIE_MAP if x['name'].lower() == item.lower()), None)
-        if entry:
-            total_calories += float(entry['calories'])
-            total_fats += float(entry['Fats'])
-            total_carbs += float(entry['Carbs'])
-            total_protein += float(entry['Proteins'])
-        else:
-            total_calories += 100  # default if not found
-
-    macros = {
-
-        "protein": total_protein,
-        "carbs": total_carbs,
-        "fats": total_fats
-    }
+    # ✅ Async mode: store the image, queue detection, answer right away
+    if wants_async_ingest(request):
+        job = enqueue_meal_job(user, meal_type, image_name, prepared)
+        return JsonResponse({
+            "message": "Meal queued for detection",
+            "jobId": job.id,
+            "status": job.status,
+            "statusUrl": request.build_absolute_uri(f"/meals/jobs/{job.id}/")
+        }, status=202)
 
-    # ✅ Save meal in DB
-    meal = Meal.objects.create(
-        user=user,  # replace with user if authentication is added
-        mealType=request.POST.get('mealType', 'Unknown'),
-        calories=total_calories,
-        protein=total_protein,
-        carbs=total_carbs,
-        fats=total_fats,
-        items=", ".join(detected_items),
-        image=f"meals/{image_name}",
-        macros=json.dumps(macros)
-    )
+    # ✅ Run YOLOv8 inference
+    try:
+        # inference in this process, or the round trip to the inference server
+        with MEAL_STAGE_SECONDS.labels('detect').time():
+            detection = YOLO_DETECTOR.get().detect(prepared.pixels)
+    except InferenceError as e:
+        print(f"Inference Error: {e}")
+        return JsonResponse({'error': 'Food detection is temporarily unavailable'}, status=503)
+
+    # ✅ Calculate calories and macros, save meal in DB
+    meal, payload = save_detected_meal(user, meal_type, detection, image_name, thumbnail_name(image_name))
+    if meal is not None:
+        store_images(image_name, prepared, write=image_writer.submit)
 
     # ✅ Response
+    return JsonResponse(absolutize_payload(request, payload))
+
+
+@csrf_exempt
+@api_view(['POST'])
+@authentication_classes([JWTGoogleAuthentication])
+@permission_classes([IsAuthenticated])
+def add_meals_batch(request):
+    """
+    POST /meals/batch/ - Several images (field "images") in one request.
+    "mealType" may be sent once for all images or once per image, in order.
+    """
+    user = request.user
+    images = request.FILES.getlist('images')
+    if not images:
+        return JsonResponse({'error': 'At least one image file required (field "images")'}, status=400)
+    if len(images) > settings.MEAL_BATCH_MAX_IMAGES:
+        return JsonResponse({'error': f'At most {settings.MEAL_BATCH_MAX_IMAGES} images per batch'}, status=400)
+
+    meal_types = request.POST.getlist('mealType')
+    if len(meal_types) == 1:
+        meal_types = meal_types * len(images)
+    meal_types += ['Unknown'] * (len(images) - len(meal_types))
+
+    with MEAL_STAGE_SECONDS.labels('read').time():
+        sources = [read_upload(image) for image in images]
+
+    # ✅ Normalize every upload; one that isn't an image fails on its own
+    results = [None] * len(images)
+    prepared = {}
+    for index, (image, data) in enumerate(zip(images, sources)):
+        try:
+            prepared[index] = prepare_image(data)
+        except ImageDecodeError as e:
+            results[index] = {'index': index, 'filename': image.name, 'error': str(e)}
+
+    # ✅ One batched YOLO call for every good image
+    try:
+        with MEAL_STAGE_SECONDS.labels('detect').time():
+            detections = detect_each([p.pixels for p in prepared.values()])
+    except InferenceError as e:
+        print(f"Inference Error: {e}")
+        return JsonResponse({'error': 'Food detection is temporarily unavailable'}, status=503)
+
+    entries, entry_indexes = [], []
+    for index, (detection, _) in zip(prepared, detections):
+        image_name = content_name(upload_digest(images[index], sources[index]), prepared[index].extension)
+        entries.append((meal_types[index], detection, image_name, thumbnail_name(image_name)))
+        entry_indexes.append(index)
+
+    # ✅ All meals in one bulk_create + one summary update per day, in one transaction
+    saved = save_detected_meals(user, entries)
+    for index, (_, _, image_name, _), (meal, payload) in zip(entry_indexes, entries, saved):
+        if meal is not None:
+            store_images(image_name, prepared[index], write=image_writer.submit)
+        results[index] = {'index': index, 'filename': images[index].name, **absolutize_payload(request, payload)}
+
+    saved_count = sum(1 for meal, _ in saved if meal is not None)
     return JsonResponse({
-        "message": "Meal detected and saved successfully",
-        "meal": {
-            "id": meal.id,
-            "items": detected_items,
-            "calories": total_calories,
-            "protein": total_protein,
-            "carbs": total_carbs,
-            "fats": total_fats,
-            "macros": macros,
-            "imageUrl": request.build_absolute_uri(meal.image.url) if meal.image else None
-        }
-    })
+        "message": f"{saved_count} of {len(images)} meals saved",
+        "saved": saved_count,
+        "results": results
+    }, status=200)
+
+
+@api_view(['GET'])
+@authentication_classes([JWTGoogleAuthentication])
+@permission_classes([IsAuthenticated])
+def get_meal_job(request, job_id):
+    """GET /meals/jobs/<id>/ - Status of an async meal upload; the add_meal payload once done"""
+    try:
+        job = MealJob.objects.get(id=job_id, user=request.user)
+    except MealJob.DoesNotExist:
+        return JsonResponse({"error": "Job not found"}, status=404)
+
+    response = {"jobId": job.id, "status": job.status}
+    if job.status == MealJob.DONE:
+        response.update(absolutize_payload(request, json.loads(job.result)))
+    elif job.status == MealJob.FAILED:
+        response["error"] = job.error
+    return JsonResponse(response, status=200)
+
+
 @api_view(['DELETE'])
 @authentication_classes([JWTGoogleAuthentication])
 @permission_classes([IsAuthenticated])
 def delete_meal(request, meal_id):
     user = request.user
     try:
-        meal = Meal.objects.get(id=meal_id, user=user)
-        meal.delete()
+        meal = Meal.objects.select_related('user').get(id=meal_id, user=user)
+        delete_user_meal(meal)
         return JsonResponse({"message": "Meal deleted successfully"}, status=200)
     except Meal.DoesNotExist:
         return JsonResponse({"error": "Meal not found"}, status=404)
-@api_view(['GET'])
-@authentication_classes([JWTGoogleAuthentication])
-@permission_classes([IsAuthenticated])
-
+def _local_day(request):
+    today = local_today(request.user)
+    return today.isoformat(), day_start(today, user_timezone(request.user))
 
 
-def get_daily_meals(request):
-    user = request.user
-    today = timezone.now().date()
-
-    meals = Meal.objects.filter(user=user, createdAt__date=today)
+def _local_month(request):
+    start_of_month = local_today(request.user).replace(day=1)
+    return start_of_month.strftime('%Y-%m'), day_start(start_of_month, user_timezone(request.user))
 
-    total_calories = total_protein = total_carbs = total_fats = 0
-    breakdown = {"breakfast": 0, "lunch": 0, "dinner": 0, "snacks": 0, "other": 0}
 
-    for meal in meals:
-        total_calories += meal.calories or 0
-        total_protein += meal.protein or 0
-        total_carbs += meal.carbs or 0
-        total_fats += meal.fats or 0
+# ✅ Polled endpoints: ETag/304 from the user's data version (api/versions.py)
+@require_GET
+@async_jwt_required
+@conditional_view('daily', _local_day)
+async def get_daily_meals(request):
+    user = request.user
+    # ✅ "Today" is the user's local day (User.timezone), not the server's
+    today = local_today(user)
 
-        mtype = meal.mealType.lower() if meal.mealType else "other"
-        if mtype in breakdown:
-            breakdown[mtype] += meal.calories or 0
-        else:
-            breakdown["other"] += meal.calories or 0
+    # ✅ One row from the incrementally maintained summary table; Meal isn't touched
+    summary = summary_from_daily_row(await DailyNutritionSummary.objects.filter(user=user, date=today).afirst())
 
     return JsonResponse({
         "date": today.strftime("%Y-%m-%d"),
-        "total": total_calories,
-        "breakdown": breakdown,
-        "macros": {
-            "protein": total_protein,
-            "carbs": total_carbs,
-            "fats": total_fats
-        }
+        **summary
     }, status=200)
 
 from datetime import timedelta
 
 
-@api_view(["GET"])
-@permission_classes([IsAuthenticated])
-@authentication_classes([JWTGoogleAuthentication])
-def get_monthly_meals(request):
+@require_GET
+@async_jwt_required
+@conditional_view('monthly', _local_month)
+async def get_monthly_meals(request):
     user = request.user
-    today = timezone.now().date()
+    today = local_today(user)
     start_of_month = today.replace(day=1)
 
-    meals = Meal.objects.filter(user=user, createdAt__date__gte=start_of_month)
-
-    daily_summary = defaultdict(lambda: {
-        "total": 0,
-        "breakdown": {
-            "breakfast": 0,
-            "lunch": 0,
-            "dinner": 0,
-            "snacks": 0,
-            "other": 0
-        },
-        "macros": {
-            "protein": 0,
-            "carbs": 0,
-            "fats": 0
-        }
-    })
-
-    # Aggregate meals per day
-    for meal in meals:
-        day_number = meal.createdAt.day
-        summary = daily_summary[day_number]
-
-        # total calories
-        summary["total"] += meal.calories or 0
-
-        # macros
-        summary["macros"]["protein"] += meal.protein or 0
-        summary["macros"]["carbs"] += meal.carbs or 0
-        summary["macros"]["fats"] += meal.fats or 0
-
-        # meal type breakdown
-        mtype = meal.mealType.lower() if meal.mealType else "other"
-        if mtype in summary["breakdown"]:
-            summary["breakdown"][mtype] += meal.calories or 0
-        else:
-            summary["breakdown"]["other"] += meal.calories or 0
-
-    # Sort by day
+    # ✅ At most 31 small DailyNutritionSummary rows; Meal isn't touched
+    summaries = DailyNutritionSummary.objects.filter(
+        user=user, date__gte=start_of_month, mealCount__gt=0
+    ).order_by('date')
     monthly_data = [
-        {"day": day, **data}
-        for day, data in sorted(daily_summary.items())
+        {"day": row.date.day, **summary_from_daily_row(row)}
+        async for row in summaries
     ]
 
     response = {
@@ -872,3 +469,118 @@ def get_monthly_meals(request):
     }
 
     return JsonResponse(response, status=200)
+
+
+# --- Range Report (GET /meals/report/?from=&to=&bucket=day|week|month&limit=) ---
+
+def _local_date_range(request):
+    """?from= and ?to= as local dates of the user, both inclusive; default is the last 30 days."""
+    end_date = datetime.date.fromisoformat(request.GET['to']) if request.GET.get('to') else local_today(request.user)
+    start_date = (
+        datetime.date.fromisoformat(request.GET['from']) if request.GET.get('from')
+        else end_date - timedelta(days=29)
+    )
+    return start_date, end_date
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+@authentication_classes([JWTGoogleAuthentication])
+def get_meal_report(request):
+    user = request.user
+    bucket = request.GET.get('bucket', 'day')
+    if bucket not in REPORT_BUCKETS:
+        return JsonResponse({"error": "bucket must be one of: day, week, month"}, status=400)
+
+    try:
+        start_date, end_date = _local_date_range(request)
+        limit = int(request.GET.get('limit', settings.REPORT_PAGE_SIZE))
+    except ValueError:
+        return JsonResponse({"error": "from/to must be YYYY-MM-DD and limit a number"}, status=400)
+
+    if start_date > end_date:
+        return JsonResponse({"error": "from must not be after to"}, status=400)
+    if (end_date - start_date).days + 1 > settings.REPORT_MAX_DAYS:
+        return JsonResponse({"error": f"Range is limited to {settings.REPORT_MAX_DAYS} days"}, status=400)
+    limit = max(1, min(limit, settings.REPORT_PAGE_SIZE))
+
+    # ✅ One GROUP BY over day summaries; the next page starts at "next" (pass it as ?from=)
+    rows = report_rows(user, start_date, end_date, bucket)[:limit + 1]
+    header = {"from": start_date.isoformat(), "to": end_date.isoformat(), "bucket": bucket}
+    if isinstance(request._request, ASGIRequest):
+        lines = areport_lines(rows, limit, header)
+    else:
+        lines = report_lines(rows, limit, header)
+    return StreamingHttpResponse(lines, content_type='application/json')
+
+
+# --- Most Eaten Foods (GET /meals/foods/top/?from=&to=&limit=) ---
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+@authentication_classes([JWTGoogleAuthentication])
+def get_top_foods(request):
+    user = request.user
+    try:
+        start_date, end_date = _local_date_range(request)
+        limit = int(request.GET.get('limit', settings.TOP_FOODS_LIMIT))
+    except ValueError:
+        return JsonResponse({"error": "from/to must be YYYY-MM-DD and limit a number"}, status=400)
+
+    if start_date > end_date:
+        return JsonResponse({"error": "from must not be after to"}, status=400)
+    if (end_date - start_date).days + 1 > settings.REPORT_MAX_DAYS:
+        return JsonResponse({"error": f"Range is limited to {settings.REPORT_MAX_DAYS} days"}, status=400)
+    limit = max(1, min(limit, settings.TOP_FOODS_LIMIT))
+
+    # ✅ One GROUP BY over the user's MealItem rows (user, createdAt index); Meal isn't touched
+    tz = user_timezone(user)
+    foods = top_foods(user, day_start(start_date, tz), day_start(end_date + timedelta(days=1), tz), limit)
+    return JsonResponse({"from": start_date.isoformat(), "to": end_date.isoformat(), "foods": foods}, status=200)
+
+
+# --- Meal History Export / Import (api/transfer.py) ---
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+@authentication_classes([JWTGoogleAuthentication])
+def export_meals(request):
+    # ?fmt= rather than ?format=, which DRF keeps for choosing a renderer
+    fmt = request.GET.get('fmt', 'ndjson')
+    if fmt not in EXPORT_FORMATS:
+        return JsonResponse({"error": "fmt must be one of: ndjson, csv"}, status=400)
+
+    # ✅ Streamed chunk by chunk from a cursor; memory doesn't grow with the history
+    media_url = request.build_absolute_uri(settings.MEDIA_URL)
+    if isinstance(request._request, ASGIRequest):
+        lines = aexport_lines(request.user, fmt, media_url)
+    else:
+        lines = export_lines(request.user, fmt, media_url)
+    response = StreamingHttpResponse(lines, content_type=EXPORT_FORMATS[fmt])
+    response['Content-Disposition'] = f'attachment; filename="meals-{local_today(request.user).isoformat()}.{fmt}"'
+    return response
+
+
+@csrf_exempt
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+@authentication_classes([JWTGoogleAuthentication])
+def import_meals_view(request):
+    content_type = request.content_type
+    if content_type not in ('application/x-ndjson', 'application/jsonl'):
+        return JsonResponse({"error": "Send the meals as NDJSON (Content-Type: application/x-ndjson)"}, status=415)
+
+    # ✅ The body is read line by line (request.data would load it whole) and inserted in batches
+    result = import_meals(request.user, request.stream or ())
+    return JsonResponse(result, status=200)
+
+
+# --- Metrics (GET /metrics) ---
+
+def metrics_view(request):
+    """Prometheus scrape endpoint; needs `Authorization: Bearer <METRICS_TOKEN>`."""
+    expected = settings.METRICS_TOKEN
+    provided = request.headers.get('Authorization', '')
+    if not expected or not hmac.compare_digest(provided.encode(), f"Bearer {expected}".encode()):
+        return JsonResponse({"error": "Forbidden"}, status=403)
+    return HttpResponse(render(collect()), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,47 @@
+# benchmarks/_django.py
+"""Boot the Django project for standalone benchmark scripts."""
+import os
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def setup_django():
+    if ROOT_DIR not in sys.path:
+        sys.path.insert(0, ROOT_DIR)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'food_backend.settings')
+    # Benchmarks never talk to Google; placeholders keep settings.py importable without a .env
+    os.environ.setdefault('SECRET_KEY', 'benchmark-secret-key')
+    os.environ.setdefault('JWT_SECRET', 'benchmark-jwt-secret-benchmark-jwt-secret')
+    os.environ.setdefault('VITE_GOOGLE_CLIENT_ID', 'benchmark-client-id')
+
+    import django
+    django.setup()
+
+
+def setup_test_database():
+    """Create a throwaway test database (same as `manage.py test`) and return a teardown callable."""
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    setup_test_environment()
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+
+    def teardown():
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+    return teardown
+
+
+def bearer_token(user):
+    """A JWT exactly like google_auth_view issues, for the Authorization header."""
+    import datetime
+    import jwt
+    from django.conf import settings
+    from django.utils import timezone
+
+    expiration = timezone.now() + datetime.timedelta(hours=24)
+    token = jwt.encode({'googleId': user.googleId, 'exp': expiration.timestamp()}, settings.JWT_SECRET, algorithm="HS256")
+    return f"Bearer {token}"
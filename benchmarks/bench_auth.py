@@ -0,0 +1,77 @@
+# benchmarks/bench_auth.py
+"""
+Per-request cost of JWTGoogleAuthentication: no cache vs the in-process auth
+cache vs in-process + a shared backend (LocMemCache standing in for Redis).
+
+Times authenticate() alone and counts the queries it makes, over --users
+users each sending --requests requests.
+
+    python benchmarks/bench_auth.py [--users 50] [--requests 2000]
+"""
+import argparse
+import contextlib
+import io
+import statistics
+import time
+
+from _django import setup_django, setup_test_database, bearer_token
+
+setup_django()
+
+from django.core.cache.backends.locmem import LocMemCache  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test import RequestFactory  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+
+import api.auth_cache  # noqa: E402
+from api.auth_cache import AuthCache  # noqa: E402
+from api.authentication import JWTGoogleAuthentication  # noqa: E402
+from api.models import User  # noqa: E402
+
+
+def run(requests, cache):
+    api.auth_cache._auth_cache = cache
+    auth = JWTGoogleAuthentication()
+    timings = []
+    with CaptureQueriesContext(connection) as ctx, contextlib.redirect_stdout(io.StringIO()):
+        for request in requests:
+            start = time.perf_counter()
+            auth.authenticate(request)
+            timings.append((time.perf_counter() - start) * 1e6)
+    return timings, len(ctx.captured_queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    teardown = setup_test_database()
+    try:
+        factory = RequestFactory()
+        tokens = [
+            bearer_token(User.objects.create(username=f'u{i}', googleId=f'g{i}'))
+            for i in range(args.users)
+        ]
+        requests = [
+            factory.get('/meals/daily/', HTTP_AUTHORIZATION=tokens[i % len(tokens)])
+            for i in range(args.requests)
+        ]
+
+        print(f"{args.requests} requests from {args.users} users ({connection.vendor})")
+        for name, cache in (
+            ('no cache', AuthCache(max_entries=0)),
+            ('in-process', AuthCache(max_entries=4096, ttl=300)),
+            ('shared', AuthCache(max_entries=4096, ttl=300, backend=LocMemCache('bench-auth', {}))),
+        ):
+            timings, queries = run(requests, cache)
+            print(f"  {name:10s} mean {statistics.fmean(timings):7.1f} us   p50 {statistics.median(timings):7.1f} us"
+                  f"   {queries / args.requests:.3f} queries/request")
+    finally:
+        api.auth_cache._auth_cache = None
+        teardown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+# benchmarks/bench_gemini.py
+"""
+Offline load test of api.gemini_client against benchmarks/fake_gemini.py.
+
+Fires --requests concurrent generate() calls spread over --distinct prompts and
+reports upstream calls, peak upstream concurrency and wall time.
+
+    python benchmarks/bench_gemini.py --requests 200 --distinct 20 --max-concurrency 8
+"""
+import argparse
+import asyncio
+import time
+
+from _django import setup_django
+from fake_gemini import FakeGeminiServer
+
+setup_django()
+
+from api.gemini_client import AsyncGeminiClient  # noqa: E402
+from api.utils import CALORIE_TARGET_SCHEMA  # noqa: E402
+
+
+async def fire(client, requests, distinct):
+    prompts = [f"Calculate a daily calorie target for profile #{i % distinct}" for i in range(requests)]
+    results = await asyncio.gather(*(client.generate(p, CALORIE_TARGET_SCHEMA) for p in prompts))
+    errors = [r for r in results if 'error' in r]
+    assert not errors, errors[:1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--distinct', type=int, default=20, help='number of different prompts')
+    parser.add_argument('--max-concurrency', type=int, default=8)
+    parser.add_argument('--latency-ms', type=float, default=200.0, help='fake upstream latency')
+    args = parser.parse_args()
+
+    server = FakeGeminiServer(('127.0.0.1', 0), args.latency_ms).start_background()
+    client = AsyncGeminiClient('fake-key', server.url, 'gemini-2.5-flash', max_concurrency=args.max_concurrency)
+
+    start = time.perf_counter()
+    asyncio.run(fire(client, args.requests, args.distinct))
+    elapsed = time.perf_counter() - start
+
+    stats = server.stats()
+    print(f"{args.requests} calls over {args.distinct} distinct prompts, cap {args.max_concurrency}, "
+          f"upstream latency {args.latency_ms} ms")
+    print(f"  upstream requests : {stats['requests']}  (coalesced {client.coalesced})")
+    print(f"  peak upstream     : {stats['max_inflight']} in flight")
+    print(f"  wall time         : {elapsed:.2f} s")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
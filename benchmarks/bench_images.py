@@ -0,0 +1,98 @@
+# benchmarks/bench_images.py
+"""
+Storage and pre-inference cost per upload: the raw upload (previous behavior)
+vs api.images.prepare_image.
+
+    python benchmarks/bench_images.py [--count 20] [--width 4032 --height 3024]
+
+"raw" stores the upload as-is and decodes it in full before predict(); YOLO
+then letterboxes it down to 640 px itself and the detection cache hashes the
+full frame. "prepared" stores the display copy plus thumbnail, and YOLO gets
+pixels that are already 640 px; resizing and encoding the two stored files
+happens on the background writer and is reported separately. predict() itself is not timed
+(no model here); its input size is the same either way.
+"""
+import argparse
+import io
+import statistics
+import time
+
+from _django import setup_django
+from stubs import make_jpeg
+
+setup_django()
+
+import cv2  # noqa: E402
+from PIL import Image  # noqa: E402
+
+from api.detection_cache import dhash  # noqa: E402
+from api.images import decode_image, encode_display, encode_thumbnail, fit_within, prepare_image  # noqa: E402
+
+
+def phone_photo(width, height, seed):
+    """Photo-sized JPEG tagged as rotated (EXIF orientation 6), as phones save portrait shots."""
+    image = Image.open(io.BytesIO(make_jpeg(width, height, seed=seed, quality=92)))
+    exif = image.getexif()
+    exif[0x0112] = 6
+    out = io.BytesIO()
+    image.save(out, 'JPEG', quality=92, exif=exif)
+    return out.getvalue()
+
+
+def letterbox(pixels, imgsz=640):
+    """The resize ultralytics does before predict()."""
+    size = fit_within((pixels.shape[1], pixels.shape[0]), imgsz)
+    return cv2.resize(pixels, size, interpolation=cv2.INTER_LINEAR)
+
+
+def raw_path(data):
+    """Returns (what the inference server receives, files to store)."""
+    pixels = decode_image(data)
+    dhash(pixels)
+    letterbox(pixels)
+    return data, lambda: [data]
+
+
+def prepared_path(data):
+    prepared = prepare_image(data)
+    dhash(prepared.pixels)
+    letterbox(prepared.pixels)
+    return prepared.pixels, lambda: [encode_display(prepared), encode_thumbnail(prepared)]
+
+
+def run(path, uploads):
+    timings, encode_timings, stored, wire = [], [], 0, 0
+    for data in uploads:
+        start = time.perf_counter()
+        payload, encode = path(data)
+        timings.append((time.perf_counter() - start) * 1000)
+        start = time.perf_counter()
+        stored += sum(map(len, encode()))
+        encode_timings.append((time.perf_counter() - start) * 1000)
+        wire += payload.nbytes if hasattr(payload, 'nbytes') else len(payload)
+    return timings, encode_timings, stored / len(uploads), wire / len(uploads)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--count', type=int, default=20)
+    parser.add_argument('--width', type=int, default=4032)
+    parser.add_argument('--height', type=int, default=3024)
+    args = parser.parse_args()
+
+    uploads = [phone_photo(args.width, args.height, seed) for seed in range(args.count)]
+    for path in (raw_path, prepared_path):
+        # Warm up codecs and thread pools
+        path(uploads[0])
+
+    print(f"{args.count} uploads of {args.width}x{args.height}, "
+          f"mean {statistics.mean(map(len, uploads)) / 1024:.0f} KiB")
+    for name, path in (('raw', raw_path), ('prepared', prepared_path)):
+        timings, encode_timings, stored, wire = run(path, uploads)
+        print(f"{name:9} stored {stored / 1024:6.0f} KiB   to inference server {wire / 1024:6.0f} KiB   "
+              f"pre-inference p50 {statistics.median(timings):6.1f} ms   "
+              f"background encode p50 {statistics.median(encode_timings):5.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+# benchmarks/bench_login.py
+"""
+Sign-in latency (POST /auth/google/) when Google's key endpoint is slow:
+legacy per-login certificate fetch vs api/google_certs.py.
+
+Runs fake_google_certs.py in-process with --cert-latency-ms per key fetch and
+sends --logins sign-ins through the Django test client.
+
+    python benchmarks/bench_login.py [--logins 200] [--cert-latency-ms 150]
+"""
+import argparse
+import contextlib
+import io
+import statistics
+import time
+
+from _django import setup_django, setup_test_database
+
+setup_django()
+
+from django.conf import settings  # noqa: E402
+from django.test import Client  # noqa: E402
+
+from api.google_certs import GOOGLE_ISSUERS, GoogleCerts  # noqa: E402
+from api.registry import GOOGLE_AUTH  # noqa: E402
+from fake_google_certs import FakeGoogleCertsServer  # noqa: E402
+
+
+class LegacyVerifier:
+    """What google_auth_view did before: a new transport and a key download per login."""
+
+    def __init__(self, certs_url):
+        self.certs_url = certs_url
+
+    def verify_oauth2_token(self, token, audience):
+        from google.auth.transport import requests
+        from google.oauth2 import id_token
+
+        idinfo = id_token.verify_token(token, requests.Request(), audience=audience, certs_url=self.certs_url)
+        if idinfo['iss'] not in GOOGLE_ISSUERS:
+            raise ValueError("Wrong issuer")
+        return idinfo
+
+
+def use_verifier(verifier):
+    GOOGLE_AUTH.reset()
+    GOOGLE_AUTH._value, GOOGLE_AUTH._loaded = verifier, True
+
+
+def run(tokens):
+    client = Client()
+    timings = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for token in tokens:
+            start = time.perf_counter()
+            response = client.post('/auth/google/', {'token': token}, content_type='application/json')
+            timings.append((time.perf_counter() - start) * 1000)
+            assert response.status_code == 200, response.content
+    return timings
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--logins', type=int, default=200)
+    parser.add_argument('--cert-latency-ms', type=float, default=150.0)
+    args = parser.parse_args()
+
+    server = FakeGoogleCertsServer(('127.0.0.1', 0), max_age=3600, latency_ms=args.cert_latency_ms).start_background()
+    teardown = setup_test_database()
+    try:
+        tokens = [server.mint_id_token(f"sub{i % 20}", settings.GOOGLE_CLIENT_ID) for i in range(args.logins)]
+        print(f"{args.logins} sign-ins, key endpoint latency {args.cert_latency_ms} ms")
+        for name, verifier in (
+            ('legacy', LegacyVerifier(server.certs_url)),
+            # Fresh instance: the first login includes the one cold fetch (warm_up does it at boot)
+            ('cached', GoogleCerts(server.certs_url)),
+        ):
+            use_verifier(verifier)
+            server.reset_stats()
+            timings = run(tokens)
+            print(f"  {name:7s} p50 {statistics.median(timings):7.1f} ms   p99 {percentile(timings, 0.99):7.1f} ms"
+                  f"   key fetches {server.stats()['requests']}")
+    finally:
+        GOOGLE_AUTH.reset()
+        teardown()
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+# benchmarks/bench_metrics.py
+"""
+Cost of leaving api/metrics.py on: one histogram observation, one stage timer,
+and GET /meals/daily/ with and without MetricsMiddleware (which also counts
+every DB query).
+
+    python benchmarks/bench_metrics.py [--requests 2000]
+"""
+import argparse
+import contextlib
+import io
+import statistics
+import time
+import timeit
+
+from _django import setup_django, setup_test_database, bearer_token
+
+setup_django()
+
+from django.conf import settings  # noqa: E402
+from django.test import Client, override_settings  # noqa: E402
+
+from api.metrics import MetricsRegistry  # noqa: E402
+from api.models import User  # noqa: E402
+
+
+def per_call_ns(stmt, number=200000):
+    return min(timeit.repeat(stmt, number=number, repeat=5)) / number * 1e9
+
+
+def request_timings(auth, count):
+    client = Client()
+    timings = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(count):
+            start = time.perf_counter()
+            client.get('/meals/daily/', HTTP_AUTHORIZATION=auth)
+            timings.append((time.perf_counter() - start) * 1e6)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    child = MetricsRegistry().histogram('bench_seconds', 'bench', ['stage']).labels('x')
+
+    def timed_block():
+        with child.time():
+            pass
+
+    print(f"observe()        {per_call_ns(lambda: child.observe(0.003)):6.0f} ns")
+    print(f"with .time()     {per_call_ns(timed_block):6.0f} ns")
+
+    teardown = setup_test_database()
+    try:
+        auth = bearer_token(User.objects.create(username='bench', googleId='bench'))
+        without = [m for m in settings.MIDDLEWARE if m != 'api.middleware.MetricsMiddleware']
+        results = {}
+        # Interleave rounds so drift affects both sides equally
+        for _ in range(5):
+            for name, middleware in (('without', without), ('with', settings.MIDDLEWARE)):
+                with override_settings(MIDDLEWARE=middleware):
+                    results.setdefault(name, []).extend(request_timings(auth, args.requests // 5))
+        base, instrumented = statistics.median(results['without']), statistics.median(results['with'])
+        print(f"GET /meals/daily/ p50   without {base:6.1f} us   with {instrumented:6.1f} us"
+              f"   (+{instrumented - base:.1f} us)")
+    finally:
+        teardown()
+
+
+if __name__ == '__main__':
+    main()
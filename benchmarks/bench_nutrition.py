@@ -0,0 +1,74 @@
+# benchmarks/bench_nutrition.py
+"""
+Microbenchmark: per-meal nutrition lookup, old linear CALORIE_MAP scan vs NUTRITION_INDEX.
+
+    python benchmarks/bench_nutrition.py [--meals 20000] [--items 4]
+"""
+import argparse
+import json
+import random
+import timeit
+
+from _django import setup_django
+
+setup_django()
+
+from api.nutrition import NUTRITION_INDEX, CALORIE_DATABASE_PATH  # noqa: E402
+
+
+def legacy_totals(calorie_map, detected_items):
+    # Verbatim copy of the loop add_meal used before the index existed
+    total_calories = total_protein = total_carbs = total_fats = 0.0
+    for item in detected_items:
+        entry = next((x for x in calorie_map if x['name'].lower() == item.lower()), None)
+        if entry:
+            total_calories += float(entry['calories'])
+            total_fats += float(entry['Fats'])
+            total_carbs += float(entry['Carbs'])
+            total_protein += float(entry['Proteins'])
+        else:
+            total_calories += 100
+    return total_calories, total_protein, total_carbs, total_fats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--meals', type=int, default=20000)
+    parser.add_argument('--items', type=int, default=4, help='detections per meal')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with open(CALORIE_DATABASE_PATH) as f:
+        calorie_map = json.load(f)
+
+    # Fake YOLO names table: every food in the database plus one unknown class
+    class_names = {i: entry['name'] for i, entry in enumerate(calorie_map)}
+    class_names[len(class_names)] = 'unknown dish'
+    class_entry_ids = NUTRITION_INDEX.bind_classes(class_names)
+
+    rng = random.Random(0)
+    meals = [[rng.randrange(len(class_names)) for _ in range(args.items)] for _ in range(args.meals)]
+    labelled = [[class_names[c] for c in meal] for meal in meals]
+
+    for meal, labels in zip(meals, labelled):
+        assert legacy_totals(calorie_map, labels) == NUTRITION_INDEX.totals(class_entry_ids[c] for c in meal)
+
+    def run_legacy():
+        for labels in labelled:
+            legacy_totals(calorie_map, labels)
+
+    def run_index():
+        for meal in meals:
+            NUTRITION_INDEX.totals(class_entry_ids[c] for c in meal)
+
+    legacy = min(timeit.repeat(run_legacy, number=1, repeat=args.repeat))
+    indexed = min(timeit.repeat(run_index, number=1, repeat=args.repeat))
+
+    print(f"{args.meals} meals x {args.items} items, {len(NUTRITION_INDEX)} foods")
+    print(f"  linear scan : {legacy / args.meals * 1e6:8.2f} us/meal")
+    print(f"  index       : {indexed / args.meals * 1e6:8.2f} us/meal")
+    print(f"  speedup     : {legacy / indexed:8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
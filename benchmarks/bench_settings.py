@@ -0,0 +1,16 @@
+# benchmarks/bench_settings.py
+"""
+Settings for the load test (loadtest.py): the real project settings, with the
+database, media and Gemini endpoint pointed at throwaway/local stand-ins.
+"""
+import os
+
+from food_backend.settings import *  # noqa: F401,F403
+from food_backend.settings import DATABASES
+
+DATABASES = {'default': {**DATABASES['default'], 'NAME': os.environ['LOADTEST_DB']}}
+MEDIA_ROOT = os.environ['LOADTEST_MEDIA']
+GEMINI_API_BASE = os.environ['LOADTEST_GEMINI_URL']
+GEMINI_API_KEY = 'loadtest'
+# Google sign-in isn't exercised; don't fetch its keys at boot
+WARM_UP_COMPONENTS = ['yolo', 'gemini']
@@ -0,0 +1,180 @@
+# benchmarks/bench_summaries.py
+"""
+Daily/monthly summary cost: legacy Python loops vs database aggregation.
+
+Seeds --meals Meal rows for one user, spread over the current month, then
+times both implementations and counts their queries.
+
+    python benchmarks/bench_summaries.py [--meals 100000]
+"""
+import argparse
+import datetime
+import math
+import random
+import statistics
+import time
+from collections import defaultdict
+
+from _django import setup_django, setup_test_database
+
+setup_django()
+
+from django.db import connection  # noqa: E402
+from django.db.models.functions import TruncDate  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+from django.utils import timezone  # noqa: E402
+
+from api.models import Meal, User  # noqa: E402
+from api.reports import day_start, summary_aggregates, summary_from_row, user_timezone, with_meal_type  # noqa: E402
+
+
+def legacy_daily(user, today):
+    meals = Meal.objects.filter(user=user, createdAt__date=today)
+    total_calories = total_protein = total_carbs = total_fats = 0
+    breakdown = {"breakfast": 0, "lunch": 0, "dinner": 0, "snacks": 0, "other": 0}
+    for meal in meals:
+        total_calories += meal.calories or 0
+        total_protein += meal.protein or 0
+        total_carbs += meal.carbs or 0
+        total_fats += meal.fats or 0
+        mtype = meal.mealType.lower() if meal.mealType else "other"
+        breakdown[mtype if mtype in breakdown else "other"] += meal.calories or 0
+    return {"total": total_calories, "breakdown": breakdown,
+            "macros": {"protein": total_protein, "carbs": total_carbs, "fats": total_fats}}
+
+
+def legacy_monthly(user, start_of_month):
+    meals = Meal.objects.filter(user=user, createdAt__date__gte=start_of_month)
+    daily = defaultdict(lambda: {"total": 0, "breakdown": dict.fromkeys(("breakfast", "lunch", "dinner", "snacks", "other"), 0),
+                                 "macros": {"protein": 0, "carbs": 0, "fats": 0}})
+    for meal in meals:
+        summary = daily[meal.createdAt.day]
+        summary["total"] += meal.calories or 0
+        summary["macros"]["protein"] += meal.protein or 0
+        summary["macros"]["carbs"] += meal.carbs or 0
+        summary["macros"]["fats"] += meal.fats or 0
+        mtype = meal.mealType.lower() if meal.mealType else "other"
+        summary["breakdown"][mtype if mtype in summary["breakdown"] else "other"] += meal.calories or 0
+    return [{"day": day, **data} for day, data in sorted(daily.items())]
+
+
+# --- Live aggregation over Meal (what daily/monthly ran before DailyNutritionSummary) ---
+
+def meals_between(user, start_date, end_date):
+    """
+    The user's meals on local days [start_date, end_date), as two createdAt
+    bounds so meal_user_created_idx serves the range.
+    """
+    tz = user_timezone(user)
+    return Meal.objects.filter(
+        user=user,
+        createdAt__gte=day_start(start_date, tz),
+        createdAt__lt=day_start(end_date, tz),
+    )
+
+
+def meals_on_day(user, date):
+    return meals_between(user, date, date + datetime.timedelta(days=1))
+
+
+def summarize(meals):
+    """One summary over a Meal queryset, in a single query."""
+    return summary_from_row(with_meal_type(meals).aggregate(**summary_aggregates()))
+
+
+def summarize_by_day(meals, tz):
+    """[(date, summary), ...] ordered by date, one GROUP BY query; days are cut in `tz`."""
+    rows = (
+        with_meal_type(meals)
+        .annotate(date=TruncDate("createdAt", tzinfo=tz))
+        .values("date")
+        .annotate(**summary_aggregates())
+        .order_by("date")
+    )
+    return [(row["date"], summary_from_row(row)) for row in rows]
+
+
+def current_daily(user, today):
+    return summarize(meals_on_day(user, today))
+
+
+def current_monthly(user, start_of_month):
+    # Meals are seeded up to now, so tomorrow bounds the month-to-date range
+    meals = meals_between(user, start_of_month, timezone.localdate() + datetime.timedelta(days=1))
+    return [{"day": date.day, **summary} for date, summary in summarize_by_day(meals, user_timezone(user))]
+
+
+def seed(user, count, now):
+    rng = random.Random(0)
+    start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    span = max((now - start).total_seconds(), 1)
+    types = ["Breakfast", "lunch", "DINNER", "snacks", "Brunch", None]
+    field = Meal._meta.get_field('createdAt')
+    field.auto_now_add = False  # let the seed choose timestamps
+    try:
+        batch = []
+        for i in range(count):
+            batch.append(Meal(
+                user=user, mealType=rng.choice(types), items="dosa, sambar",
+                calories=rng.uniform(50, 900), protein=rng.uniform(0, 40),
+                carbs=rng.uniform(0, 120), fats=rng.uniform(0, 40),
+                createdAt=start + datetime.timedelta(seconds=rng.uniform(0, span)),
+            ))
+            if len(batch) == 5000:
+                Meal.objects.bulk_create(batch)
+                batch = []
+        Meal.objects.bulk_create(batch)
+    finally:
+        field.auto_now_add = True
+
+
+def close(a, b):
+    if isinstance(a, dict):
+        return a.keys() == b.keys() and all(close(a[k], b[k]) for k in a)
+    if isinstance(a, list):
+        return len(a) == len(b) and all(close(x, y) for x, y in zip(a, b))
+    if isinstance(a, float) or isinstance(b, float):
+        return math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-6)
+    return a == b
+
+
+def measure(fn, *args, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as ctx:
+            start = time.perf_counter()
+            result = fn(*args)
+            timings.append((time.perf_counter() - start) * 1000)
+    return result, statistics.median(timings), len(ctx.captured_queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--meals', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    teardown = setup_test_database()
+    try:
+        now = timezone.now()
+        user = User.objects.create(username='heavy', googleId='heavy')
+        User.objects.create(username='other', googleId='other')
+        seed(user, args.meals, now)
+        today, start_of_month = now.date(), now.date().replace(day=1)
+
+        print(f"{args.meals} meals this month for one user ({connection.vendor})")
+        for name, legacy, current, call_args in (
+            ('daily', legacy_daily, current_daily, (user, today)),
+            ('monthly', legacy_monthly, current_monthly, (user, start_of_month)),
+        ):
+            old, old_ms, old_q = measure(legacy, *call_args, repeat=args.repeat)
+            new, new_ms, new_q = measure(current, *call_args, repeat=args.repeat)
+            assert close(old, new), f"{name} results differ"
+            print(f"  {name:8s} legacy {old_ms:9.1f} ms / {old_q} query   db {new_ms:8.1f} ms / {new_q} query"
+                  f"   ({old_ms / new_ms:.1f}x)")
+    finally:
+        teardown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+# benchmarks/bench_transfer.py
+"""
+Memory and throughput of POST /meals/import/ and GET /meals/export/ for
+histories of different sizes.
+
+    python benchmarks/bench_transfer.py [--rows 10000,100000,1000000]
+
+For each size, a fresh SQLite database gets one user. An NDJSON file with that
+many meals is written to disk and imported through the view, reading the file
+as the request body. The history is then exported as NDJSON and as CSV, with
+the response read chunk by chunk and discarded. Each step runs in a process of
+its own. "peak +MiB" is how far that process's peak RSS rose during the step,
+so a flat column across sizes means memory does not grow with the history.
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+
+FOODS = ['rice', 'dal', 'roti', 'paneer', 'idli', 'dosa', 'sambar', 'curd', 'banana', 'egg', 'chicken curry']
+
+
+def peak_rss_mib():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def write_history(path, rows, seed=0):
+    """An export-shaped NDJSON file, written line by line."""
+    rng = random.Random(seed)
+    start = 1_600_000_000
+    with open(path, 'w') as f:
+        for i in range(rows):
+            created = time.strftime('%Y-%m-%dT%H:%M:%S+00:00', time.gmtime(start + i * 600))
+            f.write(json.dumps({
+                'id': i + 1, 'createdAt': created, 'mealType': rng.choice(['breakfast', 'lunch', 'dinner', 'snacks']),
+                'items': rng.sample(FOODS, rng.randint(1, 4)), 'calories': round(rng.uniform(80, 900), 1),
+                'protein': round(rng.uniform(1, 40), 1), 'carbs': round(rng.uniform(5, 120), 1),
+                'fats': round(rng.uniform(1, 35), 1), 'imageUrl': None, 'thumbnailUrl': None,
+            }) + '\n')
+
+
+# --- Steps (each in a child process) ---
+
+def step(name, path):
+    sys.path[:0] = [ROOT_DIR, BENCH_DIR]
+    from _django import bearer_token, setup_django
+
+    setup_django()
+    from django.core.handlers.wsgi import WSGIRequest
+    from django.test import RequestFactory
+    from api.models import User
+    from api.views import export_meals, import_meals_view
+
+    user, _ = User.objects.get_or_create(username='history', defaults={'googleId': 'history'})
+    auth = bearer_token(user)
+    factory = RequestFactory()
+
+    before = peak_rss_mib()
+    start = time.perf_counter()
+    if name == 'import':
+        with open(path, 'rb') as body:
+            environ = factory._base_environ(
+                PATH_INFO='/meals/import/', REQUEST_METHOD='POST', CONTENT_TYPE='application/x-ndjson',
+                CONTENT_LENGTH=str(os.path.getsize(path)), HTTP_AUTHORIZATION=auth, HTTP_HOST='localhost',
+            )
+            environ['wsgi.input'] = body
+            response = import_meals_view(WSGIRequest(environ))
+        result = json.loads(response.content)
+        count, size = result['imported'], os.path.getsize(path)
+    else:
+        request = factory.get('/meals/export/', {'fmt': name}, HTTP_AUTHORIZATION=auth, HTTP_HOST='localhost')
+        response = export_meals(request)
+        size = 0
+        for chunk in response.streaming_content:
+            size += len(chunk)
+        count = User.objects.get(pk=user.pk).meals.count()
+    seconds = time.perf_counter() - start
+    print(json.dumps({'seconds': seconds, 'rows': count, 'bytes': size, 'peak_growth': peak_rss_mib() - before}))
+
+
+def run_step(name, env, path=''):
+    out = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--step', name, '--path', path],
+        env=env, check=True, stdout=subprocess.PIPE, text=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', default='10000,100000,1000000', help="comma-separated history sizes")
+    parser.add_argument('--step', help=argparse.SUPPRESS)
+    parser.add_argument('--path', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.step:
+        step(args.step, args.path)
+        return
+
+    print(f"  {'rows':>9s} {'step':7s} {'rows/s':>9s} {'MiB':>7s} {'seconds':>8s} {'peak +MiB':>10s}")
+    for rows in (int(value) for value in args.rows.split(',')):
+        with tempfile.TemporaryDirectory(prefix='bench-transfer-') as workdir:
+            env = {
+                **os.environ,
+                'DJANGO_SETTINGS_MODULE': 'food_backend.settings',
+                'DATABASE_URL': f"sqlite:///{os.path.join(workdir, 'db.sqlite3')}",
+            }
+            env.setdefault('SECRET_KEY', 'benchmark-secret-key')
+            env.setdefault('JWT_SECRET', 'benchmark-jwt-secret-benchmark-jwt-secret')
+            env.setdefault('VITE_GOOGLE_CLIENT_ID', 'benchmark-client-id')
+            subprocess.run([sys.executable, os.path.join(ROOT_DIR, 'manage.py'), 'migrate', '--noinput', '-v', '0'],
+                           env=env, check=True)
+            history = os.path.join(workdir, 'history.ndjson')
+            write_history(history, rows)
+            for name in ('import', 'ndjson', 'csv'):
+                result = run_step(name, env, history)
+                print(f"  {rows:9d} {name:7s} {result['rows'] / result['seconds']:9.0f} "
+                      f"{result['bytes'] / 2**20:7.1f} {result['seconds']:8.1f} {result['peak_growth']:10.1f}")
+
+
+if __name__ == '__main__':
+    main()
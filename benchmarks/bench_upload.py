@@ -0,0 +1,143 @@
+# benchmarks/bench_upload.py
+"""
+POST /meals/ latency with a stub YOLO model: legacy disk round trip vs in-memory decode.
+
+    python benchmarks/bench_upload.py [--requests 200] [--width 1920 --height 1440]
+
+"legacy" is the pre-change add_meal image path (write chunks to MEDIA_ROOT, then
+let the model read and decode the file back); "current" is api.views.add_meal.
+Both run auth, nutrition lookup and the DB insert the same way.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+
+from _django import setup_django, setup_test_database, bearer_token
+from stubs import install_stub_yolo, make_jpeg
+
+setup_django()
+
+from api.nutrition import CALORIE_DATABASE_PATH  # noqa: E402
+
+with open(CALORIE_DATABASE_PATH) as _f:
+    stub_model = install_stub_yolo([entry['name'] for entry in json.load(_f)])
+
+from django.conf import settings  # noqa: E402
+from django.http import JsonResponse  # noqa: E402
+from django.test import Client, override_settings  # noqa: E402
+from django.urls import path  # noqa: E402
+from rest_framework.decorators import api_view, authentication_classes, permission_classes  # noqa: E402
+from rest_framework.permissions import IsAuthenticated  # noqa: E402
+
+from api import meals, views  # noqa: E402
+from api.registry import YOLO_DETECTOR  # noqa: E402
+from api.authentication import JWTGoogleAuthentication  # noqa: E402
+from api.images import image_writer  # noqa: E402
+from api.models import Meal, User  # noqa: E402
+from api.nutrition import NUTRITION_INDEX  # noqa: E402
+
+
+@api_view(['POST'])
+@authentication_classes([JWTGoogleAuthentication])
+@permission_classes([IsAuthenticated])
+def legacy_add_meal(request):
+    image = request.FILES['image']
+    upload_dir = os.path.join(settings.MEDIA_ROOT, 'meals')
+    os.makedirs(upload_dir, exist_ok=True)
+    image_name = f"{uuid.uuid4()}.jpg"
+    image_path = os.path.join(upload_dir, image_name)
+
+    with open(image_path, 'wb+') as f:
+        for chunk in image.chunks():
+            f.write(chunk)
+
+    detection = YOLO_DETECTOR.get().detect(image_path)
+    names = YOLO_DETECTOR.get().names
+    detected_items = [names[c] for c in detection.class_ids]
+    class_entry_ids = meals.get_class_entry_ids()
+    total_calories, total_protein, total_carbs, total_fats = NUTRITION_INDEX.totals(
+        class_entry_ids[c] for c in detection.class_ids
+    )
+    macros = {"protein": total_protein, "carbs": total_carbs, "fats": total_fats}
+    meal = Meal.objects.create(
+        user=request.user, mealType=request.POST.get('mealType', 'Unknown'),
+        calories=total_calories, protein=total_protein, carbs=total_carbs, fats=total_fats,
+        items=", ".join(detected_items), image=f"meals/{image_name}", macros=json.dumps(macros),
+    )
+    return JsonResponse({"message": "Meal detected and saved successfully", "meal": {"id": meal.id}})
+
+
+urlpatterns = [
+    path('legacy/meals/', legacy_add_meal),
+    path('meals/', views.add_meal),
+]
+
+
+def run(client, url, payload, auth, count):
+    timings = []
+    for _ in range(count):
+        # Views still print() on the request path; keep it off the terminal
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            response = client.post(url, {'image': _upload(payload), 'mealType': 'Lunch'}, HTTP_AUTHORIZATION=auth)
+            timings.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200, response.content
+    timings.sort()
+    return {
+        'mean_ms': statistics.fmean(timings),
+        'p50_ms': timings[len(timings) // 2],
+        'p95_ms': timings[int(len(timings) * 0.95) - 1],
+    }
+
+
+def _upload(payload):
+    from django.core.files.uploadedfile import SimpleUploadedFile
+    return SimpleUploadedFile('meal.jpg', payload, content_type='image/jpeg')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--width', type=int, default=1920)
+    parser.add_argument('--height', type=int, default=1440)
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='stub inference latency')
+    args = parser.parse_args()
+
+    stub_model.latency = args.latency_ms / 1000.0
+    teardown = setup_test_database()
+    try:
+        with tempfile.TemporaryDirectory() as media_root, \
+                override_settings(MEDIA_ROOT=media_root, ROOT_URLCONF=__name__):
+            user = User.objects.create(username='bench', googleId='bench')
+            auth = bearer_token(user)
+            payload = make_jpeg(args.width, args.height)
+            client = Client()
+
+            # Warm up both paths (imports, first DB connection)
+            run(client, '/legacy/meals/', payload, auth, 5)
+            run(client, '/meals/', payload, auth, 5)
+
+            results = {
+                'legacy': run(client, '/legacy/meals/', payload, auth, args.requests),
+                'current': run(client, '/meals/', payload, auth, args.requests),
+            }
+            image_writer.flush()
+    finally:
+        teardown()
+
+    print(f"{args.requests} requests, {args.width}x{args.height} JPEG ({len(payload) / 1024:.0f} KiB), "
+          f"stub latency {args.latency_ms} ms")
+    for name, r in results.items():
+        print(f"  {name:8s} mean {r['mean_ms']:7.2f} ms   p50 {r['p50_ms']:7.2f} ms   p95 {r['p95_ms']:7.2f} ms")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
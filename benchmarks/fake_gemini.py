@@ -0,0 +1,118 @@
+# benchmarks/fake_gemini.py
+"""
+Local stand-in for the Gemini REST API (`POST /v1beta/models/<model>:generateContent`).
+
+Answers after a configurable latency with a canned JSON body matching the
+request's responseSchema, and tracks how many calls were in flight at once and
+how many distinct prompts it was sent.
+
+    python benchmarks/fake_gemini.py --port 8765 --latency-ms 800
+    GEMINI_API_BASE=http://127.0.0.1:8765 python manage.py runserver
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def sample_value(schema):
+    kind = str(schema.get('type', 'string')).lower()
+    if kind == 'object':
+        return {key: sample_value(sub) for key, sub in schema.get('properties', {}).items()}
+    if kind in ('number', 'integer'):
+        return 2000
+    return "Stub answer from fake_gemini."
+
+
+class FakeGeminiServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+    def __init__(self, address, latency_ms=0.0):
+        super().__init__(address, _Handler)
+        self.latency = latency_ms / 1000.0
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.inflight = 0
+        self.max_inflight = 0
+        self.prompts = set()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def stats(self):
+        with self.lock:
+            return {
+                'requests': self.requests, 'inflight': self.inflight, 'max_inflight': self.max_inflight,
+                'distinct_prompts': len(self.prompts),
+            }
+
+    def reset_stats(self):
+        with self.lock:
+            self.requests = self.max_inflight = 0
+            self.prompts.clear()
+
+    def start_background(self):
+        threading.Thread(target=self.serve_forever, name='fake-gemini', daemon=True).start()
+        return self
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == '/stats':
+            return self._send(200, self.server.stats())
+        return self._send(404, {'error': 'not found'})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        request = json.loads(self.rfile.read(length) or b'{}')
+        if ':generateContent' not in self.path:
+            return self._send(404, {'error': 'not found'})
+
+        server = self.server
+        prompt = json.dumps(request.get('contents'), sort_keys=True)
+        with server.lock:
+            server.requests += 1
+            server.prompts.add(prompt)
+            server.inflight += 1
+            server.max_inflight = max(server.max_inflight, server.inflight)
+        try:
+            time.sleep(server.latency)
+            schema = request.get('generationConfig', {}).get('responseSchema', {'type': 'string'})
+            text = json.dumps(sample_value(schema))
+            self._send(200, {'candidates': [{'content': {'role': 'model', 'parts': [{'text': text}]}}]})
+        finally:
+            with server.lock:
+                server.inflight -= 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency-ms', type=float, default=800.0)
+    args = parser.parse_args()
+
+    server = FakeGeminiServer((args.host, args.port), args.latency_ms)
+    print(f"Fake Gemini on {server.url} (latency {args.latency_ms} ms)")
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+# benchmarks/fake_google_certs.py
+"""
+Local stand-in for Google's sign-in key endpoints, plus a matching ID token minter.
+
+Serves a freshly generated RSA key as `GET /oauth2/v1/certs` (PEM certificates,
+the default GOOGLE_CERTS_URL format) and `GET /oauth2/v3/certs` (JWKS), with a
+configurable Cache-Control max-age and fetch latency. `mint_id_token()` signs
+tokens that google_auth_view accepts when pointed at this server.
+
+    python benchmarks/fake_google_certs.py --port 8766 --max-age 3600 --latency-ms 150
+    GOOGLE_CERTS_URL=http://127.0.0.1:8766/oauth2/v1/certs python manage.py runserver
+"""
+import argparse
+import base64
+import datetime
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def _b64url_uint(value):
+    raw = value.to_bytes((value.bit_length() + 7) // 8, 'big')
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode()
+
+
+class SigningKey:
+    """An RSA key with a self-signed certificate, as Google publishes them."""
+
+    def __init__(self, kid):
+        from cryptography import x509
+        from cryptography.hazmat.primitives import hashes, serialization
+        from cryptography.hazmat.primitives.asymmetric import rsa
+        from cryptography.x509.oid import NameOID
+
+        self.kid = kid
+        self.private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, 'fake-google-certs')])
+        now = datetime.datetime.now(datetime.timezone.utc)
+        certificate = (
+            x509.CertificateBuilder()
+            .subject_name(name).issuer_name(name)
+            .public_key(self.private_key.public_key())
+            .serial_number(x509.random_serial_number())
+            .not_valid_before(now - datetime.timedelta(days=1))
+            .not_valid_after(now + datetime.timedelta(days=30))
+            .sign(self.private_key, hashes.SHA256())
+        )
+        self.cert_pem = certificate.public_bytes(serialization.Encoding.PEM).decode()
+        self.private_pem = self.private_key.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+        ).decode()
+
+    def jwk(self):
+        numbers = self.private_key.public_key().public_numbers()
+        return {'kty': 'RSA', 'alg': 'RS256', 'use': 'sig', 'kid': self.kid,
+                'n': _b64url_uint(numbers.n), 'e': _b64url_uint(numbers.e)}
+
+
+class FakeGoogleCertsServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+    def __init__(self, address, max_age=3600, latency_ms=0.0):
+        super().__init__(address, _Handler)
+        self.max_age = max_age
+        self.latency = latency_ms / 1000.0
+        self.lock = threading.Lock()
+        self.keys = [SigningKey('fake-key-1')]
+        self.requests = 0
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def certs_url(self):
+        return f"{self.url}/oauth2/v1/certs"
+
+    @property
+    def jwks_url(self):
+        return f"{self.url}/oauth2/v3/certs"
+
+    def rotate(self):
+        """Publish a new key (tokens are signed with it from now on); the old one stays listed."""
+        with self.lock:
+            self.keys = [SigningKey(f"fake-key-{len(self.keys) + 1}")] + self.keys[:1]
+
+    def mint_id_token(self, sub, audience, email=None, name='Test User', lifetime=3600):
+        from google.auth import crypt, jwt as google_jwt
+
+        key = self.keys[0]
+        now = int(time.time())
+        payload = {
+            'iss': 'https://accounts.google.com', 'aud': audience, 'sub': sub,
+            'email': email or f"{sub}@example.com", 'name': name,
+            'iat': now, 'exp': now + lifetime,
+        }
+        signer = crypt.RSASigner.from_string(key.private_pem, key_id=key.kid)
+        return google_jwt.encode(signer, payload).decode()
+
+    def stats(self):
+        with self.lock:
+            return {'requests': self.requests, 'kids': [key.kid for key in self.keys]}
+
+    def reset_stats(self):
+        with self.lock:
+            self.requests = 0
+
+    def start_background(self):
+        threading.Thread(target=self.serve_forever, name='fake-google-certs', daemon=True).start()
+        return self
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, payload, max_age=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        if max_age is not None:
+            self.send_header('Cache-Control', f"public, max-age={max_age}, must-revalidate, no-transform")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        server = self.server
+        if self.path == '/stats':
+            return self._send(200, server.stats())
+        if self.path not in ('/oauth2/v1/certs', '/oauth2/v3/certs'):
+            return self._send(404, {'error': 'not found'})
+
+        with server.lock:
+            server.requests += 1
+            keys = list(server.keys)
+        time.sleep(server.latency)
+        if self.path == '/oauth2/v1/certs':
+            return self._send(200, {key.kid: key.cert_pem for key in keys}, server.max_age)
+        return self._send(200, {'keys': [key.jwk() for key in keys]}, server.max_age)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--max-age', type=int, default=3600)
+    parser.add_argument('--latency-ms', type=float, default=150.0)
+    args = parser.parse_args()
+
+    server = FakeGoogleCertsServer((args.host, args.port), args.max_age, args.latency_ms)
+    print(f"Fake Google certs on {server.certs_url} (max-age {args.max_age}s, latency {args.latency_ms} ms)")
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,340 @@
+# benchmarks/loadtest.py
+"""
+End-to-end HTTP load test: the app under gunicorn (WSGI, stub_wsgi.py) and/or
+uvicorn (ASGI, stub_asgi.py), YOLO replaced by StubYOLO and Gemini by
+fake_gemini.py, all on this machine.
+
+Each scenario runs for --duration seconds at --concurrency keep-alive clients
+and reports throughput and p50/p95/p99 latency. Results go to a JSON file;
+with --baseline, a scenario whose throughput drops or p95 grows by more than
+--threshold (fraction) fails the run (exit code 1).
+
+With --server both the scenarios run against each deployment in turn and a
+side-by-side table follows. gunicorn results are keyed by scenario name (as
+before), uvicorn results by "uvicorn/<scenario>".
+
+    python benchmarks/loadtest.py --workers 4 --concurrency 16 --duration 10
+    python benchmarks/loadtest.py --server both --scenarios daily,monthly,calorie_target
+    python benchmarks/loadtest.py --baseline benchmarks/results/<commit>.json --threshold 0.10
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+
+SERVERS = ('gunicorn', 'uvicorn')
+SCENARIOS = ('add_meal', 'add_meal_batch', 'daily', 'monthly', 'report', 'profile_update', 'calorie_target', 'health_report')
+# Gemini scenarios behind GeminiResponseCache; if they all send one profile, the cache answers instead
+CACHED_GEMINI_SCENARIOS = ('calorie_target',)
+
+
+# --- Requests per scenario ---
+
+def _profile_body(rng):
+    return {
+        'age': rng.randint(18, 70), 'gender': rng.choice(['male', 'female']),
+        'weight': rng.randint(50, 110), 'height': rng.randint(150, 195),
+        'goal': rng.choice(['lose weight', 'maintain', 'gain muscle']),
+    }
+
+
+def make_request(scenario, client, token, rng, images):
+    headers = {'Authorization': token}
+    if scenario == 'add_meal':
+        files = {'image': ('meal.jpg', rng.choice(images), 'image/jpeg')}
+        data = {'mealType': rng.choice(['breakfast', 'lunch', 'dinner', 'snacks'])}
+        return client.post('/meals/', headers=headers, files=files, data=data)
+    if scenario == 'add_meal_batch':
+        files = [('images', (f'plate{i}.jpg', rng.choice(images), 'image/jpeg')) for i in range(4)]
+        return client.post('/meals/batch/', headers=headers, files=files, data={'mealType': 'lunch'})
+    if scenario == 'daily':
+        return client.get('/meals/daily/', headers=headers)
+    if scenario == 'monthly':
+        return client.get('/meals/monthly/', headers=headers)
+    if scenario == 'report':
+        return client.get('/meals/report/', headers=headers, params={'bucket': 'week'})
+    if scenario == 'profile_update':
+        return client.post('/profile/', headers=headers, json=_profile_body(rng))
+    if scenario == 'calorie_target':
+        # The view reads the profile fields from the top level of the body
+        return client.post('/calories/calculate/', headers=headers, json=_profile_body(rng))
+    if scenario == 'health_report':
+        return client.post('/calories/report/', headers=headers, json={'name': 'Load Test', **_profile_body(rng)})
+    raise ValueError(scenario)
+
+
+def run_scenario(scenario, base_url, tokens, images, concurrency, duration):
+    import httpx
+
+    latencies, errors, lock = [], [0], threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client_loop(index):
+        rng = random.Random(index)
+        local, failed = [], 0
+        with httpx.Client(base_url=base_url, timeout=60.0) as client:
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    response = make_request(scenario, client, tokens[index % len(tokens)], rng, images)
+                    ok = response.status_code < 400
+                except httpx.HTTPError:
+                    ok = False
+                local.append((time.perf_counter() - start) * 1000)
+                failed += not ok
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=client_loop, args=(i,)) for i in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return summarize(latencies, errors[0], elapsed)
+
+
+def percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else None
+
+
+def summarize(latencies, errors, elapsed):
+    ordered = sorted(latencies)
+    return {
+        'requests': len(ordered),
+        'errors': errors,
+        'rps': round(len(ordered) / elapsed, 1),
+        'p50_ms': round(percentile(ordered, 0.50), 2) if ordered else None,
+        'p95_ms': round(percentile(ordered, 0.95), 2) if ordered else None,
+        'p99_ms': round(percentile(ordered, 0.99), 2) if ordered else None,
+    }
+
+
+# --- Regression check ---
+
+def compare(results, baseline, threshold):
+    """[(scenario, message)] for every scenario that got worse than `threshold` allows."""
+    regressions = []
+    for scenario, new in results['scenarios'].items():
+        old = baseline.get('scenarios', {}).get(scenario)
+        if not old or not old.get('rps') or not new.get('rps'):
+            continue
+        if new['rps'] < old['rps'] * (1 - threshold):
+            regressions.append((scenario, f"throughput {old['rps']} -> {new['rps']} req/s"))
+        if old.get('p95_ms') and new['p95_ms'] > old['p95_ms'] * (1 + threshold):
+            regressions.append((scenario, f"p95 {old['p95_ms']} -> {new['p95_ms']} ms"))
+        if new['errors'] > old.get('errors', 0):
+            regressions.append((scenario, f"errors {old.get('errors', 0)} -> {new['errors']}"))
+    return regressions
+
+
+# --- Environment ---
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def wait_until_up(name, base_url, process, timeout=60):
+    import httpx
+
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{name} exited during startup")
+        try:
+            httpx.get(f"{base_url}/metrics", timeout=1.0)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{name} did not answer within {timeout}s")
+
+
+def server_command(name, args, port):
+    """gunicorn: sync gthread workers (WSGI). uvicorn: one event loop per worker (ASGI)."""
+    if name == 'gunicorn':
+        return [sys.executable, '-m', 'gunicorn', 'stub_wsgi:application', '--chdir', BENCH_DIR,
+                '--workers', str(args.workers), '--worker-class', 'gthread', '--threads', str(args.threads),
+                '--bind', f'127.0.0.1:{port}', '--log-level', 'warning']
+    # Django has no lifespan support; uvicorn would log a warning on every start
+    return [sys.executable, '-m', 'uvicorn', 'stub_asgi:application', '--app-dir', BENCH_DIR,
+            '--workers', str(args.workers), '--host', '127.0.0.1', '--port', str(port),
+            '--lifespan', 'off', '--no-access-log', '--log-level', 'warning']
+
+
+def result_key(server, scenario):
+    return scenario if server == 'gunicorn' else f"{server}/{scenario}"
+
+
+def seed_users(count):
+    """Create users with filled profiles and return their bearer tokens (runs in this process)."""
+    import django
+    django.setup()
+    from _django import bearer_token
+    from api.models import User
+
+    tokens = []
+    for i in range(count):
+        user = User.objects.create(
+            username=f'load{i}', googleId=f'load{i}', email=f'load{i}@example.com', first_name=f'Load {i}',
+            age=30, gender='female', weight=65, height=170, goal='maintain', profileFilled=True,
+        )
+        tokens.append(bearer_token(user))
+    return tokens
+
+
+def run_server(name, args, env, workdir, scenarios, tokens, images, results, gemini):
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    log_path = os.path.join(workdir, f'{name}.log')
+    if name == 'uvicorn':
+        # Persistent connections aren't reused under ASGI (see settings.py)
+        env = {**env, 'DB_CONN_MAX_AGE': '0'}
+    with open(log_path, 'w') as log:
+        server = subprocess.Popen(server_command(name, args, port), env=env, stdout=subprocess.DEVNULL, stderr=log)
+    try:
+        wait_until_up(name, base_url, server)
+        shape = f"{args.workers}x{args.threads}" if name == 'gunicorn' else f"{args.workers} workers"
+        print(f"{name} {shape} on {base_url}, {args.concurrency} clients, "
+              f"{args.duration}s per scenario (YOLO {args.yolo_latency_ms} ms, Gemini {args.gemini_latency_ms} ms)")
+        print(f"  {'scenario':16s} {'req/s':>8s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s} {'errors':>7s}")
+        for scenario in scenarios:
+            gemini.reset_stats()
+            stats = run_scenario(scenario, base_url, tokens, images, args.concurrency, args.duration)
+            results['scenarios'][result_key(name, scenario)] = stats
+            print(f"  {scenario:16s} {stats['rps']:8.1f} {stats['p50_ms'] or 0:9.1f} {stats['p95_ms'] or 0:9.1f}"
+                  f" {stats['p99_ms'] or 0:9.1f} {stats['errors']:7d}")
+            if scenario in CACHED_GEMINI_SCENARIOS and stats['requests'] > 1:
+                prompts = gemini.stats()['distinct_prompts']
+                if prompts <= 1:
+                    raise RuntimeError(f"{scenario}: fake Gemini saw {prompts} distinct prompt(s), "
+                                       f"so the run measured the response cache, not the Gemini path")
+    except RuntimeError as e:
+        print(f"{e}; see {log_path}")
+        sys.exit(2)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def print_side_by_side(servers, scenarios, results):
+    print("  " + f"{'scenario':16s}" + "".join(f" {name + ' req/s':>15s} {'p95 ms':>8s}" for name in servers))
+    for scenario in scenarios:
+        row = f"  {scenario:16s}"
+        for name in servers:
+            stats = results['scenarios'][result_key(name, scenario)]
+            row += f" {stats['rps']:15.1f} {stats['p95_ms'] or 0:8.1f}"
+        print(row)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--server', choices=SERVERS + ('both',), default='gunicorn',
+                        help="deployment to load: gunicorn (WSGI), uvicorn (ASGI) or both")
+    parser.add_argument('--workers', type=int, default=4, help="worker processes")
+    parser.add_argument('--threads', type=int, default=4, help="threads per gunicorn worker (gthread)")
+    parser.add_argument('--concurrency', type=int, default=16, help="concurrent keep-alive clients")
+    parser.add_argument('--duration', type=float, default=10.0, help="seconds per scenario")
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help="comma-separated subset, in order")
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--yolo-latency-ms', type=float, default=40.0)
+    parser.add_argument('--gemini-latency-ms', type=float, default=300.0)
+    parser.add_argument('--image-size', default='1280x960', help="WxH of the uploaded JPEGs")
+    parser.add_argument('--output', help="results JSON (default: benchmarks/results/<commit>.json)")
+    parser.add_argument('--baseline', help="earlier results JSON to compare against")
+    parser.add_argument('--threshold', type=float, default=0.10, help="allowed relative regression")
+    args = parser.parse_args()
+
+    scenarios = [s for s in args.scenarios.split(',') if s]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    sys.path[:0] = [ROOT_DIR, BENCH_DIR]
+    from fake_gemini import FakeGeminiServer
+    from stubs import make_jpeg
+
+    workdir = tempfile.mkdtemp(prefix='loadtest-')
+    gemini = FakeGeminiServer(('127.0.0.1', 0), args.gemini_latency_ms).start_background()
+    env = {
+        **os.environ,
+        'DJANGO_SETTINGS_MODULE': 'bench_settings',
+        'PYTHONPATH': os.pathsep.join([ROOT_DIR, BENCH_DIR, os.environ.get('PYTHONPATH', '')]),
+        'LOADTEST_DB': os.path.join(workdir, 'db.sqlite3'),
+        'LOADTEST_MEDIA': os.path.join(workdir, 'media'),
+        'LOADTEST_GEMINI_URL': gemini.url,
+        'STUB_YOLO_LATENCY_MS': str(args.yolo_latency_ms),
+        'SECRET_KEY': os.environ.get('SECRET_KEY', 'loadtest-secret-key'),
+        'JWT_SECRET': os.environ.get('JWT_SECRET', 'loadtest-jwt-secret-loadtest-jwt-secret'),
+        'VITE_GOOGLE_CLIENT_ID': os.environ.get('VITE_GOOGLE_CLIENT_ID', 'loadtest-client-id'),
+    }
+    os.environ.update({k: v for k, v in env.items() if k != 'PYTHONPATH'})
+
+    subprocess.run(
+        [sys.executable, os.path.join(ROOT_DIR, 'manage.py'), 'migrate', '--noinput', '-v', '0'], env=env, check=True
+    )
+    tokens = seed_users(args.users)
+    width, height = (int(v) for v in args.image_size.lower().split('x'))
+    images = [make_jpeg(width, height, seed=i) for i in range(8)]
+
+    servers = SERVERS if args.server == 'both' else (args.server,)
+    results = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'cpus': os.cpu_count(),
+            **{k: v for k, v in vars(args).items() if k not in ('output', 'baseline', 'scenarios')},
+        },
+        'scenarios': {},
+    }
+    try:
+        for name in servers:
+            run_server(name, args, env, workdir, scenarios, tokens, images, results, gemini)
+    finally:
+        gemini.shutdown()
+
+    if len(servers) > 1:
+        print_side_by_side(servers, scenarios, results)
+
+    output = args.output or os.path.join(BENCH_DIR, 'results', f"{results['meta']['commit'] or 'local'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for scenario, message in regressions:
+            print(f"  REGRESSION {scenario}: {message}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.threshold:.0%} against {args.baseline}")
+
+
+if __name__ == '__main__':
+    main()
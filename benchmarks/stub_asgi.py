@@ -0,0 +1,22 @@
+# benchmarks/stub_asgi.py
+"""
+uvicorn entry point for loadtest.py --server uvicorn: food_backend.asgi with
+the same StubYOLO as stub_wsgi.py.
+
+    uvicorn --app-dir benchmarks stub_asgi:application
+"""
+import os
+import sys
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+for path in (ROOT_DIR, BENCH_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'bench_settings')
+
+from stubs import install_stub_yolo_from_env  # noqa: E402
+
+install_stub_yolo_from_env(ROOT_DIR)
+
+from food_backend.asgi import application  # noqa: E402,F401
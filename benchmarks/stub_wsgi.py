@@ -0,0 +1,22 @@
+# benchmarks/stub_wsgi.py
+"""
+gunicorn entry point for loadtest.py: food_backend.wsgi with StubYOLO in place
+of best.pt. Latency comes from STUB_YOLO_LATENCY_MS / STUB_YOLO_PER_IMAGE_MS.
+
+    gunicorn --chdir benchmarks stub_wsgi:application
+"""
+import os
+import sys
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+for path in (ROOT_DIR, BENCH_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'bench_settings')
+
+from stubs import install_stub_yolo_from_env  # noqa: E402
+
+install_stub_yolo_from_env(ROOT_DIR)
+
+from food_backend.wsgi import application  # noqa: E402,F401
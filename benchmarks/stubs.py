@@ -0,0 +1,94 @@
+# benchmarks/stubs.py
+"""Deterministic stand-ins for the YOLO model, used by the benchmark scripts."""
+import json
+import os
+import time
+import zlib
+
+import numpy as np
+
+
+class _Tensor:
+    def __init__(self, values):
+        self._values = values
+
+    def tolist(self):
+        return self._values
+
+
+class _Boxes:
+    def __init__(self, class_ids):
+        self.cls = _Tensor([float(c) for c in class_ids])
+        self.conf = _Tensor([0.9] * len(class_ids))
+        self.xyxy = _Tensor([[0.0, 0.0, 64.0, 64.0] for _ in class_ids])
+
+
+class _Result:
+    def __init__(self, class_ids):
+        self.boxes = _Boxes(class_ids)
+
+
+class StubYOLO:
+    """
+    Mimics the parts of ultralytics.YOLO that api.inference uses. Paths are read
+    and decoded from disk like the real loader does; detections are derived from
+    a checksum of the pixels, so the same image always yields the same items.
+    """
+
+    def __init__(self, class_names, latency_ms=0.0, per_image_ms=0.0, items_per_image=3):
+        self.names = dict(enumerate(class_names))
+        self.latency = latency_ms / 1000.0
+        self.per_image = per_image_ms / 1000.0
+        self.items_per_image = items_per_image
+        self.calls = 0
+
+    def _load(self, source):
+        if isinstance(source, str):
+            import cv2
+            image = cv2.imread(source)
+            if image is None:
+                raise FileNotFoundError(source)
+            return image
+        return np.asarray(source)
+
+    def predict(self, source, **kwargs):
+        sources = source if isinstance(source, list) else [source]
+        self.calls += 1
+        time.sleep(self.latency + self.per_image * len(sources))
+        results = []
+        for src in sources:
+            seed = zlib.crc32(self._load(src)[::16, ::16].tobytes())
+            class_ids = [(seed + i * 7) % len(self.names) for i in range(self.items_per_image)]
+            results.append(_Result(class_ids))
+        return results
+
+
+def install_stub_yolo(class_names, **kwargs):
+    """Make api.inference load StubYOLO instead of best.pt. Call before importing api.views."""
+    import api.inference
+
+    stub = StubYOLO(class_names, **kwargs)
+    api.inference.load_yolo = lambda model_path: stub
+    return stub
+
+
+def install_stub_yolo_from_env(root_dir):
+    """install_stub_yolo() for the server entry points (stub_wsgi/stub_asgi), latency from STUB_YOLO_* env vars."""
+    with open(os.path.join(root_dir, 'calorie_Database.json')) as f:
+        return install_stub_yolo(
+            [entry['name'] for entry in json.load(f)],
+            latency_ms=float(os.environ.get('STUB_YOLO_LATENCY_MS', 0)),
+            per_image_ms=float(os.environ.get('STUB_YOLO_PER_IMAGE_MS', 0)),
+        )
+
+
+def make_jpeg(width=1920, height=1440, seed=0, quality=90):
+    """A photo-sized JPEG with enough texture to be a realistic decode workload."""
+    import cv2
+
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 255, size=(height // 16, width // 16, 3), dtype=np.uint8)
+    image = cv2.resize(small, (width, height), interpolation=cv2.INTER_CUBIC)
+    ok, encoded = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    assert ok
+    return encoded.tobytes()
@@ -14,3 +14,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'food_backend.settings')
 
 application = get_wsgi_application()
+
+# Serving process: load YOLO / Gemini / google-auth now, not on the first request
+from django.conf import settings  # noqa: E402
+from api.registry import warm_up  # noqa: E402
+
+warm_up(settings.WARM_UP_COMPONENTS)